@@ -0,0 +1,88 @@
+"""Compare two benchmark results files from run.py
+
+Usage:
+
+    python benchmarks/compare.py before.json after.json [--threshold 10]
+
+Exits with status 1 if any benchmark's median latency
+is slower by more than the threshold (in percent).
+"""
+
+import argparse
+import json
+import sys
+
+
+def load_results(path):
+    """Load results from a file, keyed by (name, users)"""
+    with open(path) as f:
+        report = json.load(f)
+    return report["metadata"], {
+        (result["name"], result["users"]): result for result in report["results"]
+    }
+
+
+def change(before, after):
+    """Relative change from before to after, in percent"""
+    if not before:
+        return 0
+    return 100 * (after - before) / before
+
+
+def compare(before_path, after_path, threshold=10):
+    """Print a comparison table, and return the list of regressions"""
+    before_meta, before = load_results(before_path)
+    after_meta, after = load_results(after_path)
+    print(
+        f"before: {before_meta.get('commit', '')[:10]} {before_meta.get('timestamp', '')}"
+    )
+    print(
+        f"after:  {after_meta.get('commit', '')[:10]} {after_meta.get('timestamp', '')}"
+    )
+    print()
+    header = (
+        f"{'benchmark':>14} {'users':>8} {'req/s':>20} {'p50 ms':>22} {'p99 ms':>22}"
+    )
+    print(header)
+    print("-" * len(header))
+    regressions = []
+    for key in sorted(set(before).intersection(after), key=lambda k: (k[1], k[0])):
+        name, users = key
+        b = before[key]
+        a = after[key]
+        rps_change = change(b["rps"], a["rps"])
+        p50_change = change(b["latency_ms"]["p50"], a["latency_ms"]["p50"])
+        p99_change = change(b["latency_ms"]["p99"], a["latency_ms"]["p99"])
+        flag = ""
+        if p50_change > threshold:
+            flag = " !"
+            regressions.append(key)
+        print(
+            f"{name:>14} {users:>8}"
+            f" {a['rps']:>10.1f} ({rps_change:+6.1f}%)"
+            f" {a['latency_ms']['p50']:>12.2f} ({p50_change:+6.1f}%)"
+            f" {a['latency_ms']['p99']:>12.2f} ({p99_change:+6.1f}%)"
+            f"{flag}"
+        )
+    for key in sorted(set(before).symmetric_difference(after)):
+        print(f"{key[0]:>14} {key[1]:>8} only in one file")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("before", help="results from the baseline")
+    parser.add_argument("after", help="results to compare with the baseline")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=10,
+        help="Median latency increase (in percent) counted as a regression",
+    )
+    args = parser.parse_args()
+    regressions = compare(args.before, args.after, args.threshold)
+    if regressions:
+        print(
+            f"\n{len(regressions)} benchmark(s) slower by more than {args.threshold}%"
+        )
+        sys.exit(1)
@@ -0,0 +1,273 @@
+"""Cost of the JSON columns of spawners: encoding, size and commits
+
+Creates a database with populate.py, with named servers for each user,
+gives every server a `state` and `user_options` like real Spawners save,
+then, for each JSON encoder:
+
+- times encoding and decoding those values, and measures their stored size
+- times committing state for all of a user's servers,
+  unchanged (assigned directly, or with `orm.set_if_changed` as the Hub does)
+  and changed
+
+Encoders:
+
+- `default`: `json.dumps` with its default separators, as before JupyterHub 5.3
+- `compact`: the Hub's encoding, compact with sorted keys
+- `orjson`: the Hub's encoding with `JUPYTERHUB_DB_JSON_LIBRARY=orjson`,
+  if orjson is installed
+
+Usage:
+
+    python benchmarks/json_columns.py --users 100 --named-servers 50
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from unittest import mock
+
+from sqlalchemy import event, func, select
+
+from jupyterhub import orm
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from populate import create_db  # noqa: E402
+from run import get_metadata  # noqa: E402
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default_dumps(value, default=None):
+    return json.dumps(value, default=default)
+
+
+def _default_loads(value, object_hook=None):
+    return json.loads(value, object_hook=object_hook)
+
+
+# (orm.orjson, orm._json_dumps, orm._json_loads) for each encoder
+ENCODERS = {
+    "default": (None, _default_dumps, _default_loads),
+    "compact": (None, orm._json_dumps, orm._json_loads),
+}
+if orjson is not None:
+    ENCODERS["orjson"] = (orjson, orm._json_dumps, orm._json_loads)
+
+
+def spawner_state(user_name, server_name):
+    """A state dict like KubeSpawner saves"""
+    pod_name = f"jupyter-{user_name}--{server_name}"
+    return {
+        "pod_name": pod_name,
+        "namespace": "jupyterhub",
+        "dns_name": f"{pod_name}.jupyterhub.svc.cluster.local",
+        "pvc_name": f"claim-{user_name}--{server_name}",
+        "version": 0,
+    }
+
+
+def spawner_user_options(i):
+    """user_options, as submitted from a spawn form"""
+    return {
+        "profile": ["small", "medium", "gpu"][i % 3],
+        "image": "quay.io/jupyter/scipy-notebook:2024-10-07",
+        "cpu_limit": 1 + i % 4,
+        "mem_limit": "4G",
+        "env": {"GIT_REPO": "https://github.com/jupyterhub/jupyterhub", "DEBUG": ""},
+        "volumes": ["home", "shared"],
+    }
+
+
+def set_json_columns(session_factory):
+    """Give every spawner state and user_options"""
+    db = session_factory()
+    try:
+        for i, orm_spawner in enumerate(db.execute(select(orm.Spawner)).scalars()):
+            orm_spawner.state = spawner_state(orm_spawner.user.name, orm_spawner.name)
+            orm_spawner.user_options = spawner_user_options(i)
+        db.commit()
+    finally:
+        db.close()
+
+
+def time_encoding(values, repeat):
+    """Median time (in microseconds) to encode and decode values, and their size"""
+    column = orm.JSONDict()
+    encode_times = []
+    decode_times = []
+    for i in range(repeat):
+        tic = time.perf_counter()
+        encoded = [column.process_bind_param(value, None) for value in values]
+        encode_times.append(time.perf_counter() - tic)
+        tic = time.perf_counter()
+        for value in encoded:
+            column.process_result_value(value, None)
+        decode_times.append(time.perf_counter() - tic)
+    return {
+        "encode_us": 1e6 * statistics.median(encode_times) / len(values),
+        "decode_us": 1e6 * statistics.median(decode_times) / len(values),
+        "bytes": sum(len(value.encode("utf8")) for value in encoded) / len(values),
+    }
+
+
+def time_commits(session_factory, mode):
+    """Median time (in milliseconds) to commit each user's servers
+
+    Stores state for every server of a user and commits, as `User.spawn`
+    and `User.stop` do for a single server. Modes:
+
+    - `assign`: assigns state equal to the current state
+    - `unchanged`: the same, with `orm.set_if_changed`, as the Hub does
+    - `changed`: assigns new state
+
+    Returns the median time and the number of UPDATE statements issued.
+    """
+    db = session_factory()
+    updates = 0
+
+    def count_updates(conn, cursor, statement, *args):
+        nonlocal updates
+        if statement.startswith("UPDATE"):
+            updates += 1
+
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", count_updates)
+    times = []
+    try:
+        for orm_user in db.execute(select(orm.User)).scalars():
+            orm_spawners = list(orm_user.orm_spawners.values())
+            if not orm_spawners:
+                continue
+            tic = time.perf_counter()
+            for orm_spawner in orm_spawners:
+                # a new dict, as returned by Spawner.get_state()
+                state = dict(orm_spawner.state)
+                if mode == "assign":
+                    orm_spawner.state = state
+                elif mode == "unchanged":
+                    orm.set_if_changed(orm_spawner, state=state)
+                else:
+                    state["version"] += 1
+                    orm_spawner.state = state
+            db.commit()
+            times.append(time.perf_counter() - tic)
+    finally:
+        event.remove(engine, "before_cursor_execute", count_updates)
+        db.close()
+    return {"ms": 1e3 * statistics.median(times), "updates": updates}
+
+
+COMMIT_MODES = ["assign", "unchanged", "changed"]
+
+
+def run_encoder(name, db_url, args):
+    """Measure encoding and commits with one encoder"""
+    patches = [
+        mock.patch.object(orm, attr, value)
+        for attr, value in zip(("orjson", "_json_dumps", "_json_loads"), ENCODERS[name])
+    ]
+    for patch in patches:
+        patch.start()
+    session_factory = orm.new_session_factory(db_url)
+    try:
+        set_json_columns(session_factory)
+        db = session_factory()
+        rows = db.execute(
+            select(orm.Spawner.state, orm.Spawner.user_options).limit(1000)
+        ).all()
+        db.close()
+        result = {
+            "encoder": name,
+            "state": time_encoding([row[0] for row in rows], args.repeat),
+            "user_options": time_encoding([row[1] for row in rows], args.repeat),
+            "commits": {
+                mode: time_commits(session_factory, mode) for mode in COMMIT_MODES
+            },
+        }
+    finally:
+        session_factory.kw["bind"].dispose()
+        for patch in patches:
+            patch.stop()
+    return result
+
+
+def main(args):
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        db_url = f"sqlite:///{os.path.join(workdir, 'hub.sqlite')}"
+        tic = time.perf_counter()
+        create_db(db_url, users=args.users, named_servers=args.named_servers)
+        session_factory = orm.new_session_factory(db_url)
+        db = session_factory()
+        spawners = db.execute(select(func.count(orm.Spawner.id))).scalar()
+        db.close()
+        session_factory.kw["bind"].dispose()
+        print(
+            f"populated {args.users} users with {spawners} servers"
+            f" in {time.perf_counter() - tic:.1f}s",
+            file=sys.stderr,
+        )
+        for name in args.encoders:
+            results.append(run_encoder(name, db_url, args))
+    metadata = get_metadata(
+        users=args.users, named_servers=args.named_servers, repeat=args.repeat
+    )
+    return {"metadata": metadata, "results": results}
+
+
+def print_report(report):
+    print(f"{'encoder':>8} {'column':>12} {'encode':>10} {'decode':>10} {'size':>8}")
+    for result in report["results"]:
+        for column in ("state", "user_options"):
+            r = result[column]
+            print(
+                f"{result['encoder']:>8} {column:>12}"
+                f" {r['encode_us']:>8.1f}us {r['decode_us']:>8.1f}us"
+                f" {r['bytes']:>7.0f}B"
+            )
+    print()
+    print(
+        f"{'encoder':>8}" + "".join(f"{mode + ' commit':>28}" for mode in COMMIT_MODES)
+    )
+    for result in report["results"]:
+        print(
+            f"{result['encoder']:>8}"
+            + "".join(
+                f"{c['ms']:>13.2f}ms ({c['updates']:>5} UPDATE)"
+                for c in (result["commits"][mode] for mode in COMMIT_MODES)
+            )
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--users", type=int, default=100, help="Number of users in the database"
+    )
+    parser.add_argument(
+        "--named-servers", type=int, default=50, help="Named servers for each user"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=20, help="Number of times to encode values"
+    )
+    parser.add_argument(
+        "--encoders",
+        nargs="+",
+        default=list(ENCODERS),
+        choices=list(ENCODERS),
+        help="JSON encoders to compare",
+    )
+    parser.add_argument("-o", "--output", help="Write results to this JSON file")
+    args = parser.parse_args()
+    report = main(args)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=1)
+    print_report(report)
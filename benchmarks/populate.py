@@ -0,0 +1,237 @@
+"""Populate a Hub database with many users, tokens, groups and shares
+
+Inserts rows in bulk with the orm,
+rather than through the REST API, which would take much longer.
+
+Can also be run as a script to create a database
+for measuring startup (see startup.py), e.g.:
+
+    python benchmarks/populate.py sqlite:///hub-100k.sqlite --users 100000
+    python benchmarks/populate.py postgresql://... --users 100000 --spawners 1000
+"""
+
+import argparse
+import sys
+import time
+
+from jupyterhub import orm
+from jupyterhub.roles import create_role, get_default_roles, grant_role_bulk
+from jupyterhub.utils import new_token, utcnow
+
+# scopes for the generated custom roles
+ROLE_SCOPES = ["read:users:name", "read:groups:name", "list:users", "list:groups"]
+
+
+def role_specs(users, roles, prefix="bench-"):
+    """The custom roles assigned by `populate`, as `load_roles` config
+
+    User i is a member of role i % roles.
+    """
+    specs = [
+        {
+            "name": f"{prefix}role-{i}",
+            "scopes": ROLE_SCOPES,
+            "users": [],
+        }
+        for i in range(roles)
+    ]
+    for i in range(users if roles else 0):
+        specs[i % roles]["users"].append(f"{prefix}user-{i}")
+    return specs
+
+
+def populate(
+    db,
+    users=100,
+    groups=None,
+    shares=None,
+    roles=0,
+    tokens_per_user=1,
+    spawners=0,
+    named_servers=0,
+    prefix="bench-",
+):
+    """Add users, groups, roles, API tokens, servers and shares to a Hub database
+
+    Args:
+        db: the sqlalchemy session
+        users (int): the number of users to create
+        groups (int): the number of groups to create.
+            Each user is a member of one group.
+            Default: one group per 10 users.
+        shares (int): the number of users who share their default server
+            with the next user. Default: one in 10 users.
+        roles (int): the number of custom roles to create.
+            Each user is a member of one role (see `role_specs`).
+        tokens_per_user (int): the number of API tokens for each user
+        spawners (int): the number of users with a running default server,
+            i.e. a Spawner with a Server and state `{"running": True}`,
+            as saved by `InProcessSpawner`.
+            Servers are at 127.0.0.1 on port 0,
+            so the port must be updated before they can be reached.
+        named_servers (int): the number of stopped named servers for each user
+        prefix (str): prefix for user, group and role names
+    Returns:
+        tokens (dict): an API token for each user, by name.
+            Includes an admin user named `{prefix}admin`.
+    """
+    if groups is None:
+        groups = max(1, users // 10)
+    if shares is None:
+        shares = users // 10
+    now = utcnow(with_tz=False)
+
+    admin = orm.User(name=f"{prefix}admin", admin=True, last_activity=now)
+    orm_users = [
+        orm.User(name=f"{prefix}user-{i}", last_activity=now) for i in range(users)
+    ]
+    db.add(admin)
+    db.add_all(orm_users)
+    db.flush()
+    grant_role_bulk(db, orm_users + [admin], "user", commit=False)
+    grant_role_bulk(db, [admin], "admin", commit=False)
+
+    if roles and orm_users:
+        by_name = {orm_user.name: orm_user for orm_user in orm_users}
+        for spec in role_specs(users, roles, prefix):
+            role = orm.Role(name=spec["name"], scopes=spec["scopes"])
+            db.add(role)
+            db.flush()
+            grant_role_bulk(
+                db, [by_name[name] for name in spec["users"]], role, commit=False
+            )
+
+    orm_groups = [orm.Group(name=f"{prefix}group-{i}") for i in range(groups)]
+    db.add_all(orm_groups)
+    for i, orm_user in enumerate(orm_users):
+        orm_groups[i % groups].users.append(orm_user)
+
+    tokens = {}
+    orm_tokens = []
+    for orm_user in orm_users + [admin]:
+        for i in range(tokens_per_user):
+            token = new_token()
+            orm_token = orm.APIToken(
+                client_id="jupyterhub",
+                scopes=["inherit"],
+                note="benchmark",
+            )
+            orm_token.token = token
+            orm_token.user = orm_user
+            orm_tokens.append(orm_token)
+            tokens.setdefault(orm_user.name, token)
+    db.add_all(orm_tokens)
+
+    orm_spawners = {}
+    for orm_user in orm_users[: max(spawners, shares)]:
+        orm_spawner = orm.Spawner(name="")
+        orm_spawner.user = orm_user
+        orm_spawners[orm_user.name] = orm_spawner
+    for orm_user in orm_users[:spawners]:
+        orm_spawner = orm_spawners[orm_user.name]
+        orm_spawner.server = orm.Server(
+            ip="127.0.0.1", port=0, base_url=f"/user/{orm_user.name}/"
+        )
+        orm_spawner.state = {"running": True}
+        orm_spawner.started = now
+        orm_spawner.last_activity = now
+    db.add_all(orm_spawners.values())
+    named_spawners = []
+    for orm_user in orm_users:
+        for i in range(named_servers):
+            orm_spawner = orm.Spawner(name=f"server-{i}")
+            orm_spawner.user = orm_user
+            named_spawners.append(orm_spawner)
+    db.add_all(named_spawners)
+    db.flush()
+
+    if shares and len(orm_users) > 1:
+        orm_shares = []
+        for i, orm_user in enumerate(orm_users[:shares]):
+            orm_spawner = orm_spawners[orm_user.name]
+            share_with = orm_users[(i + 1) % len(orm_users)]
+            orm_shares.append(
+                orm.Share(
+                    owner=orm_user,
+                    spawner=orm_spawner,
+                    user=share_with,
+                    scopes=sorted(
+                        orm.Share.apply_filter({"access:servers"}, orm_spawner)
+                    ),
+                )
+            )
+        db.add_all(orm_shares)
+
+    db.commit()
+    return tokens
+
+
+def create_db(db_url, **kwargs):
+    """Create a new Hub database at db_url, and populate it
+
+    Any existing tables are dropped.
+    The default roles and the Hub's own OAuth client are created,
+    as the Hub would on first startup.
+    Keyword arguments are passed to `populate`.
+    """
+    session_factory = orm.new_session_factory(db_url, reset=True)
+    db = session_factory()
+    try:
+        db.add(
+            orm.OAuthClient(
+                identifier="jupyterhub",
+                secret="",
+                redirect_uri="",
+                description="JupyterHub",
+            )
+        )
+        for role in get_default_roles():
+            create_role(db, role, commit=False)
+        db.commit()
+        populate(db, **kwargs)
+    finally:
+        db.close()
+        db.get_bind().dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "db_url", help="Database URL, e.g. sqlite:///hub.sqlite. Tables are reset!"
+    )
+    parser.add_argument("--users", type=int, default=1000, help="Number of users")
+    parser.add_argument(
+        "--groups", type=int, help="Number of groups (default: users / 10)"
+    )
+    parser.add_argument(
+        "--shares", type=int, help="Number of shared servers (default: users / 10)"
+    )
+    parser.add_argument("--roles", type=int, default=0, help="Number of custom roles")
+    parser.add_argument(
+        "--tokens-per-user", type=int, default=1, help="API tokens for each user"
+    )
+    parser.add_argument(
+        "--spawners", type=int, default=0, help="Number of running servers"
+    )
+    parser.add_argument(
+        "--named-servers", type=int, default=0, help="Named servers for each user"
+    )
+    args = parser.parse_args()
+    tic = time.perf_counter()
+    create_db(
+        args.db_url,
+        users=args.users,
+        groups=args.groups,
+        shares=args.shares,
+        roles=args.roles,
+        tokens_per_user=args.tokens_per_user,
+        spawners=args.spawners,
+        named_servers=args.named_servers,
+    )
+    print(
+        f"Populated {args.db_url} in {time.perf_counter() - tic:.1f}s", file=sys.stderr
+    )
+
+
+if __name__ == "__main__":
+    main()
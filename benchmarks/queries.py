@@ -0,0 +1,225 @@
+"""Query plans and timings for the Hub's frequent database queries
+
+Creates a database with populate.py, then runs each query
+with the current schema ("after"),
+and with the schema downgraded to before the indexes
+for these queries were added ("before"),
+showing the query plan of each and the median time.
+
+Usage:
+
+    python benchmarks/queries.py --users 100000
+    python benchmarks/queries.py --users 100000 --db-url postgresql://...
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+import alembic.command
+import alembic.config
+from sqlalchemy import bindparam, create_engine, func, or_, select, update
+
+from jupyterhub import orm
+from jupyterhub.dbutil import _temp_alembic_ini
+from jupyterhub.utils import utcnow
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from populate import create_db  # noqa: E402
+from run import get_metadata  # noqa: E402
+
+# the revision before the indexes were added
+BEFORE_INDEXES = "3471946089cc"
+
+
+def queries(now, prefix):
+    """The queries to measure, by name"""
+    return {
+        # PeriodicMetricsCollector.update_active_users
+        "active_users": select(func.count(orm.User.id)).where(
+            orm.User.last_activity >= now - timedelta(days=7)
+        ),
+        # APIToken.purge_expired
+        "expired_tokens": select(orm.APIToken).where(
+            orm.APIToken.expires_at != None, orm.APIToken.expires_at < now
+        ),
+        # APIToken.find_prefix, on every token-authenticated request
+        "find_token": select(orm.APIToken).where(
+            orm.APIToken.prefix == prefix,
+            or_(orm.APIToken.expires_at == None, orm.APIToken.expires_at >= now),
+        ),
+        # JupyterHub.init_spawners and GET /api/users?state=active
+        "running_servers": select(orm.User.id, orm.Spawner.id)
+        .join(orm.Spawner, orm.User._orm_spawners)
+        .where(orm.Spawner.server_id != None),
+        # loading a user's spawners
+        "user_spawners": select(orm.Spawner).where(orm.Spawner.user_id == 1),
+    }
+
+
+def set_timestamps(engine, now):
+    """Spread users' activity over 60 days, and set expiry on half of the tokens
+
+    1% of tokens are expired.
+    """
+    users = orm.User.__table__
+    tokens = orm.APIToken.__table__
+    with engine.begin() as connection:
+        user_ids = connection.execute(select(users.c.id)).scalars().all()
+        connection.execute(
+            update(users)
+            .where(users.c.id == bindparam("_id"))
+            .values(last_activity=bindparam("_last_activity")),
+            [
+                {"_id": id, "_last_activity": now - timedelta(days=id % 60)}
+                for id in user_ids
+            ],
+        )
+        token_ids = connection.execute(select(tokens.c.id)).scalars().all()
+        expiring = []
+        for id in token_ids:
+            if id % 100 == 1:
+                expiring.append({"_id": id, "_expires_at": now - timedelta(days=1)})
+            elif id % 2 == 0:
+                expiring.append({"_id": id, "_expires_at": now + timedelta(days=1)})
+        connection.execute(
+            update(tokens)
+            .where(tokens.c.id == bindparam("_id"))
+            .values(expires_at=bindparam("_expires_at")),
+            expiring,
+        )
+
+
+def explain(connection, stmt):
+    """Return the query plan of a statement, as lines of text"""
+    compiled = stmt.compile(dialect=connection.dialect)
+    if compiled.positional:
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+    else:
+        params = compiled.params
+    if connection.dialect.name == "sqlite":
+        rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params)
+        return [row[-1] for row in rows]
+    rows = connection.exec_driver_sql(f"EXPLAIN {compiled}", params)
+    return [row[0] for row in rows]
+
+
+def measure(engine, stmts, repeat):
+    """Plan and median time (in milliseconds) of each statement"""
+    results = {}
+    with engine.connect() as connection:
+        # update statistics for the query planner
+        connection.exec_driver_sql("ANALYZE")
+        for name, stmt in stmts.items():
+            times = []
+            for i in range(repeat):
+                tic = time.perf_counter()
+                connection.execute(stmt).fetchall()
+                times.append(time.perf_counter() - tic)
+            results[name] = {
+                "plan": explain(connection, stmt),
+                "ms": 1e3 * statistics.median(times),
+            }
+    return results
+
+
+def migrate(db_url, revision):
+    """Upgrade or downgrade the database schema to revision"""
+    with _temp_alembic_ini(db_url) as ini:
+        cfg = alembic.config.Config(ini)
+        if revision == "head":
+            alembic.command.upgrade(cfg, revision)
+        else:
+            alembic.command.downgrade(cfg, revision)
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as workdir:
+        db_url = args.db_url or f"sqlite:///{os.path.join(workdir, 'hub.sqlite')}"
+        tic = time.perf_counter()
+        create_db(
+            db_url,
+            users=args.users,
+            # every user has a (mostly stopped) server, shared with one other user
+            shares=args.users,
+            spawners=int(args.users * args.running),
+        )
+        engine = create_engine(db_url)
+        now = utcnow(with_tz=False)
+        set_timestamps(engine, now)
+        print(
+            f"populated {args.users} users in {time.perf_counter() - tic:.1f}s",
+            file=sys.stderr,
+        )
+        with engine.connect() as connection:
+            prefix = connection.execute(
+                select(orm.APIToken.prefix).order_by(orm.APIToken.id.desc())
+            ).scalar()
+        stmts = queries(now, prefix)
+
+        migrate(db_url, BEFORE_INDEXES)
+        before = measure(engine, stmts, args.repeat)
+        migrate(db_url, "head")
+        after = measure(engine, stmts, args.repeat)
+        engine.dispose()
+
+    results = [
+        {"name": name, "before": before[name], "after": after[name]} for name in stmts
+    ]
+    metadata = get_metadata(
+        db_url=args.db_url or "sqlite",
+        users=args.users,
+        running=args.running,
+        repeat=args.repeat,
+    )
+    return {"metadata": metadata, "results": results}
+
+
+def print_report(report):
+    for result in report["results"]:
+        before = result["before"]
+        after = result["after"]
+        print(
+            f"{result['name']}: {before['ms']:.2f}ms -> {after['ms']:.2f}ms"
+            f" ({before['ms'] / max(after['ms'], 1e-6):.1f}x)"
+        )
+        print("  before:")
+        for line in before["plan"]:
+            print(f"    {line}")
+        print("  after:")
+        for line in after["plan"]:
+            print(f"    {line}")
+        print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--users", type=int, default=100000, help="Number of users in the database"
+    )
+    parser.add_argument(
+        "--db-url",
+        help="Database URL to use instead of a temporary sqlite file."
+        " Tables are reset!",
+    )
+    parser.add_argument(
+        "--running",
+        type=float,
+        default=0.01,
+        help="Fraction of users with a running server",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=20, help="Number of times to run each query"
+    )
+    parser.add_argument("-o", "--output", help="Write results to this JSON file")
+    args = parser.parse_args()
+    report = main(args)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=1)
+    print_report(report)
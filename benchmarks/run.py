@@ -0,0 +1,357 @@
+"""Benchmark the Hub's request hot paths at several scales
+
+Runs an in-process MockHub with an in-memory proxy and spawner,
+populates it with users, tokens, groups and shares,
+and measures throughput and latency of common requests.
+
+Usage:
+
+    python benchmarks/run.py --users 100 1000 --output results.json
+    python benchmarks/compare.py before.json after.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from urllib.parse import quote
+
+from tornado.httpclient import AsyncHTTPClient, HTTPRequest
+
+import jupyterhub
+from jupyterhub.loadtest import percentile
+from jupyterhub.tests.mocking import InProcessSpawner, MockHub, MockProxy
+from jupyterhub.utils import url_path_join
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from populate import populate  # noqa: E402
+
+# the benchmarks to run, in order
+BENCHMARKS = [
+    "get_self",
+    "get_user",
+    "list_users",
+    "spawn_stop",
+    "activity",
+    "check_routes",
+]
+
+
+def summarize(name, users, latencies, duration, concurrency):
+    """Summarize one benchmark's latencies (in seconds) as a JSONable dict"""
+    latencies = sorted(latencies)
+    return {
+        "name": name,
+        "users": users,
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "duration": duration,
+        "rps": len(latencies) / duration if duration else 0,
+        # latencies in milliseconds
+        "latency_ms": {
+            "mean": 1e3 * statistics.mean(latencies) if latencies else 0,
+            "min": 1e3 * latencies[0] if latencies else 0,
+            "p50": 1e3 * percentile(latencies, 50),
+            "p90": 1e3 * percentile(latencies, 90),
+            "p99": 1e3 * percentile(latencies, 99),
+            "max": 1e3 * latencies[-1] if latencies else 0,
+        },
+    }
+
+
+async def measure(func, args_list, concurrency):
+    """Call `await func(*args)` for each args in args_list
+
+    with up to `concurrency` calls in flight.
+
+    Returns:
+        (latencies, duration): the latency of each call
+        and the wall time for all of them, in seconds
+    """
+    queue = list(reversed(args_list))
+    latencies = []
+
+    async def worker():
+        while queue:
+            args = queue.pop()
+            tic = time.perf_counter()
+            await func(*args)
+            latencies.append(time.perf_counter() - tic)
+
+    tic = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - tic
+
+
+class HubBenchmark:
+    """Benchmarks against one running MockHub"""
+
+    def __init__(self, app, tokens, requests, concurrency, servers):
+        self.app = app
+        self.tokens = tokens
+        self.admin_name = next(name for name in tokens if name.endswith("admin"))
+        self.user_names = [name for name in tokens if name != self.admin_name]
+        self.requests = requests
+        self.concurrency = concurrency
+        self.servers = min(servers, len(self.user_names))
+        self.client = AsyncHTTPClient(force_instance=True, max_clients=concurrency)
+
+    def _users(self, n):
+        """n user names, cycling through all users"""
+        names = self.user_names
+        return [names[i % len(names)] for i in range(n)]
+
+    async def api_request(self, path, token, method="GET", body=None):
+        url = url_path_join(self.app.hub.url, "api", path)
+        if method == "POST" and body is None:
+            body = ""
+        req = HTTPRequest(
+            url,
+            method=method,
+            headers={"Authorization": f"token {token}"},
+            body=body,
+        )
+        return await self.client.fetch(req)
+
+    async def bench_get_self(self):
+        """GET /api/user: token lookup, scope resolution and the user model"""
+
+        async def get_self(name):
+            await self.api_request("user", self.tokens[name])
+
+        return await measure(
+            get_self, [(name,) for name in self._users(self.requests)], self.concurrency
+        )
+
+    async def bench_get_user(self):
+        """GET /api/users/:name as an admin"""
+        admin_token = self.tokens[self.admin_name]
+
+        async def get_user(name):
+            await self.api_request(f"users/{quote(name)}", admin_token)
+
+        return await measure(
+            get_user, [(name,) for name in self._users(self.requests)], self.concurrency
+        )
+
+    async def bench_list_users(self):
+        """GET /api/users, one page at a time, as an admin"""
+        admin_token = self.tokens[self.admin_name]
+        limit = 100
+        pages = max(1, len(self.user_names) // limit)
+        n = max(1, self.requests // 10)
+
+        async def list_users(offset):
+            await self.api_request(f"users?limit={limit}&offset={offset}", admin_token)
+
+        return await measure(
+            list_users,
+            [((i % pages) * limit,) for i in range(n)],
+            self.concurrency,
+        )
+
+    async def bench_spawn_stop(self):
+        """Start and stop default servers via the REST API"""
+        admin_token = self.tokens[self.admin_name]
+
+        async def spawn_stop(name):
+            path = f"users/{quote(name)}/server"
+            await self.api_request(path, admin_token, method="POST")
+            await self.api_request(path, admin_token, method="DELETE")
+
+        n = min(self.requests // 10, len(self.user_names)) or 1
+        return await measure(
+            spawn_stop, [(name,) for name in self._users(n)], self.concurrency
+        )
+
+    async def start_servers(self):
+        """Start servers for the activity and route benchmarks"""
+        admin_token = self.tokens[self.admin_name]
+
+        async def spawn(name):
+            await self.api_request(
+                f"users/{quote(name)}/server", admin_token, method="POST"
+            )
+
+        await measure(spawn, [(name,) for name in self.user_names[: self.servers]], 10)
+
+    async def bench_activity(self):
+        """POST /api/users/:name/activity from running servers"""
+        running = self.user_names[: self.servers]
+        server_tokens = {
+            name: self.app.users[name].spawner.api_token for name in running
+        }
+
+        async def activity(name):
+            now = datetime.now(timezone.utc).isoformat()
+            body = json.dumps(
+                {"last_activity": now, "servers": {"": {"last_activity": now}}}
+            )
+            await self.api_request(
+                f"users/{quote(name)}/activity",
+                server_tokens[name],
+                method="POST",
+                body=body,
+            )
+
+        return await measure(
+            activity,
+            [(running[i % len(running)],) for i in range(self.requests)],
+            self.concurrency,
+        )
+
+    async def bench_check_routes(self):
+        """Proxy.check_routes with running servers"""
+        app = self.app
+
+        async def check_routes():
+            await app.proxy.check_routes(app.users, app._service_map)
+
+        # check_routes is not concurrent in the Hub
+        return await measure(
+            check_routes, [() for i in range(max(1, self.requests // 100))], 1
+        )
+
+    async def run(self, benchmarks):
+        results = []
+        servers_started = False
+        for name in benchmarks:
+            if name in {"activity", "check_routes"} and not servers_started:
+                await self.start_servers()
+                servers_started = True
+            bench = getattr(self, f"bench_{name}")
+            latencies, duration = await bench()
+            concurrency = 1 if name == "check_routes" else self.concurrency
+            result = summarize(
+                name, len(self.user_names), latencies, duration, concurrency
+            )
+            print(
+                f"{name:>14} users={result['users']:<8}"
+                f" {result['rps']:8.1f} req/s"
+                f"  p50={result['latency_ms']['p50']:.1f}ms"
+                f"  p99={result['latency_ms']['p99']:.1f}ms",
+                file=sys.stderr,
+            )
+            results.append(result)
+        return results
+
+
+async def run_scale(users, args):
+    """Run all benchmarks against a new Hub with `users` users"""
+    app = MockHub.instance(
+        log_level=logging.WARNING,
+        proxy_class=MockProxy,
+        spawner_class=InProcessSpawner,
+        last_activity_interval=0,
+        allow_named_servers=bool(args.named_servers),
+    )
+    app.config.Spawner.http_timeout = 30
+    try:
+        await app.initialize([])
+        await app.start()
+        tokens = populate(app.db, users=users, named_servers=args.named_servers)
+        bench = HubBenchmark(
+            app,
+            tokens,
+            requests=args.requests,
+            concurrency=args.concurrency,
+            servers=args.servers,
+        )
+        return await bench.run(args.benchmarks)
+    finally:
+        await app.stop_async()
+        MockHub.clear_instance()
+        InProcessSpawner.stop_stand_in()
+
+
+def get_metadata(**extra):
+    """Information about what was benchmarked
+
+    extra: fields to add, e.g. benchmark parameters
+    """
+    try:
+        commit = subprocess.check_output(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL,
+            text=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = ""
+    return {
+        "jupyterhub_version": jupyterhub.__version__,
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "db_url": os.getenv("JUPYTERHUB_TEST_DB_URL", "sqlite"),
+        **extra,
+    }
+
+
+def main(args):
+    results = []
+    for users in args.users:
+        # a new event loop for each Hub
+        results.extend(asyncio.run(run_scale(users, args)))
+    metadata = get_metadata(
+        requests=args.requests,
+        concurrency=args.concurrency,
+        servers=args.servers,
+        named_servers=args.named_servers,
+    )
+    return {"metadata": metadata, "results": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--users",
+        type=int,
+        nargs="+",
+        default=[100, 1000],
+        help="Number of users to populate, one run per value",
+    )
+    parser.add_argument(
+        "--requests", type=int, default=500, help="Requests per benchmark"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=10, help="Concurrent requests"
+    )
+    parser.add_argument(
+        "--servers",
+        type=int,
+        default=100,
+        help="Running servers for the activity and check_routes benchmarks",
+    )
+    parser.add_argument(
+        "--named-servers",
+        type=int,
+        default=0,
+        help="Stopped named servers for each user",
+    )
+    parser.add_argument(
+        "--benchmarks",
+        nargs="+",
+        choices=BENCHMARKS,
+        default=BENCHMARKS,
+        help="The benchmarks to run",
+    )
+    parser.add_argument(
+        "-o", "--output", help="Write results to this JSON file (default: stdout)"
+    )
+    args = parser.parse_args()
+    report = main(args)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=1)
+    else:
+        json.dump(report, sys.stdout, indent=1)
+        print()
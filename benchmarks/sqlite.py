@@ -0,0 +1,168 @@
+"""Commit throughput of the Hub's sqlite profile
+
+Compares committing activity updates, as the Hub does on every request,
+with the tuned sqlite profile (`orm.SQLITE_PRAGMAS`: WAL, synchronous=NORMAL, ...)
+and with sqlite's defaults (rollback journal, synchronous=FULL),
+while other connections read the database,
+as `jupyterhub shell` or a second process might.
+
+Usage:
+
+    python benchmarks/sqlite.py --users 10000 --commits 2000 --readers 2
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import OperationalError
+
+from jupyterhub import orm
+from jupyterhub.utils import utcnow
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from populate import create_db  # noqa: E402
+from run import get_metadata  # noqa: E402
+
+# sqlite's defaults, as before the tuned profile
+PROFILES = {
+    "default": {name: None for name in orm.SQLITE_PRAGMAS},
+    "tuned": {},
+}
+PROFILES["default"].update(journal_mode="DELETE", synchronous="FULL")
+
+
+def read_loop(session_factory, stop, counts):
+    """Keep reading the users table until stop is set"""
+    db = session_factory()
+    try:
+        while not stop.is_set():
+            try:
+                db.execute(
+                    select(func.count(orm.User.id)).where(
+                        orm.User.last_activity != None
+                    )
+                ).scalar()
+                counts["reads"] += 1
+            except OperationalError:
+                counts["read_errors"] += 1
+            db.rollback()
+    finally:
+        db.close()
+
+
+def run_profile(name, db_url, args):
+    """Commit activity updates with a pragma profile, returning the results"""
+    pragmas = PROFILES[name]
+    session_factory = orm.new_session_factory(db_url, sqlite_pragmas=pragmas)
+    engine = session_factory.kw["bind"]
+    db = session_factory()
+    user_ids = db.execute(select(orm.User.id)).scalars().all()
+
+    stop = threading.Event()
+    counts = {"reads": 0, "read_errors": 0}
+    readers = [
+        threading.Thread(target=read_loop, args=(session_factory, stop, counts))
+        for i in range(args.readers)
+    ]
+    for reader in readers:
+        reader.start()
+
+    times = []
+    errors = 0
+    tic = time.perf_counter()
+    try:
+        for i in range(args.commits):
+            user_id = user_ids[i % len(user_ids)]
+            t = time.perf_counter()
+            try:
+                db.execute(
+                    update(orm.User)
+                    .where(orm.User.id == user_id)
+                    .values(last_activity=utcnow(with_tz=False))
+                )
+                db.commit()
+            except OperationalError:
+                # e.g. 'database is locked'
+                db.rollback()
+                errors += 1
+            times.append(time.perf_counter() - t)
+        duration = time.perf_counter() - tic
+    finally:
+        stop.set()
+        for reader in readers:
+            reader.join()
+        db.close()
+        engine.dispose()
+
+    times.sort()
+    result = {
+        "profile": name,
+        "commits": args.commits,
+        "commits_per_second": args.commits / duration,
+        "p50_ms": 1e3 * statistics.median(times),
+        "p99_ms": 1e3 * times[int(0.99 * (len(times) - 1))],
+        "max_ms": 1e3 * times[-1],
+        "commit_errors": errors,
+        "reads": counts["reads"],
+        "read_errors": counts["read_errors"],
+    }
+    print(
+        f"{name:>8}: {result['commits_per_second']:8.1f} commits/s"
+        f"  p50={result['p50_ms']:.2f}ms  p99={result['p99_ms']:.2f}ms"
+        f"  max={result['max_ms']:.1f}ms  errors={errors}"
+        f"  reads={counts['reads']} read_errors={counts['read_errors']}",
+        file=sys.stderr,
+    )
+    return result
+
+
+def main(args):
+    results = []
+    with tempfile.TemporaryDirectory(dir=args.dir) as workdir:
+        for name in args.profiles:
+            # a new database for each profile, journal_mode is persistent
+            db_url = f"sqlite:///{os.path.join(workdir, f'{name}.sqlite')}"
+            create_db(db_url, users=args.users)
+            results.append(run_profile(name, db_url, args))
+    metadata = get_metadata(
+        users=args.users, commits=args.commits, readers=args.readers
+    )
+    return {"metadata": metadata, "results": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--users", type=int, default=10000, help="Number of users in the database"
+    )
+    parser.add_argument(
+        "--commits", type=int, default=2000, help="Number of commits per profile"
+    )
+    parser.add_argument(
+        "--readers", type=int, default=2, help="Number of concurrent reader threads"
+    )
+    parser.add_argument(
+        "--profiles",
+        nargs="+",
+        default=list(PROFILES),
+        choices=list(PROFILES),
+        help="Pragma profiles to compare",
+    )
+    parser.add_argument(
+        "--dir",
+        help="Directory for the database files (default: system temp dir)."
+        " Results depend on the filesystem.",
+    )
+    parser.add_argument("-o", "--output", help="Write results to this JSON file")
+    args = parser.parse_args()
+    report = main(args)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=1)
@@ -0,0 +1,324 @@
+"""Measure how Hub startup scales with the size of the database
+
+For each number of users, creates a database with populate.py,
+then runs `JupyterHub.initialize` against it twice
+and times each initialization phase:
+
+- `first`: the first startup with this config,
+  which applies `load_roles` and `admin_users` to the database
+- `restart`: a second startup with the same config,
+  where config fingerprints let unchanged steps be skipped
+
+The config assigns a custom role to every user (via `load_roles`),
+as deployments managing roles in config do.
+Servers recorded as running are restored with `InProcessSpawner`,
+so `init_spawners` polls and checks them without launching anything.
+
+Scaling exponents are computed between consecutive sizes,
+where 1 is linear and 2 is quadratic.
+Exits with status 1 if any phase scales worse than `--max-exponent`.
+
+Usage:
+
+    python benchmarks/startup.py --users 1000 10000 100000 --output startup.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import sys
+import tempfile
+import time
+from functools import wraps
+from inspect import iscoroutinefunction
+from unittest import mock
+
+from sqlalchemy import create_engine, update
+from traitlets.config import Config
+
+from jupyterhub import orm
+from jupyterhub.app import JupyterHub
+from jupyterhub.auth import DummyAuthenticator
+from jupyterhub.tests.mocking import InProcessSpawner, MockProxy
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from populate import create_db, role_specs  # noqa: E402
+from run import get_metadata  # noqa: E402
+
+# the methods of JupyterHub timed by phase, in the order initialize calls them
+PHASES = [
+    "init_db",
+    "init_hub",
+    "init_proxy",
+    "init_oauth",
+    "init_role_creation",
+    "init_users",
+    "init_groups",
+    "init_services",
+    "init_api_tokens",
+    "init_role_assignment",
+    "init_blocked_users",
+    "init_tornado_settings",
+    "init_handlers",
+    "init_tornado_application",
+    "init_spawners",
+]
+
+# functions called during init_db, timed separately
+NESTED_PHASES = {"check_db_revision": orm}
+
+PREFIX = "bench-"
+
+# phases faster than this (in seconds) at the largest size
+# are too noisy to compute scaling exponents
+NOISE_FLOOR = 0.05
+
+
+def _timed(func, timings, name):
+    """Wrap func to add its duration to timings[name]"""
+    if iscoroutinefunction(func):
+
+        @wraps(func)
+        async def timed(*args, **kwargs):
+            tic = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                timings[name] = timings.get(name, 0) + time.perf_counter() - tic
+
+    else:
+
+        @wraps(func)
+        def timed(*args, **kwargs):
+            tic = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                timings[name] = timings.get(name, 0) + time.perf_counter() - tic
+
+    return timed
+
+
+def hub_config(db_url, users, roles, cookie_secret):
+    """Config for a Hub using a database created by populate.create_db"""
+    c = Config()
+    c.JupyterHub.db_url = db_url
+    c.JupyterHub.cookie_secret = cookie_secret
+    c.JupyterHub.authenticator_class = DummyAuthenticator
+    c.JupyterHub.proxy_class = MockProxy
+    c.JupyterHub.spawner_class = InProcessSpawner
+    c.JupyterHub.log_level = logging.WARNING
+    # wait for init_spawners, however long it takes
+    c.JupyterHub.init_spawners_timeout = -1
+    c.JupyterHub.load_roles = role_specs(users, roles, PREFIX)
+    c.Authenticator.allow_all = True
+    c.Authenticator.admin_users = {f"{PREFIX}admin"}
+    return c
+
+
+async def time_initialize(config, workdir):
+    """Run JupyterHub.initialize with config, returning the duration of each phase"""
+    # servers were saved with port 0, point them to the stand-in server
+    port = InProcessSpawner._ensure_stand_in()
+    engine = create_engine(config.JupyterHub.db_url)
+    with engine.begin() as connection:
+        connection.execute(update(orm.Server.__table__).values(port=port))
+    engine.dispose()
+
+    # an empty config file, so that none is loaded from the working directory
+    config_file = os.path.join(workdir, "jupyterhub_config.py")
+    open(config_file, "a").close()
+    app = JupyterHub(
+        config=config,
+        config_file=config_file,
+        pid_file=os.path.join(workdir, "jupyterhub.pid"),
+    )
+    timings = {}
+    for name in PHASES:
+        setattr(app, name, _timed(getattr(app, name), timings, name))
+    patches = [
+        mock.patch.object(
+            module, name, _timed(getattr(module, name), timings, f"init_db.{name}")
+        )
+        for name, module in NESTED_PHASES.items()
+    ]
+    for patch in patches:
+        patch.start()
+    try:
+        tic = time.perf_counter()
+        await app.initialize([])
+        timings["initialize"] = time.perf_counter() - tic
+    finally:
+        for patch in patches:
+            patch.stop()
+        for user in app.users.values():
+            for spawner in user.spawners.values():
+                spawner.stop_polling()
+        for pc in app._periodic_callbacks.values():
+            pc.stop()
+        if getattr(app, "db", None) is not None:
+            app.db.close()
+            app.db.get_bind().dispose()
+        JupyterHub.clear_instance()
+        InProcessSpawner.stop_stand_in()
+    return timings
+
+
+def run_size(users, args, workdir):
+    """Create a database with `users` users, and time two startups with it"""
+    if args.db_url:
+        db_url = args.db_url
+    else:
+        db_url = f"sqlite:///{os.path.join(workdir, f'hub-{users}.sqlite')}"
+    groups = max(1, users // args.users_per_group)
+    spawners = int(users * args.running)
+    tic = time.perf_counter()
+    create_db(
+        db_url,
+        users=users,
+        groups=groups,
+        roles=args.roles,
+        spawners=spawners,
+        prefix=PREFIX,
+    )
+    print(
+        f"populated {users} users in {time.perf_counter() - tic:.1f}s",
+        file=sys.stderr,
+    )
+    config = hub_config(db_url, users, args.roles, os.urandom(32))
+    results = []
+    for startup in ("first", "restart"):
+        # a new event loop for each Hub
+        timings = asyncio.run(time_initialize(config, workdir))
+        print(
+            f"{startup:>8} users={users:<8} initialize={timings['initialize']:.2f}s",
+            file=sys.stderr,
+        )
+        results.append(
+            {
+                "startup": startup,
+                "users": users,
+                "groups": groups,
+                "roles": args.roles,
+                "running": spawners,
+                "timings": timings,
+            }
+        )
+    return results
+
+
+def scaling_exponents(results):
+    """Scaling exponents of each phase between consecutive sizes
+
+    The exponent k between sizes n1 < n2 is such that
+    t2 / t1 = (n2 / n1) ** k.
+    Phases faster than NOISE_FLOOR at the larger size are skipped.
+    """
+    exponents = []
+    for startup in ("first", "restart"):
+        runs = sorted(
+            (r for r in results if r["startup"] == startup), key=lambda r: r["users"]
+        )
+        for small, large in zip(runs, runs[1:]):
+            if small["users"] == large["users"]:
+                continue
+            for phase, t2 in large["timings"].items():
+                t1 = small["timings"].get(phase)
+                if not t1 or t2 < NOISE_FLOOR:
+                    continue
+                exponents.append(
+                    {
+                        "startup": startup,
+                        "phase": phase,
+                        "from_users": small["users"],
+                        "to_users": large["users"],
+                        "exponent": math.log(t2 / t1)
+                        / math.log(large["users"] / small["users"]),
+                    }
+                )
+    return exponents
+
+
+def print_report(results, exponents, max_exponent):
+    """Print a table of phase durations and scaling exponents"""
+    sizes = sorted({r["users"] for r in results})
+    phases = list(results[0]["timings"])
+    for startup in ("first", "restart"):
+        timings = {r["users"]: r["timings"] for r in results if r["startup"] == startup}
+        header = f"{startup + ' (s)':>32}" + "".join(f"{n:>12}" for n in sizes)
+        print(header)
+        print("-" * len(header))
+        for phase in phases:
+            print(
+                f"{phase:>32}"
+                + "".join(f"{timings[n].get(phase, 0):>12.3f}" for n in sizes)
+            )
+        print()
+    slow = [e for e in exponents if e["exponent"] > max_exponent]
+    for e in slow:
+        print(
+            f"{e['startup']} {e['phase']} scales as N^{e['exponent']:.2f}"
+            f" from {e['from_users']} to {e['to_users']} users"
+        )
+    return slow
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as workdir:
+        results = []
+        for users in args.users:
+            results.extend(run_size(users, args, workdir))
+    metadata = get_metadata(
+        db_url=args.db_url or "sqlite",
+        users_per_group=args.users_per_group,
+        roles=args.roles,
+        running=args.running,
+    )
+    exponents = scaling_exponents(results)
+    return {"metadata": metadata, "results": results, "exponents": exponents}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--users",
+        type=int,
+        nargs="+",
+        default=[1000, 10000, 100000],
+        help="Number of users in the database, one run per value",
+    )
+    parser.add_argument(
+        "--db-url",
+        help="Database URL to use instead of a temporary sqlite file."
+        " Tables are reset for each run!",
+    )
+    parser.add_argument(
+        "--users-per-group", type=int, default=10, help="Users in each group"
+    )
+    parser.add_argument(
+        "--roles", type=int, default=10, help="Custom roles assigned in config"
+    )
+    parser.add_argument(
+        "--running",
+        type=float,
+        default=0.01,
+        help="Fraction of users with a running server",
+    )
+    parser.add_argument(
+        "--max-exponent",
+        type=float,
+        default=1.5,
+        help="Fail if any phase scales worse than N to this power",
+    )
+    parser.add_argument("-o", "--output", help="Write results to this JSON file")
+    args = parser.parse_args()
+    report = main(args)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=1)
+    slow = print_report(report["results"], report["exponents"], args.max_exponent)
+    if slow:
+        sys.exit(1)
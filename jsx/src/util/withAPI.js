@@ -5,6 +5,8 @@ const withAPI = withProps(() => ({
   updateUsers: (options) => {
     let params = new URLSearchParams();
     params.set("include_stopped_servers", "1");
+    // reuse recently counted totals when flipping pages
+    params.set("count", "estimate");
     for (let key in options) {
       params.set(key, options[key]);
     }
@@ -13,9 +15,10 @@ const withAPI = withProps(() => ({
     );
   },
   updateGroups: (offset, limit) =>
-    jhapiRequest(`/groups?offset=${offset}&limit=${limit}`, "GET").then(
-      (data) => data.json(),
-    ),
+    jhapiRequest(
+      `/groups?offset=${offset}&limit=${limit}&count=estimate`,
+      "GET",
+    ).then((data) => data.json()),
   shutdownHub: () => jhapiRequest("/shutdown", "POST"),
   startServer: (name, serverName = "") =>
     jhapiRequest("/users/" + name + "/servers/" + (serverName || ""), "POST"),
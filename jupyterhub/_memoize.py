@@ -4,6 +4,7 @@ Note: a memoized function should always return an _immutable_
 result to avoid later modifications polluting cached results.
 """
 
+import time
 from collections import OrderedDict
 from functools import wraps
 
@@ -57,6 +58,42 @@ class LRUCache:
     __setitem__ = set
 
 
+_missing = object()
+
+
+class TTLCache(LRUCache):
+    """An LRUCache whose entries expire `ttl` seconds after they are set"""
+
+    def __init__(self, maxsize=1024, ttl=60):
+        super().__init__(maxsize=maxsize)
+        self.ttl = ttl
+
+    def __contains__(self, key):
+        return self.get(key, _missing) is not _missing
+
+    def get(self, key, default=None):
+        """Get an item from the cache, if it hasn't expired"""
+        entry = super().get(key)
+        if entry is None:
+            return default
+        value, expires_at = entry
+        if time.monotonic() >= expires_at:
+            del self._cache[key]
+            return default
+        return value
+
+    def set(self, key, value):
+        """Store an entry in the cache, expiring in `ttl` seconds"""
+        super().set(key, (value, time.monotonic() + self.ttl))
+
+    def clear(self):
+        """Remove all entries"""
+        self._cache.clear()
+
+    __getitem__ = get
+    __setitem__ = set
+
+
 def lru_cache_key(key_func, maxsize=1024):
     """Like functools.lru_cache, but takes a custom key function,
     as seen in sorted(key=func).
@@ -0,0 +1,31 @@
+"""Add config_fingerprints table
+
+Revision ID: 3471946089cc
+Revises: 4621fec11365
+Create Date: 2026-10-18 21:58:40.118353
+"""
+
+# revision identifiers, used by Alembic.
+revision = '3471946089cc'
+down_revision = '4621fec11365'
+branch_labels = None
+depends_on = None
+
+import sqlalchemy as sa
+from alembic import op
+
+
+def upgrade():
+    engine = op.get_bind().engine
+    tables = sa.inspect(engine).get_table_names()
+    if 'config_fingerprints' not in tables:
+        op.create_table(
+            'config_fingerprints',
+            sa.Column('name', sa.Unicode(255), primary_key=True),
+            sa.Column('fingerprint', sa.Unicode(255), nullable=False),
+            sa.Column('updated', sa.DateTime, nullable=True),
+        )
+
+
+def downgrade():
+    op.drop_table('config_fingerprints')
@@ -0,0 +1,70 @@
+"""Add indexes for frequent queries
+
+Indexes activity and expiry timestamps, spawners' users and servers,
+oauth codes, and replaces the token prefix indexes with (prefix, expires_at).
+
+Revision ID: a0f076c0bfbf
+Revises: 3471946089cc
+Create Date: 2026-10-18 23:40:12.483921
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'a0f076c0bfbf'
+down_revision = '3471946089cc'
+branch_labels = None
+depends_on = None
+
+import sqlalchemy as sa
+from alembic import op
+
+# (table, index name, columns)
+indexes = [
+    ('users', 'ix_users_last_activity', ['last_activity']),
+    ('spawners', 'ix_spawners_user_id', ['user_id']),
+    ('spawners', 'ix_spawners_server_id', ['server_id']),
+    ('api_tokens', 'ix_api_tokens_expires_at', ['expires_at']),
+    ('api_tokens', 'ix_api_tokens_prefix_expires_at', ['prefix', 'expires_at']),
+    ('oauth_codes', 'ix_oauth_codes_code', ['code']),
+    ('oauth_codes', 'ix_oauth_codes_expires_at', ['expires_at']),
+    ('shares', 'ix_shares_expires_at', ['expires_at']),
+    ('share_codes', 'ix_share_codes_expires_at', ['expires_at']),
+    ('share_codes', 'ix_share_codes_prefix_expires_at', ['prefix', 'expires_at']),
+]
+
+# single-column indexes covered by the new (prefix, expires_at) indexes
+replaced_indexes = [
+    ('api_tokens', 'ix_api_tokens_prefix', ['prefix']),
+    ('share_codes', 'ix_share_codes_prefix', ['prefix']),
+]
+
+
+def _existing_indexes(inspector, tables):
+    return {
+        (table, index['name'])
+        for table in tables
+        for index in inspector.get_indexes(table)
+    }
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+    existing = _existing_indexes(inspector, tables)
+    for table, name, columns in indexes:
+        if table in tables and (table, name) not in existing:
+            op.create_index(name, table, columns)
+    for table, name, columns in replaced_indexes:
+        if (table, name) in existing:
+            op.drop_index(name, table_name=table)
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+    existing = _existing_indexes(inspector, tables)
+    for table, name, columns in replaced_indexes:
+        if table in tables and (table, name) not in existing:
+            op.create_index(name, table, columns)
+    for table, name, columns in indexes:
+        if (table, name) in existing:
+            op.drop_index(name, table_name=table)
@@ -12,8 +12,10 @@ from sqlalchemy.exc import SQLAlchemyError
 from tornado import web
 
 from .. import orm
+from .._memoize import FrozenDict
 from ..handlers import BaseHandler
 from ..scopes import get_scopes_for
+from ..user import _user_progress_url, _user_url
 from ..utils import isoformat, url_escape_path, url_path_join
 
 PAGINATION_MEDIA_TYPE = "application/jupyterhub-pagination+json"
@@ -170,6 +172,9 @@ class APIHandler(BaseHandler):
     def server_model(self, spawner, *, user=None):
         """Get the JSON model for a Spawner
         Assume server permission already granted
+
+        .. versionchanged:: 5.3
+            `user` is no longer needed for an orm.Spawner, and is ignored.
         """
         if isinstance(spawner, orm.Spawner):
             # if an orm.Spawner is passed,
@@ -179,29 +184,31 @@ class APIHandler(BaseHandler):
             pending = None
             ready = False
             stopped = True
-            user = user
-            if user is None:
-                raise RuntimeError("Must specify User with orm.Spawner")
             state = orm_spawner.state
         else:
             orm_spawner = spawner.orm_spawner
             pending = spawner.pending
             ready = spawner.ready
-            user = spawner.user
             stopped = not spawner.active
             state = spawner.get_state()
+        # URLs only need the user's name, not a User wrapper
+        user_name = orm_spawner.user.name
 
         model = {
             'name': orm_spawner.name,
-            'full_name': f"{orm_spawner.user.name}/{orm_spawner.name}",
+            'full_name': f"{user_name}/{orm_spawner.name}",
             'last_activity': isoformat(orm_spawner.last_activity),
             'started': isoformat(orm_spawner.started),
             'pending': pending,
             'ready': ready,
             'stopped': stopped,
-            'url': url_path_join(user.url, url_escape_path(spawner.name), '/'),
+            'url': url_path_join(
+                _user_url(user_name, self.settings),
+                url_escape_path(spawner.name),
+                '/',
+            ),
             'user_options': spawner.user_options,
-            'progress_url': user.progress_url(spawner.name),
+            'progress_url': _user_progress_url(user_name, self.settings, spawner.name),
             'full_url': None,
             'full_progress_url': None,
         }
@@ -358,15 +365,12 @@ class APIHandler(BaseHandler):
                     servers[name] = self.server_model(spawner)
 
             if include_stopped_servers:
-                # add any stopped servers in the db
+                # add any stopped servers in the db,
+                # without creating User wrappers for inactive users
                 seen = set(servers.keys())
-                if isinstance(user, orm.User):
-                    # need high-level User wrapper for spawner model
-                    # FIXME: this shouldn't be needed!
-                    user = self.users[user]
                 for name, orm_spawner in user.orm_spawners.items():
                     if name not in seen and scope_filter(orm_spawner, kind='server'):
-                        servers[name] = self.server_model(orm_spawner, user=user)
+                        servers[name] = self.server_model(orm_spawner)
 
             if "servers" in allowed_keys or servers:
                 # omit servers if no access
@@ -521,7 +525,71 @@ class APIHandler(BaseHandler):
             )
         return offset, limit
 
-    def paginated_model(self, items, offset, limit, total_count):
+    def get_api_count(self):
+        """Get the `?count=` argument of a list request
+
+        - exact (default): count the total results of the query
+        - estimate: use a recently cached total, if there is one
+        - none: don't count, the total is null
+
+        .. versionadded:: 5.3
+        """
+        count = self.get_argument("count", "exact")
+        if count not in {"exact", "estimate", "none"}:
+            raise web.HTTPError(
+                400, f"count must be 'exact', 'estimate', or 'none', not {count!r}"
+            )
+        return count
+
+    def count_total(self, query, scope=None):
+        """Count the total results of a list query, according to `?count=`
+
+        Totals are cached by request path, arguments,
+        and the current user's filter on `scope`, which limits the results.
+        Returns None for `?count=none`.
+
+        .. versionadded:: 5.3
+        """
+        count = self.get_api_count()
+        if count == "none":
+            return None
+        cache = self.settings.get("list_count_cache")
+        if cache is None:
+            return query.count()
+
+        arguments = tuple(
+            sorted(
+                (name, tuple(values))
+                for name, values in self.request.query_arguments.items()
+                if name not in {"offset", "limit", "count"}
+            )
+        )
+        sub_scope = self.parsed_scopes.get(scope) if scope else None
+        if isinstance(sub_scope, dict):
+            sub_scope = FrozenDict(sub_scope)
+        cache_key = (self.request.path, arguments, sub_scope)
+        if count == "estimate":
+            total_count = cache.get(cache_key)
+            if total_count is not None:
+                return total_count
+        total_count = query.count()
+        cache.set(cache_key, total_count)
+        return total_count
+
+    def fetch_page(self, query, offset, limit):
+        """Fetch a page of results of a query
+
+        Fetches one extra row to tell if there's a next page,
+        without counting the results.
+
+        Returns (rows, has_next)
+
+        .. versionadded:: 5.3
+        """
+        rows = query.offset(offset).limit(limit + 1).all()
+        return rows[:limit], len(rows) > limit
+
+    def paginated_model(self, items, offset, limit, total_count, has_next=None):
         """Return the paginated form of a collection (list or dict)
 
         A dict with { items: [], _pagination: {}}
@@ -531,8 +599,14 @@ class APIHandler(BaseHandler):
         the total number of results for the query,
         and information about how to build the next page request
         if there is one.
+
+        has_next tells if there's a next page, e.g. from `fetch_page`.
+        It is preferred over total_count, which may be a cached estimate.
+        If it isn't given, it is computed from total_count.
         """
         next_offset = offset + limit
+        if has_next is None:
+            has_next = total_count is not None and next_offset < total_count
         data = {
             "items": items,
             "_pagination": {
@@ -542,7 +616,7 @@ class APIHandler(BaseHandler):
                 "next": None,
             },
         }
-        if next_offset < total_count:
+        if has_next:
             # if there's a next page
             next_url_parsed = urlparse(self.request.full_url())
             query = parse_qs(next_url_parsed.query, keep_blank_values=True)
@@ -49,7 +49,7 @@ class GroupListAPIHandler(_GroupAPIHandler):
     @needs_scope('list:groups')
     def get(self):
         """List groups"""
-        query = full_query = self.db.query(orm.Group)
+        query = full_query = self.read_db.query(orm.Group)
         sub_scope = self.parsed_scopes['list:groups']
         if sub_scope != Scope.ALL:
             if not set(sub_scope).issubset({'group'}):
@@ -62,16 +62,21 @@ class GroupListAPIHandler(_GroupAPIHandler):
             query = query.filter(orm.Group.name.in_(sub_scope['group']))
 
         offset, limit = self.get_api_pagination()
-        query = query.order_by(orm.Group.id.asc()).offset(offset).limit(limit)
-        group_list = [self.group_model(g) for g in query]
-        total_count = full_query.count()
+        orm_groups, has_next = self.fetch_page(
+            query.order_by(orm.Group.id.asc()), offset, limit
+        )
+        group_list = [self.group_model(g) for g in orm_groups]
+        total_count = self.count_total(full_query)
         if self.accepts_pagination:
-            data = self.paginated_model(group_list, offset, limit, total_count)
+            data = self.paginated_model(
+                group_list, offset, limit, total_count, has_next
+            )
         else:
-            query_count = query.count()
-            if offset == 0 and total_count > query_count:
+            if offset == 0 and has_next:
+                if total_count is None:
+                    total_count = "more"
                 self.log.warning(
-                    f"Truncated group list in request that does not expect pagination. Replying with {query_count} of {total_count} total groups."
+                    f"Truncated group list in request that does not expect pagination. Replying with {len(orm_groups)} of {total_count} total groups."
                 )
             data = group_list
         self.write(json.dumps(data))
@@ -106,8 +106,43 @@ class InfoAPIHandler(APIHandler):
         self.finish(json.dumps(data))
 
 
+class StallsAPIHandler(APIHandler):
+    @needs_scope('read:hub')
+    def get(self):
+        """GET /api/stalls returns the stacks sampled while the event loop was blocked
+
+        Requires `PeriodicMetricsCollector.event_loop_stall_profile_enabled`.
+
+        Query parameters:
+
+        - format: `json` (default) or `folded`, for flame graph tools
+        - limit: the number of most common stacks to return (json only)
+        """
+        collector = self.settings.get('metrics_collector')
+        profiler = collector and collector.stall_profiler
+        if profiler is None:
+            raise web.HTTPError(404, "Event loop stall profiling is not enabled")
+
+        fmt = self.get_argument('format', 'json')
+        if fmt == 'folded':
+            self.set_header('Content-Type', 'text/plain; charset=UTF-8')
+            self.finish(profiler.folded())
+            return
+        elif fmt != 'json':
+            raise web.HTTPError(400, f"format must be json or folded, not {fmt!r}")
+
+        limit = self.get_argument('limit', None)
+        if limit is not None:
+            try:
+                limit = int(limit)
+            except ValueError:
+                raise web.HTTPError(400, f"limit must be an integer, not {limit!r}")
+        self.finish(json.dumps(profiler.report(limit=limit)))
+
+
 default_handlers = [
     (r"/api/shutdown", ShutdownAPIHandler),
     (r"/api/?", RootAPIHandler),
     (r"/api/info", InfoAPIHandler),
+    (r"/api/stalls", StallsAPIHandler),
 ]
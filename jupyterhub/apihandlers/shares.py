@@ -153,7 +153,13 @@ class _ShareAPIHandler(APIHandler):
                 f"kind must be `share` or `code`, not {kind!r}"
             )  # pragma: no cover
 
-        query = self.db.query(class_).options(
+        if kind == "share":
+            db = self.read_db
+        else:
+            # share codes are usually listed right after creating them,
+            # which a read replica may not have yet
+            db = self.db
+        query = db.query(class_).options(
             joinedload(class_.owner).lazyload("*"),
             joinedload(class_.spawner).joinedload(orm.Spawner.user).lazyload("*"),
         )
@@ -181,10 +187,12 @@ class _ShareAPIHandler(APIHandler):
         elif kind == "code":
             class_ = orm.ShareCode
 
-        total_count = query.count()
-        query = query.order_by(class_.id.asc()).offset(offset).limit(limit)
-        share_list = [model_method(share) for share in query if not share.expired]
-        return self.paginated_model(share_list, offset, limit, total_count)
+        total_count = self.count_total(query)
+        shares, has_next = self.fetch_page(
+            query.order_by(class_.id.asc()), offset, limit
+        )
+        share_list = [model_method(share) for share in shares if not share.expired]
+        return self.paginated_model(share_list, offset, limit, total_count, has_next)
 
     def _lookup_spawner(self, user_name, server_name, raise_404=True):
         """Lookup orm.Spawner for user_name/server_name
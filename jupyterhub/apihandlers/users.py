@@ -3,9 +3,11 @@
 # Copyright (c) Jupyter Development Team.
 # Distributed under the terms of the Modified BSD License.
 import asyncio
+import hashlib
 import inspect
 import json
 import sys
+import time
 from datetime import timedelta, timezone
 
 if sys.version_info >= (3, 10):
@@ -19,7 +21,7 @@ from sqlalchemy.orm import joinedload, raiseload, selectinload  # noqa
 from tornado import web
 from tornado.iostream import StreamClosedError
 
-from .. import orm, scopes
+from .. import crypto, orm, scopes
 from ..roles import assign_default_roles
 from ..scopes import needs_scope
 from ..user import User
@@ -80,8 +82,38 @@ class SelfAPIHandler(APIHandler):
         # add scopes to identify model,
         # but not the scopes we added to ensure we could read our own model
         model["scopes"] = sorted(self.expanded_scopes.difference(_added_scopes))
+        if token and token.oauth_client and self.settings.get("identity_key"):
+            model["identity_assertion"] = self._identity_assertion(model, token)
         self.write(json.dumps(model))
 
+    def _identity_assertion(self, model, token):
+        """Sign an assertion of the identity in model, for the token's OAuth client
+
+        Lets the client verify the identity locally until it expires,
+        instead of asking the Hub for every request.
+        """
+        max_age = self.settings["identity_assertion_max_age"]
+        expires_in = token.expires_in
+        if expires_in is not None:
+            max_age = min(max_age, expires_in)
+        claims = {
+            key: model.get(key)
+            for key in ("kind", "name", "admin", "groups", "scopes")
+            if key in model
+        }
+        claims.update(
+            token_id=model["token_id"],
+            session_id=model["session_id"],
+            # the client the assertion is for
+            aud=token.oauth_client.identifier,
+            # bind the assertion to the token it was issued for
+            token_hash=hashlib.sha256(
+                self.get_auth_token().encode("utf8", "replace")
+            ).hexdigest(),
+            exp=time.time() + max_age,
+        )
+        return crypto.sign_identity(self.settings["identity_key"], claims)
+
 
 class UserListAPIHandler(APIHandler):
     def _user_has_ready_spawner(self, orm_user):
@@ -127,7 +159,13 @@ class UserListAPIHandler(APIHandler):
         post_filter = None
 
         # starting query
-        query = self.db.query(orm.User)
+        if state_filter:
+            # server state reflects the Hub's own recent changes,
+            # which a read replica may not have yet
+            db = self.db
+        else:
+            db = self.read_db
+        query = db.query(orm.User)
 
         if state_filter in {"active", "ready"}:
             # only get users with active servers
@@ -201,23 +239,26 @@ class UserListAPIHandler(APIHandler):
             query = query.filter(orm.User.name.ilike(f'%{name_filter}%'))
 
         full_query = query
-        query = query.order_by(*sort_order).offset(offset).limit(limit)
+        orm_users, has_next = self.fetch_page(
+            query.order_by(*sort_order), offset, limit
+        )
 
         user_list = []
-        for u in query:
+        for u in orm_users:
             if post_filter is None or post_filter(u):
                 user_model = self.user_model(u)
                 if user_model:
                     user_list.append(user_model)
 
-        total_count = full_query.count()
+        total_count = self.count_total(full_query, 'list:users')
         if self.accepts_pagination:
-            data = self.paginated_model(user_list, offset, limit, total_count)
+            data = self.paginated_model(user_list, offset, limit, total_count, has_next)
         else:
-            query_count = query.count()
-            if offset == 0 and total_count > query_count:
+            if offset == 0 and has_next:
+                if total_count is None:
+                    total_count = "more"
                 self.log.warning(
-                    f"Truncated user list in request that does not expect pagination. Processing {query_count} of {total_count} total users."
+                    f"Truncated user list in request that does not expect pagination. Processing {len(orm_users)} of {total_count} total users."
                 )
             data = user_list
 
@@ -341,7 +382,8 @@ class UserAPIHandler(APIHandler):
             raise web.HTTPError(404)
         if user.name == self.current_user.name:
             raise web.HTTPError(400, "Cannot delete yourself!")
-        if user.spawner._stop_pending:
+        spawner = user.spawner_view()
+        if spawner is not None and spawner.pending == 'stop':
             raise web.HTTPError(
                 400,
                 f"{user_name}'s server is in the process of stopping, please wait.",
@@ -789,6 +831,7 @@ class SpawnProgressAPIHandler(APIHandler):
 
     def on_finish(self):
         self._finish_future.set_result(None)
+        super().on_finish()
 
     async def keepalive(self):
         """Write empty lines periodically
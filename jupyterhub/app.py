@@ -6,6 +6,8 @@
 import asyncio
 import atexit
 import binascii
+import hmac
+import json
 import logging
 import os
 import re
@@ -20,6 +22,7 @@ from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from functools import partial
 from getpass import getuser
+from itertools import chain
 from operator import itemgetter
 from pathlib import Path
 from textwrap import dedent
@@ -29,8 +32,6 @@ from urllib.parse import unquote, urlparse, urlunparse
 import tornado.httpserver
 import tornado.options
 from dateutil.parser import parse as parse_date
-from jinja2 import ChoiceLoader, Environment, FileSystemLoader, PrefixLoader
-from jupyter_events.logger import EventLogger
 from sqlalchemy.exc import OperationalError, SQLAlchemyError
 from sqlalchemy.orm import joinedload
 from tornado import gen, web
@@ -60,8 +61,9 @@ here = os.path.dirname(__file__)
 
 import jupyterhub
 
-from . import apihandlers, crypto, dbutil, handlers, orm, roles, scopes
+from . import crypto, dbutil, orm, roles, scopes
 from ._data import DATA_FILES_PATH
+from ._memoize import TTLCache
 
 # classes for config
 from .auth import Authenticator, PAMAuthenticator
@@ -69,16 +71,21 @@ from .crypto import CryptKeeper
 
 # For faking stats
 from .emptyclass import EmptyClass
-from .handlers.static import CacheControlStaticFilesHandler, LogoHandler
 from .log import CoroutineLogFormatter, log_request
 from .metrics import (
+    EXPIRED_PURGED,
     HUB_STARTUP_DURATION_SECONDS,
     INIT_SPAWNERS_DURATION_SECONDS,
+    PURGE_EXPIRED_DURATION_SECONDS,
     RUNNING_SERVERS,
     TOTAL_USERS,
+    USER_CACHE_SIZE,
+    DBEngine,
+    ExpiredKind,
     PeriodicMetricsCollector,
+    UserCacheKind,
+    register_engine_metrics,
 )
-from .oauth.provider import make_provider
 from .objects import Hub, Server
 from .proxy import ConfigurableHTTPProxy, Proxy
 from .services.service import Service
@@ -150,6 +157,14 @@ hub_flags = {
         Only SQLite database files will be backed up automatically.
         """,
     ),
+    'full-init': (
+        {'JupyterHub': {'skip_unchanged_init': False}},
+        """Load all config into the database on startup,
+        even if it is unchanged since the last startup.
+
+        Overrides JupyterHub.skip_unchanged_init.
+        """,
+    ),
     'no-ssl': (
         {'JupyterHub': {'confirm_no_ssl': True}},
         "[DEPRECATED in 0.7: does nothing]",
@@ -282,7 +297,23 @@ class JupyterHub(Application):
 
     @default('classes')
     def _load_classes(self):
-        classes = {Spawner, Authenticator, CryptKeeper}
+        # entry point classes are only needed for help output and config files,
+        # and loading them can be slow, so they are added on demand
+        # by _load_entry_point_classes
+        return [Spawner, Authenticator, CryptKeeper]
+
+    _entry_point_classes_loaded = False
+
+    def _load_entry_point_classes(self):
+        """Add configurable classes from entry points to self.classes
+
+        Only called when generating help output or config files,
+        which are the only places that need the full class list.
+        """
+        if self._entry_point_classes_loaded:
+            return
+        self._entry_point_classes_loaded = True
+        classes = set(self.classes)
         for name, trait in self.traits(config=True).items():
             # load entry point groups into configurable class list
             # so that they show up in config files, etc.
@@ -298,9 +329,23 @@ class JupyterHub(Application):
                             e,
                         )
                         continue
-                    if issubclass(cls, Configurable):
+                    if issubclass(cls, Configurable) and cls not in classes:
                         classes.add(cls)
-        return list(classes)
+                        self.classes.append(cls)
+
+    def emit_help(self, classes=False):
+        if classes:
+            self._load_entry_point_classes()
+        yield from super().emit_help(classes=classes)
+
+    def document_config_options(self):
+        self._load_entry_point_classes()
+        return super().document_config_options()
+
+    def generate_config_file(self, classes=None):
+        if classes is None:
+            self._load_entry_point_classes()
+        return super().generate_config_file(classes)
 
     load_groups = Dict(
         Union([Dict(), List()]),
@@ -429,6 +474,31 @@ class JupyterHub(Application):
         """,
     ).tag(config=True)
 
+    identity_assertion_max_age = Integer(
+        0,
+        help="""Max age (in seconds) of signed identity assertions.
+
+        If set, the Hub's response to `GET /hub/api/user` for OAuth tokens
+        includes a short-lived `identity_assertion`,
+        signed with a key derived from the cookie secret.
+        Single-user servers and services using :class:`.HubOAuth`
+        can verify it locally with the public key in $JUPYTERHUB_IDENTITY_PUBLIC_KEY,
+        and skip asking the Hub about the same browser session until it expires.
+
+        Changes to a user's permissions (including revoked tokens)
+        may take up to this long to take effect.
+
+        Requires the `cryptography` package.
+        Default: 0 (disabled).
+
+        .. versionadded:: 5.3
+        """,
+    ).tag(config=True)
+
+    identity_key = Any(
+        help="The private key for signing identity assertions, if enabled."
+    )
+
     oauth_token_expires_in = Integer(
         help="""Expiry (in seconds) of OAuth access tokens.
 
@@ -502,6 +572,49 @@ class JupyterHub(Application):
     last_activity_interval = Integer(
         300, help="Interval (in seconds) at which to update last-activity timestamps."
     ).tag(config=True)
+    user_cache_max_idle = Float(
+        3600,
+        help="""
+        Seconds after which the in-memory objects of an idle user are released.
+
+        The Hub keeps a User object, with a Spawner object for each server it has used,
+        for every user handled since startup.
+        Users with no running or pending servers
+        who haven't been used in this many seconds are removed from memory,
+        and are loaded from the database again when needed.
+
+        Set to 0 to keep users in memory until the Hub restarts.
+
+        .. versionadded:: 5.3
+        """,
+    ).tag(config=True)
+
+    user_cache_max_size = Integer(
+        0,
+        help="""
+        Maximum number of users to keep in memory.
+
+        When there are more, the least recently used users
+        with no running or pending servers are removed from memory.
+        Users with active servers are always kept,
+        so the cache may still be larger than this.
+
+        0 means no limit.
+
+        .. versionadded:: 5.3
+        """,
+    ).tag(config=True)
+
+    user_cache_evict_interval = Integer(
+        60,
+        help="""
+        Interval (in seconds) at which to remove idle users from memory,
+        according to `user_cache_max_idle` and `user_cache_max_size`.
+
+        .. versionadded:: 5.3
+        """,
+    ).tag(config=True)
+
     proxy_check_interval = Integer(
         5,
         help="DEPRECATED since version 0.8: Use ConfigurableHTTPProxy.check_running_interval",
@@ -1235,6 +1348,24 @@ class JupyterHub(Application):
         200, help="The maximum amount of records that can be returned at once"
     ).tag(config=True)
 
+    api_count_cache_ttl = Float(
+        30,
+        help="""
+        Seconds to cache the total counts of paginated list endpoints.
+
+        Requests with `?count=estimate` (like the admin page) reuse a cached total
+        instead of counting the results again,
+        which can cost more than fetching a page.
+        Cached totals are cleared when users, groups, servers, or shares
+        are added or removed, and expire after this many seconds.
+        `?count=exact` (the default) always counts.
+
+        Set to 0 to disable caching.
+
+        .. versionadded:: 5.3
+        """,
+    ).tag(config=True)
+
     authenticate_prometheus = Bool(
         True, help="Authentication for prometheus metrics"
     ).tag(config=True)
@@ -1495,9 +1626,98 @@ class JupyterHub(Application):
     db_kwargs = Dict(
         help="""Include any kwargs to pass to the database connection.
         See sqlalchemy.create_engine for details.
+
+        For sqlite, the `sqlite_pragmas` key overrides the pragmas
+        set on each connection (None to not set one).
+        By default, sqlite databases are put in WAL mode,
+        which does not work on network filesystems such as NFS.
+        To keep a rollback journal instead::
+
+            c.JupyterHub.db_kwargs = {"sqlite_pragmas": {"journal_mode": "DELETE"}}
+
+        .. versionchanged:: 5.3
+            Added `sqlite_pragmas`. sqlite databases use WAL mode by default.
         """
     ).tag(config=True)
 
+    db_ping_interval = Float(
+        0,
+        help="""Only check database connections that have been idle for longer than this (in seconds).
+
+        Before using a connection from the pool,
+        JupyterHub checks that it still works with a `SELECT 1`,
+        so that connections closed by the database server or network
+        are replaced instead of failing a request.
+        By default (0), this is done every time a connection is used,
+        which is one extra round trip to the database per request.
+
+        Set this to a number of seconds shorter than the database server's
+        (or any proxy's) idle connection timeout,
+        to only check connections that may have been closed.
+        The duration of checks is reported in the `jupyterhub_db_ping_duration_seconds` metric.
+
+        .. versionadded:: 5.3
+        """,
+    ).tag(config=True)
+
+    sqlite_checkpoint_interval = Integer(
+        300,
+        help="""Interval (in seconds) at which to checkpoint the sqlite write-ahead log.
+
+        Only used for sqlite databases in WAL mode (the default).
+        WAL mode needs all processes using the database on one host,
+        and does not work on network filesystems such as NFS.
+        Set `journal_mode` to `DELETE` there, as below.
+        SQLite also checkpoints automatically when the log grows
+        past the `wal_autocheckpoint` pragma (1000 pages by default),
+        but that can be delayed by long reads.
+        Periodic checkpoints move changes into the database file
+        while the Hub is quiet, keeping the log small.
+        They run in a thread on their own connection,
+        so copying pages and syncing the database file to disk
+        doesn't block the event loop.
+        Set to 0 to disable.
+
+        Pragmas for sqlite, including `journal_mode`,
+        can be set with the `sqlite_pragmas` key of `db_kwargs`, e.g.::
+
+            c.JupyterHub.db_kwargs = {"sqlite_pragmas": {"journal_mode": "DELETE"}}
+
+        .. versionadded:: 5.3
+        """,
+    ).tag(config=True)
+
+    db_read_url = Unicode(
+        '',
+        help="""url for a read replica of the database, e.g. `postgresql://replica/jupyterhub`.
+
+        If set, read-only REST API requests listing many entries
+        (GET /api/users, /api/groups, and shares)
+        query the replica instead of the primary database (`db_url`),
+        so they don't compete with writes.
+        Results may lag behind the primary by the replication delay.
+        Requests that depend on the Hub's own recent changes,
+        such as listing users by server state,
+        still query the primary.
+
+        .. versionadded:: 5.3
+        """,
+    ).tag(config=True)
+
+    db_read_kwargs = Dict(
+        help="""kwargs to pass to the read replica database connection.
+
+        Default: the same as `db_kwargs`.
+        See sqlalchemy.create_engine for details.
+
+        .. versionadded:: 5.3
+        """
+    ).tag(config=True)
+
+    @default('db_read_kwargs')
+    def _default_db_read_kwargs(self):
+        return dict(self.db_kwargs)
+
     upgrade_db = Bool(
         False,
         help="""Upgrade the database automatically on start.
@@ -1507,10 +1727,34 @@ class JupyterHub(Application):
     """,
     ).tag(config=True)
     reset_db = Bool(False, help="Purge and reset the database.").tag(config=True)
+    skip_unchanged_init = Bool(
+        False,
+        help="""Skip loading config into the database on startup if it is unchanged.
+
+        On startup, JupyterHub loads users, groups, roles and tokens
+        from configuration into the database,
+        which can take a long time with many users.
+        If True, a fingerprint of the relevant configuration
+        (allowed_users, admin_users, load_groups, load_roles, custom_scopes, services, api_tokens)
+        is stored in the database, and loading each part of the config is skipped
+        if it has not changed since the last startup.
+
+        This means changes made via the REST API to entities defined in config
+        (e.g. removing a user from a group in load_groups)
+        are not reverted on restart unless the config has changed.
+        Start with `jupyterhub --full-init` to force loading all config.
+
+        Role assignment is always loaded if the Authenticator manages roles.
+
+        .. versionadded:: 5.3
+        """,
+    ).tag(config=True)
     debug_db = Bool(
         False, help="log all database transactions. This has A LOT of output"
     ).tag(config=True)
     session_factory = Any()
+    read_session_factory = Any()
+    list_count_cache = Any()
 
     users = Instance(UserDict)
 
@@ -1778,6 +2022,11 @@ class JupyterHub(Application):
     _periodic_callbacks = Dict()
 
     def init_handlers(self):
+        # handlers are only needed to run the Hub,
+        # not for subcommands such as `jupyterhub token`
+        from . import apihandlers, handlers
+        from .handlers.static import LogoHandler
+
         h = []
         # load handlers from the authenticator
         h.extend(self.authenticator.get_handlers(self))
@@ -1890,6 +2139,15 @@ class JupyterHub(Application):
         # store the loaded trait value
         self.cookie_secret = secret
 
+        if self.identity_assertion_max_age:
+            try:
+                self.identity_key = crypto.identity_signing_key(secret)
+            except crypto.CryptographyUnavailable:
+                self.log.critical(
+                    "identity_assertion_max_age requires the cryptography package"
+                )
+                self.exit(1)
+
     def init_internal_ssl(self):
         """Create the certs needed to turn on internal SSL."""
 
@@ -1991,25 +2249,34 @@ class JupyterHub(Application):
             )
             AsyncHTTPClient.configure(None, defaults={"ssl_options": ssl_context})
 
-    def init_db(self):
-        """Create the database connection"""
-
-        urlinfo = urlparse(self.db_url)
+    @staticmethod
+    def _db_log_url(db_url):
+        """Return a database url for logging, without the password"""
+        urlinfo = urlparse(db_url)
         if urlinfo.password:
             # avoid logging the database password
             urlinfo = urlinfo._replace(
                 netloc=f'{urlinfo.username}:[redacted]@{urlinfo.hostname}:{urlinfo.port}'
             )
-            db_log_url = urlinfo.geturl()
+            return urlinfo.geturl()
         else:
-            db_log_url = self.db_url
+            return db_url
+
+    def init_db(self):
+        """Create the database connection"""
+
+        db_log_url = self._db_log_url(self.db_url)
         self.log.debug("Connecting to db: %s", db_log_url)
         if self.upgrade_db:
             dbutil.upgrade_if_needed(self.db_url, log=self.log)
 
         try:
             self.session_factory = orm.new_session_factory(
-                self.db_url, reset=self.reset_db, echo=self.debug_db, **self.db_kwargs
+                self.db_url,
+                reset=self.reset_db,
+                echo=self.debug_db,
+                ping_interval=self.db_ping_interval,
+                **self.db_kwargs,
             )
             self.db = self.session_factory()
         except OperationalError as e:
@@ -2029,6 +2296,27 @@ class JupyterHub(Application):
             self.exit(1)
         except orm.DatabaseSchemaMismatch as e:
             self.exit(e)
+        register_engine_metrics(self.db.get_bind(), DBEngine.primary)
+        if self.api_count_cache_ttl > 0:
+            self.list_count_cache = TTLCache(ttl=self.api_count_cache_ttl)
+            orm.register_count_invalidation(self.db, self.list_count_cache)
+        else:
+            self.list_count_cache = None
+
+        if self.db_read_url:
+            self.log.info(
+                "Using read replica for listing: %s",
+                self._db_log_url(self.db_read_url),
+            )
+            self.read_session_factory = orm.new_read_session_factory(
+                self.db_read_url,
+                echo=self.debug_db,
+                ping_interval=self.db_ping_interval,
+                **self.db_read_kwargs,
+            )
+            register_engine_metrics(self.read_session_factory.kw['bind'], DBEngine.read)
+        else:
+            self.read_session_factory = None
 
         # ensure the default oauth client exists
         if (
@@ -2050,6 +2338,57 @@ class JupyterHub(Application):
             self.db.add(client)
             self.db.commit()
 
+    def _sqlite_wal_enabled(self):
+        """Is the Hub database sqlite in WAL mode?"""
+        engine = self.db.get_bind()
+        if engine.dialect.name != "sqlite":
+            return False
+        with engine.connect() as connection:
+            journal_mode = connection.exec_driver_sql("PRAGMA journal_mode").scalar()
+        return journal_mode.lower() == "wal"
+
+    @staticmethod
+    def _checkpoint_sqlite(engine):
+        """Run a passive checkpoint on a new connection
+
+        Runs in a thread, so it gets the engine rather than using self.db.
+        """
+        with engine.connect() as connection:
+            return connection.exec_driver_sql("PRAGMA wal_checkpoint(PASSIVE)").one()
+
+    @catch_db_error
+    async def checkpoint_sqlite(self):
+        """Checkpoint the sqlite write-ahead log
+
+        Copies committed changes from the log into the database file,
+        without waiting for readers or writers.
+        Copying pages and the fsync that follows run in a thread,
+        so they don't block the event loop.
+
+        run periodically
+        """
+        tic = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        busy, log_pages, checkpointed = await loop.run_in_executor(
+            None, self._checkpoint_sqlite, self.db.get_bind()
+        )
+        self.log.debug(
+            "Checkpointed %i/%i pages of sqlite write-ahead log in %.3fs%s",
+            checkpointed,
+            log_pages,
+            time.perf_counter() - tic,
+            " (busy)" if busy else "",
+        )
+
+    def evict_idle_users(self):
+        """Remove idle users from memory
+
+        run periodically
+        """
+        self.users.evict_idle(
+            max_idle=self.user_cache_max_idle, max_size=self.user_cache_max_size
+        )
+
     def init_hub(self):
         """Load the Hub URL config"""
         if self.public_url:
@@ -2106,6 +2445,53 @@ class JupyterHub(Application):
         if self.internal_ssl:
             self.hub.proto = 'https'
 
+    def _check_config_fingerprint(self, name, *config):
+        """Check whether config for one step of initialization has changed
+
+        Fingerprints are keyed with the cookie secret,
+        so that they don't reveal anything about config contents (e.g. api_tokens).
+
+        Returns:
+          (unchanged, fingerprint): unchanged is True if the step can be skipped.
+          fingerprint should be stored with _store_config_fingerprint
+          after the step completes.
+        """
+
+        def _json_default(obj):
+            if isinstance(obj, (set, frozenset)):
+                return sorted(obj)
+            return repr(obj)
+
+        key = self.cookie_secret
+        if isinstance(key, str):
+            key = key.encode("utf8")
+        config_json = json.dumps(
+            [jupyterhub.__version__, config], sort_keys=True, default=_json_default
+        )
+        fingerprint = hmac.new(
+            key, config_json.encode("utf8"), digestmod="sha256"
+        ).hexdigest()
+        if not self.skip_unchanged_init:
+            return False, fingerprint
+        stored = orm.ConfigFingerprint.find(self.db, name)
+        unchanged = stored is not None and hmac.compare_digest(
+            stored.fingerprint, fingerprint
+        )
+        if unchanged:
+            self.log.info("Config for %s is unchanged since last startup", name)
+        return unchanged, fingerprint
+
+    def _store_config_fingerprint(self, name, fingerprint):
+        """Store the fingerprint of config after it has been loaded
+
+        Does not commit.
+        """
+        stored = orm.ConfigFingerprint.find(self.db, name)
+        if stored is None:
+            stored = orm.ConfigFingerprint(name=name)
+            self.db.add(stored)
+        stored.fingerprint = fingerprint
+
     async def init_users(self):
         """Load users into and from the database"""
         db = self.db
@@ -2139,19 +2525,6 @@ class JupyterHub(Application):
             if not self.authenticator.validate_username(username):
                 raise ValueError(f"username {username!r} is not valid")
 
-        new_users = []
-
-        for name in admin_users:
-            # ensure anyone specified as admin in config is admin in db
-            user = orm.User.find(db, name)
-            if user is None:
-                user = orm.User(name=name, admin=True)
-                db.add(user)
-                roles.assign_default_roles(self.db, entity=user)
-                new_users.append(user)
-            else:
-                user.admin = True
-
         # the admin_users config variable will never be used after this point.
         # only the database values will be referenced.
         allowed_users = [
@@ -2167,15 +2540,49 @@ class JupyterHub(Application):
             # make sure admin users are in the allowed_users set, if defined,
             # otherwise they won't be able to login
             self.authenticator.allowed_users |= self.authenticator.admin_users
+        # allowed_users from config, before add_users adds users from the db,
+        # for the role_assignment fingerprint
+        self._config_allowed_users = set(self.authenticator.allowed_users)
 
-        # add allowed users to the db
-        for name in allowed_users:
-            user = orm.User.find(db, name)
-            if user is None:
-                user = orm.User(name=name)
+        admin_user_set = set(admin_users)
+        unchanged, fingerprint = self._check_config_fingerprint(
+            "users", admin_user_set, set(allowed_users)
+        )
+        if not unchanged:
+            # look up all users from config at once,
+            # rather than one query per name
+            existing_users = orm.find_by_names(
+                db, orm.User, admin_user_set.union(allowed_users)
+            )
+
+            # ensure anyone specified as admin in config is admin in db
+            for name in admin_user_set.intersection(existing_users):
+                existing_users[name].admin = True
+
+            # add new admin and allowed users to the db
+            new_users = []
+            for name in chain(admin_users, allowed_users):
+                if name in existing_users:
+                    continue
+                user = orm.User(name=name, admin=name in admin_user_set)
+                existing_users[name] = user
                 new_users.append(user)
-                db.add(user)
 
+            if new_users:
+                self.log.info("Adding %i users from config", len(new_users))
+                db.add_all(new_users)
+                db.flush()
+                # assign default roles in bulk
+                # new users have no roles yet
+                roles.grant_role_bulk(db, new_users, "user", commit=False)
+                roles.grant_role_bulk(
+                    db,
+                    [user for user in new_users if user.admin],
+                    "admin",
+                    commit=False,
+                )
+
+            self._store_config_fingerprint("users", fingerprint)
         db.commit()
 
         # Notify authenticator of all users.
@@ -2183,18 +2590,21 @@ class JupyterHub(Application):
         # This lets .allowed_users be used to set up initial list,
         # but changes to the allowed_users set can occur in the database,
         # and persist across sessions.
-        total_users = 0
         blocked_users = self.authenticator.blocked_users
-        for user in db.query(orm.User):
-            if user.name in blocked_users:
-                # don't call add_user with blocked users
-                continue
-            try:
-                f = self.authenticator.add_user(user)
-                if f:
-                    await maybe_future(f)
-            except Exception:
-                self.log.exception("Error adding user %s already in db", user.name)
+        # don't call add_user with blocked users
+        users_to_add = [
+            user for user in db.query(orm.User) if user.name not in blocked_users
+        ]
+        failed = await maybe_future(self.authenticator.add_users(users_to_add))
+        failed = failed or {}
+        total_users = 0
+        for user in users_to_add:
+            if user.name in failed:
+                self.log.error(
+                    "Error adding user %s already in db",
+                    user.name,
+                    exc_info=failed[user.name],
+                )
                 if self.authenticator.delete_invalid_users:
                     self.log.warning(
                         "Deleting invalid user %s from the Hub database", user.name
@@ -2227,6 +2637,12 @@ class JupyterHub(Application):
         # to the allowed_users set and user db, unless the allowed set is empty (all users allowed).
 
         TOTAL_USERS.set(total_users)
+        USER_CACHE_SIZE.labels(kind=UserCacheKind.user).set_function(
+            lambda: len(self.users)
+        )
+        USER_CACHE_SIZE.labels(kind=UserCacheKind.spawner).set_function(
+            lambda: self.users.count_spawners()
+        )
 
     async def _get_or_create_user(self, username, hint):
         """Create user if username is found in config but user does not exist"""
@@ -2280,6 +2696,12 @@ class JupyterHub(Application):
         if self.authenticator.manage_groups and self.load_groups:
             raise ValueError("Group management has been offloaded to the authenticator")
 
+        unchanged, fingerprint = self._check_config_fingerprint(
+            "groups", self.load_groups
+        )
+        if unchanged:
+            return
+
         for name, contents in self.load_groups.items():
             self.log.debug("Loading group %s", name)
             group = orm.Group.find(db, name)
@@ -2313,6 +2735,7 @@ class JupyterHub(Application):
                     )
                     group.properties = group_properties
 
+        self._store_config_fingerprint("groups", fingerprint)
         db.commit()
 
     async def init_role_creation(self):
@@ -2321,6 +2744,15 @@ class JupyterHub(Application):
             self.log.info(f"Defining {len(self.custom_scopes)} custom scopes.")
             scopes.define_custom_scopes(self.custom_scopes)
 
+        unchanged, fingerprint = self._check_config_fingerprint(
+            "roles", self.load_roles, self.custom_scopes
+        )
+        if unchanged and not self.authenticator.manage_roles:
+            # roles are already in the database,
+            # so this can't be an rbac upgrade
+            self._rbac_upgrade = False
+            return
+
         roles_to_load = self.load_roles[:]
 
         if self.authenticator.manage_roles and self.load_roles:
@@ -2423,24 +2855,72 @@ class JupyterHub(Application):
         for role in init_roles:
             roles.create_role(self.db, role, commit=False)
 
+        self._store_config_fingerprint("roles", fingerprint)
         self.db.commit()
 
+    async def _get_or_create_users(self, usernames, hint):
+        """Create any users found in config that do not exist
+
+        Bulk version of _get_or_create_user.
+
+        Returns dict of {username: orm.User}
+        """
+        db = self.db
+        users = orm.find_by_names(db, orm.User, usernames)
+        new_users = []
+        for username in usernames:
+            if username in users:
+                continue
+            if not self.authenticator.validate_username(username):
+                raise ValueError(f"Username {username!r} is not valid")
+            self.log.info(f"Creating user {username} found in {hint}")
+            user = users[username] = orm.User(name=username)
+            new_users.append(user)
+        if new_users:
+            db.add_all(new_users)
+            db.flush()
+            roles.grant_role_bulk(db, new_users, "user", commit=False)
+            db.commit()
+            failed = await maybe_future(self.authenticator.add_users(new_users))
+            if failed:
+                # match _get_or_create_user, which raises from add_user
+                raise next(iter(failed.values()))
+        return users
+
     async def init_role_assignment(self):
         # tokens are added separately
         kinds = ['users', 'services', 'groups']
         admin_role_objects = ['users', 'services']
         config_admin_users = set(self.authenticator.admin_users)
         db = self.db
+
+        unchanged, fingerprint = self._check_config_fingerprint(
+            "role_assignment",
+            self.load_roles,
+            config_admin_users,
+            getattr(self, '_config_allowed_users', self.authenticator.allowed_users),
+            self.load_groups,
+            self.services,
+        )
+        if (
+            unchanged
+            and not self.authenticator.manage_roles
+            and not getattr(self, '_rbac_upgrade', False)
+        ):
+            return
+
         # start by marking all role role assignments from authenticator as stale
-        stale_managed_role_assignment = {}
+        # assignments are tracked as (entity_id, role_id) tuples
+        stale_managed_role_assignment = {kind: set() for kind in kinds}
         if self.authenticator.reset_managed_roles_on_startup:
             for kind in kinds:
                 entity_name = kind[:-1]
                 association_class = orm._role_associations[entity_name]
+                kind_id = getattr(association_class, f'{entity_name}_id')
                 stale_managed_role_assignment[kind] = set(
-                    db.query(association_class)
-                    .filter(association_class.managed_by_auth == True)
-                    .all()
+                    db.query(kind_id, association_class.role_id).filter(
+                        association_class.managed_by_auth == True
+                    )
                 )
 
         roles_to_load_assignments_from = self.load_roles[:]
@@ -2470,6 +2950,7 @@ class JupyterHub(Application):
         for role_spec in roles_to_load_assignments_from:
             role = orm.Role.find(db, name=role_spec['name'])
             role_name = role_spec["name"]
+            managed = role_spec.get('managed_by_auth', False)
             if role_name == 'admin':
                 for kind in admin_role_objects:
                     has_admin_role_spec[kind] = kind in role_spec
@@ -2482,73 +2963,64 @@ class JupyterHub(Application):
             # add users, services, and/or groups,
             # tokens need to be checked for permissions
             for kind in kinds:
-                orm_role_bearers = []
                 if kind in role_spec:
-                    for name in role_spec[kind]:
-                        if kind == 'users':
-                            name = self.authenticator.normalize_username(name)
+                    names = list(role_spec[kind])
+                    if kind == 'users':
+                        names = [
+                            self.authenticator.normalize_username(name)
+                            for name in names
+                        ]
+                        found = await self._get_or_create_users(
+                            names, hint=f"role: {role_name}"
+                        )
+                    else:
                         Class = orm.get_class(kind)
-                        orm_obj = Class.find(db, name)
-                        if orm_obj is not None:
-                            orm_role_bearers.append(orm_obj)
-                        else:
-                            if kind == 'users':
-                                orm_obj = await self._get_or_create_user(
-                                    name, hint=f"role: {role_name}"
-                                )
-                                orm_role_bearers.append(orm_obj)
-                            elif kind == 'groups':
+                        found = orm.find_by_names(db, Class, names)
+                        missing = [name for name in names if name not in found]
+                        if kind == 'groups':
+                            for name in missing:
                                 self.log.info(
                                     f"Creating group {name} found in role: {role_name}"
                                 )
-                                group = orm.Group(name=name)
-                                db.add(group)
+                                found[name] = orm.Group(name=name)
+                            if missing:
+                                db.add_all(found[name] for name in missing)
                                 db.commit()
-                                orm_role_bearers.append(group)
-                            elif kind == "services":
+                        elif kind == "services":
+                            if missing:
                                 raise ValueError(
-                                    f"Found undefined service {name} in role {role_name}. Define it first in c.JupyterHub.services."
+                                    f"Found undefined service {missing[0]} in role {role_name}. Define it first in c.JupyterHub.services."
                                 )
-                            else:
-                                # this can't happen now, but keep the `else` in case we introduce a problem
-                                # in the declaration of `kinds` above
-                                raise ValueError(f"Unhandled role member kind: {kind}")
-
-                        # Ensure all with admin role have admin flag
-                        if role_name == 'admin':
-                            orm_obj.admin = True
+                        else:
+                            # this can't happen now, but keep the `else` in case we introduce a problem
+                            # in the declaration of `kinds` above
+                            raise ValueError(f"Unhandled role member kind: {kind}")
+
                     # explicitly defined list
                     # ensure membership list is exact match (adds and revokes permissions)
-                    setattr(role, kind, orm_role_bearers)
-                    # if the role_spec was contributed by the authenticator, mark the newly
-                    # created assignments as managed by authenticator too; also mark the
-                    # assignment as not stale (in case if it was marked as such initially)
-                    if role_spec.get('managed_by_auth', False):
-                        entity_name = kind[:-1]
-                        association_class = orm._role_associations[entity_name]
-                        kind_id = getattr(association_class, f'{entity_name}_id')
-                        associations = db.query(association_class).filter(
-                            kind_id.in_([bearer.id for bearer in orm_role_bearers])
-                            & (association_class.role_id == role.id)
+                    # obj.admin is synced with admin role membership below
+                    member_ids = {orm_obj.id for orm_obj in found.values()}
+                    roles.set_role_members(
+                        db, role, kind, member_ids, managed=managed, commit=False
+                    )
+                    # if the role_spec was contributed by the authenticator,
+                    # the assignments are marked as managed by authenticator too;
+                    # also mark the assignment as not stale (in case if it was marked as such initially)
+                    if managed:
+                        stale_managed_role_assignment[kind].difference_update(
+                            (member_id, role.id) for member_id in member_ids
                         )
-                        for association in associations:
-                            association.managed_by_auth = True
-                            # this association is not stale
-                            if association in stale_managed_role_assignment[kind]:
-                                stale_managed_role_assignment[kind].remove(association)
                 else:
                     # no defined members in `load_managed_roles()`
                     # leaving 'users' undefined should not remove existing managed role assignments
-                    if kind == "users" and role_spec.get('managed_by_auth', False):
-                        entity_name = kind[:-1]
-                        association_class = orm._role_associations[entity_name]
-                        kind_id = getattr(association_class, f'{entity_name}_id')
-                        associations = db.query(association_class).filter(
-                            association_class.role_id == role.id
-                        )
-                        for association in associations:
-                            if association in stale_managed_role_assignment[kind]:
-                                stale_managed_role_assignment[kind].remove(association)
+                    if kind == "users" and managed:
+                        stale_managed_role_assignment[kind] = {
+                            (entity_id, role_id)
+                            for entity_id, role_id in stale_managed_role_assignment[
+                                kind
+                            ]
+                            if role_id != role.id
+                        }
                     # no defined members in `load_roles()`
                     # leaving 'users' undefined in overrides of the default 'user' role
                     # should not clear membership on startup
@@ -2559,13 +3031,14 @@ class JupyterHub(Application):
                         pass
                     else:
                         # otherwise, omitting a member category is equivalent to specifying an empty list
-                        setattr(role, kind, [])
+                        roles.set_role_members(db, role, kind, [], commit=False)
 
         if self.authenticator.reset_managed_roles_on_startup:
             for kind, stale_assignments in stale_managed_role_assignment.items():
                 if stale_assignments:
-                    for assignment in stale_assignments:
-                        self.db.delete(assignment)
+                    roles.strip_role_assignments(
+                        db, kind, stale_assignments, commit=False
+                    )
                     self.log.info(
                         "Deleted %s stale %s role assignments previously added by an authenticator",
                         len(stale_assignments),
@@ -2577,18 +3050,17 @@ class JupyterHub(Application):
             user_role = orm.Role.find(db, "user")
             self.log.debug("Assigning allowed_users to the user role")
             # query only those that need the user role _and don't have it_
-            needs_user_role = db.query(orm.User).filter(
-                orm.User.name.in_(self.authenticator.allowed_users)
-                & ~orm.User.roles.any(id=user_role.id)
-            )
-            if self.log.isEnabledFor(logging.DEBUG):
-                # filter on isEnabledFor to skip the extra `count()` query if we aren't going to log it
-                self.log.debug(
-                    f"Assigning {needs_user_role.count()} allowed_users to the user role"
+            needs_user_role = []
+            for chunk in orm.chunked(self.authenticator.allowed_users):
+                needs_user_role.extend(
+                    db.query(orm.User).filter(
+                        orm.User.name.in_(chunk) & ~orm.User.roles.any(id=user_role.id)
+                    )
                 )
-
-            for user in needs_user_role:
-                roles.grant_role(db, user, user_role)
+            self.log.debug(
+                f"Assigning {len(needs_user_role)} allowed_users to the user role"
+            )
+            roles.grant_role_bulk(db, needs_user_role, user_role)
 
         admin_role = orm.Role.find(db, 'admin')
         for kind in admin_role_objects:
@@ -2607,6 +3079,7 @@ class JupyterHub(Application):
 
             # iterate over users with admin=True
             # who are not in the admin role.
+            needs_admin_role = []
             for not_admin_obj in db.query(Class).filter(
                 (Class.admin == True) & ~Class.roles.any(id=admin_role.id)
             ):
@@ -2620,7 +3093,8 @@ class JupyterHub(Application):
                 else:
                     # no admin role membership declared,
                     # populate admin role from admin attribute (the old way, only additive)
-                    roles.grant_role(db, not_admin_obj, admin_role)
+                    needs_admin_role.append(not_admin_obj)
+            roles.grant_role_bulk(db, needs_admin_role, admin_role, commit=False)
         db.commit()
         # make sure that on hub upgrade, all users, services and tokens have at least one role (update with default)
         if getattr(self, '_rbac_upgrade', False):
@@ -2629,6 +3103,8 @@ class JupyterHub(Application):
             )
             for kind in kinds:
                 roles.check_for_default_roles(db, kind)
+        self._store_config_fingerprint("role_assignment", fingerprint)
+        db.commit()
 
     async def _add_tokens(self, token_dict, kind):
         """Add tokens for users or services to the database"""
@@ -2682,22 +3158,60 @@ class JupyterHub(Application):
     # purge expired tokens hourly
     purge_expired_tokens_interval = 3600
 
+    purge_expired_chunk_size = Integer(
+        1000,
+        help="""
+        Number of expired tokens, codes and shares to delete at a time.
+
+        Expired entries are purged periodically,
+        in chunks of this size,
+        letting the Hub handle requests between chunks.
+
+        .. versionadded:: 5.3
+        """,
+    ).tag(config=True)
+
     @catch_db_error
-    def purge_expired_tokens(self):
+    async def purge_expired_tokens(self):
         """purge all expiring token objects from the database
 
         run periodically
         """
         # this should be all the subclasses of Expiring
-        for cls in (orm.APIToken, orm.OAuthCode, orm.Share, orm.ShareCode):
+        for cls, kind in (
+            (orm.APIToken, ExpiredKind.api_token),
+            (orm.OAuthCode, ExpiredKind.oauth_code),
+            (orm.Share, ExpiredKind.share),
+            (orm.ShareCode, ExpiredKind.share_code),
+        ):
             self.log.debug(f"Purging expired {cls.__name__}s")
-            cls.purge_expired(self.db)
+            tic = time.perf_counter()
+            purged = 0
+            for deleted in cls.purge_expired_chunks(
+                self.db, chunk_size=self.purge_expired_chunk_size
+            ):
+                purged += deleted
+                # let other tasks run between chunks
+                await asyncio.sleep(0)
+            duration = time.perf_counter() - tic
+            EXPIRED_PURGED.labels(kind=kind).inc(purged)
+            PURGE_EXPIRED_DURATION_SECONDS.labels(kind=kind).observe(duration)
+            if purged:
+                self.log.info(
+                    f"Purged {purged} expired {cls.__name__}s in {duration:.3f}s"
+                )
 
     async def init_api_tokens(self):
         """Load predefined API tokens (for services) into database"""
 
-        await self._add_tokens(self.service_tokens, kind='service')
-        await self._add_tokens(self.api_tokens, kind='user')
+        unchanged, fingerprint = self._check_config_fingerprint(
+            "api_tokens", self.service_tokens, self.api_tokens
+        )
+        if not unchanged:
+            await self._add_tokens(self.service_tokens, kind='service')
+            await self._add_tokens(self.api_tokens, kind='user')
+            self._store_config_fingerprint("api_tokens", fingerprint)
+            self.db.commit()
 
         await self.purge_expired_tokens()
         # purge expired tokens hourly
@@ -3132,6 +3646,8 @@ class JupyterHub(Application):
         return len(check_futures)
 
     def init_oauth(self):
+        from .oauth.provider import make_provider
+
         base_url = self.hub.base_url
         self.oauth_provider = make_provider(
             lambda: self.db,
@@ -3181,6 +3697,10 @@ class JupyterHub(Application):
 
     def init_tornado_settings(self):
         """Set up the tornado settings dict."""
+        from jinja2 import ChoiceLoader, Environment, FileSystemLoader, PrefixLoader
+
+        from .handlers.static import CacheControlStaticFilesHandler
+
         base_url = self.hub.base_url
         jinja_options = dict(autoescape=True, enable_async=True)
         jinja_options.update(self.jinja_environment_options)
@@ -3238,6 +3758,8 @@ class JupyterHub(Application):
             config=self.config,
             log=self.log,
             db=self.db,
+            read_session_factory=self.read_session_factory,
+            list_count_cache=self.list_count_cache,
             proxy=self.proxy,
             hub=self.hub,
             activity_resolution=self.activity_resolution,
@@ -3253,6 +3775,13 @@ class JupyterHub(Application):
             cookie_secret=self.cookie_secret,
             cookie_host_prefix_enabled=self.cookie_host_prefix_enabled,
             cookie_max_age_days=self.cookie_max_age_days,
+            identity_key=self.identity_key,
+            identity_public_key=(
+                crypto.identity_public_key(self.identity_key)
+                if self.identity_key
+                else ""
+            ),
+            identity_assertion_max_age=self.identity_assertion_max_age,
             redirect_to_server=self.redirect_to_server,
             login_url=login_url,
             logout_url=logout_url,
@@ -3279,6 +3808,7 @@ class JupyterHub(Application):
             spawn_throttle_retry_range=self.spawn_throttle_retry_range,
             active_server_limit=self.active_server_limit,
             authenticate_prometheus=self.authenticate_prometheus,
+            metrics_collector=self.metrics_collector,
             internal_ssl=self.internal_ssl,
             internal_certs_location=self.internal_certs_location,
             internal_authorities=self.internal_ssl_authorities,
@@ -3318,6 +3848,8 @@ class JupyterHub(Application):
 
     def init_eventlog(self):
         """Set up the event logging system."""
+        from jupyter_events.logger import EventLogger
+
         self.eventlog = EventLogger(parent=self)
 
         for schema in (Path(here) / "event-schemas").glob("**/*.yaml"):
@@ -3404,6 +3936,7 @@ class JupyterHub(Application):
         await self.init_api_tokens()
         await self.init_role_assignment()
         await self.init_blocked_users()
+        self.metrics_collector = PeriodicMetricsCollector(parent=self, db=self.db)
         self.init_tornado_settings()
         self.init_handlers()
         self.init_tornado_application()
@@ -3459,9 +3992,6 @@ class JupyterHub(Application):
                 await self.proxy.check_routes(self.users, self._service_map)
 
             asyncio.ensure_future(finish_init_spawners())
-        metrics_collector = self.metrics_collector = PeriodicMetricsCollector(
-            parent=self, db=self.db
-        )
 
     async def cleanup(self):
         """Shutdown managed services and various subprocesses. Cleanup runtime files."""
@@ -3774,6 +4304,22 @@ class JupyterHub(Application):
             self._periodic_callbacks["last_activity"] = pc
             pc.start()
 
+        if self.user_cache_evict_interval and (
+            self.user_cache_max_idle or self.user_cache_max_size
+        ):
+            pc = PeriodicCallback(
+                self.evict_idle_users, 1e3 * self.user_cache_evict_interval
+            )
+            self._periodic_callbacks["evict_idle_users"] = pc
+            pc.start()
+
+        if self.sqlite_checkpoint_interval and self._sqlite_wal_enabled():
+            pc = PeriodicCallback(
+                self.checkpoint_sqlite, 1e3 * self.sqlite_checkpoint_interval
+            )
+            self._periodic_callbacks["checkpoint_sqlite"] = pc
+            pc.start()
+
         if self.proxy.should_start:
             self.log.info("JupyterHub is now running at %s", self.proxy.public_url)
         else:
@@ -3811,6 +4357,16 @@ class JupyterHub(Application):
         self.log.critical("Received signal %s...", sig.name)
         print_ps_info()
         print_stacks()
+        stall_profiler = (
+            self.metrics_collector and self.metrics_collector.stall_profiler
+        )
+        if stall_profiler is not None:
+            report = stall_profiler.report()
+            print(
+                f"Event loop stalls: {report['stalls']} ({report['samples']} samples)",
+                file=sys.stderr,
+            )
+            print(stall_profiler.folded(), file=sys.stderr)
 
     def win_shutdown_cancel_tasks(self, signum, frame):
         self.log.critical("Received signalnum %s, , initiating shutdown...", signum)
@@ -23,7 +23,6 @@ from tornado.concurrent import run_on_executor
 from traitlets import Any, Bool, Dict, Integer, Set, Unicode, default, observe
 from traitlets.config import LoggingConfigurable
 
-from .handlers.login import LoginHandler
 from .traitlets import Command
 from .utils import maybe_future, url_path_join
 
@@ -888,6 +887,33 @@ class Authenticator(LoggingConfigurable):
         if self.allow_existing_users and not self.allow_all:
             self.allowed_users.add(user.name)
 
+    async def add_users(self, users):
+        """Hook called with all users in the database when the Hub starts
+
+        Authenticators that can handle many users more efficiently at once
+        (e.g. with a single request to an external system)
+        may override this method.
+        The default implementation calls :meth:`add_user` for each user.
+
+        Errors for individual users should not be raised,
+        but returned, so the Hub can handle them per user
+        (e.g. deleting users if `delete_invalid_users` is set).
+
+        .. versionadded:: 5.3
+
+        Args:
+            users (list): list of User objects
+        Returns:
+            failed (dict): {username: Exception} for users that could not be added.
+        """
+        failed = {}
+        for user in users:
+            try:
+                await maybe_future(self.add_user(user))
+            except Exception as e:
+                failed[user.name] = e
+        return failed
+
     def delete_user(self, user):
         """Hook called when a user is deleted
 
@@ -1032,6 +1058,8 @@ class Authenticator(LoggingConfigurable):
                 list of ``('/url', Handler)`` tuples passed to tornado.
                 The Hub prefix is added to any URLs.
         """
+        from .handlers.login import LoginHandler
+
         return [('/login', LoginHandler)]
 
 
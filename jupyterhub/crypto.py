@@ -170,3 +170,106 @@ def decrypt(data):
     Returns a Future whose result will be the decrypted, deserialized data.
     """
     return CryptKeeper.instance().decrypt(data)
+
+
+# signed identity assertions
+
+
+def _b64encode(data):
+    """base64url-encode bytes, without padding"""
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data):
+    """decode base64url, with or without padding"""
+    if isinstance(data, str):
+        data = data.encode("ascii")
+    return base64.urlsafe_b64decode(data + b"=" * (-len(data) % 4))
+
+
+def identity_signing_key(secret):
+    """Derive the private key for signing identity assertions
+
+    The key is derived from a secret (the Hub's cookie secret),
+    so it is stable across restarts without storing another secret.
+
+    Args:
+        secret (bytes): the secret from which to derive the key
+    Returns:
+        key (Ed25519PrivateKey): the signing key
+
+    .. versionadded:: 5.3
+    """
+    if cryptography is None:
+        raise CryptographyUnavailable()
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+    from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+    seed = HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=None,
+        info=b"jupyterhub-identity-assertion",
+    ).derive(secret)
+    return Ed25519PrivateKey.from_private_bytes(seed)
+
+
+def identity_public_key(private_key):
+    """Return the public key for verifying identity assertions, as a string
+
+    .. versionadded:: 5.3
+    """
+    from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+
+    return _b64encode(
+        private_key.public_key().public_bytes(Encoding.Raw, PublicFormat.Raw)
+    )
+
+
+def sign_identity(private_key, claims):
+    """Sign an identity assertion
+
+    Args:
+        private_key (Ed25519PrivateKey): the key from :func:`identity_signing_key`
+        claims (dict): the JSON-serializable claims to sign
+    Returns:
+        assertion (str): the signed assertion, of the form `payload.signature`
+
+    .. versionadded:: 5.3
+    """
+    payload = _b64encode(
+        json.dumps(claims, sort_keys=True, separators=(",", ":")).encode("utf8")
+    )
+    signature = _b64encode(private_key.sign(payload.encode("ascii")))
+    return f"{payload}.{signature}"
+
+
+def verify_identity(public_key, assertion):
+    """Verify an identity assertion, and return its claims
+
+    Only checks the signature.
+    Callers are responsible for checking claims such as expiry.
+
+    Args:
+        public_key (str): the public key from :func:`identity_public_key`
+        assertion (str): the assertion from :func:`sign_identity`
+    Returns:
+        claims (dict): the signed claims
+    Raises:
+        ValueError: if the assertion is not valid
+
+    .. versionadded:: 5.3
+    """
+    if cryptography is None:
+        raise CryptographyUnavailable()
+    from cryptography.exceptions import InvalidSignature
+    from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PublicKey
+
+    try:
+        payload, signature = assertion.split(".")
+        key = Ed25519PublicKey.from_public_bytes(_b64decode(public_key))
+        key.verify(_b64decode(signature), payload.encode("ascii"))
+        return json.loads(_b64decode(payload))
+    except (ValueError, InvalidSignature) as e:
+        raise ValueError("Invalid identity assertion") from e
@@ -99,6 +99,10 @@ def backup_db_file(db_file, log=None):
     if log:
         log.info("Backing up %s => %s", db_file, backup_db_file)
     shutil.copy(db_file, backup_db_file)
+    # changes may not have been checkpointed from the write-ahead log
+    # into the database file yet (sqlite in WAL mode)
+    if os.path.exists(db_file + '-wal'):
+        shutil.copy(db_file + '-wal', backup_db_file + '-wal')
 
 
 def upgrade_if_needed(db_url, backup=True, log=None):
@@ -159,6 +159,29 @@ class BaseHandler(RequestHandler):
     def db(self):
         return self.settings['db']
 
+    _read_db = None
+
+    @property
+    def read_db(self):
+        """Database session for read-only queries that can tolerate replication lag
+
+        A session on the read replica (`JupyterHub.db_read_url`), if configured,
+        created for this request and closed when it finishes.
+        Otherwise, the same as `.db`.
+
+        Objects loaded from it belong to a different session than `.db`,
+        so they must not be modified, added to `.db`,
+        or used as keys of `.users`, which caches User wrappers.
+
+        .. versionadded:: 5.3
+        """
+        read_session_factory = self.settings.get('read_session_factory')
+        if read_session_factory is None:
+            return self.db
+        if self._read_db is None:
+            self._read_db = read_session_factory()
+        return self._read_db
+
     @property
     def users(self):
         return self.settings.setdefault('users', {})
@@ -202,6 +225,13 @@ class BaseHandler(RequestHandler):
             self.db.rollback()
         super().finish(*args, **kwargs)
 
+    def on_finish(self):
+        """Close the read replica session, if one was used"""
+        if self._read_db is not None:
+            self._read_db.close()
+            self._read_db = None
+        super().on_finish()
+
     # ---------------------------------------------------------------
     # Security policies
     # ---------------------------------------------------------------
@@ -851,7 +881,8 @@ class BaseHandler(RequestHandler):
             # if self.redirect_to_server, default login URL initiates spawn,
             # otherwise send to Hub home page (control panel)
             if user and self.redirect_to_server:
-                if user.spawner.active:
+                spawner = user.spawner_view()
+                if spawner is not None and spawner.active:
                     # server is active, send to the user url
                     next_url = user.url
                 else:
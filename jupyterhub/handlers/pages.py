@@ -77,7 +77,7 @@ class HomeHandler(BaseHandler):
             url_path_join=url_path_join,
             # can't use user.spawners because the stop method of User pops named servers from user.spawners when they're stopped
             spawners=user.orm_user._orm_spawners,
-            default_server=user.spawner,
+            default_server=user.spawner_view(),
         )
         self.finish(html)
 
@@ -0,0 +1,478 @@
+"""Synthetic load generator for capacity planning
+
+Runs an in-process Hub with mock components
+and simulates a population of users:
+logins, server spawns, activity reported by single-user servers,
+API polling by idle cullers, and share grants.
+
+Requires the test dependencies (`pip install jupyterhub[test]`).
+"""
+
+# Copyright (c) Jupyter Development Team.
+# Distributed under the terms of the Modified BSD License.
+import asyncio
+import json
+import logging
+import random
+import statistics
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from http.cookies import SimpleCookie
+from urllib.parse import quote, urlencode
+
+from tornado.httpclient import AsyncHTTPClient, HTTPRequest
+from traitlets import Float, Integer, Type, Unicode, default
+from traitlets.config import Application
+
+from . import __version__, metrics, orm, roles
+from .utils import new_token, url_path_join
+
+aliases = {
+    'users': 'LoadTest.users',
+    'duration': 'LoadTest.duration',
+    'ramp-up': 'LoadTest.ramp_up',
+    'activity-interval': 'LoadTest.activity_interval',
+    'cullers': 'LoadTest.cullers',
+    'culler-interval': 'LoadTest.culler_interval',
+    'share-fraction': 'LoadTest.share_fraction',
+    'max-clients': 'LoadTest.max_clients',
+    'spawner-class': 'LoadTest.spawner_class',
+    'output': 'LoadTest.output',
+    'seed': 'LoadTest.seed',
+}
+
+
+def percentile(sorted_values, q):
+    """Return the q-th percentile (0-100) of already-sorted values"""
+    if not sorted_values:
+        return 0
+    index = min(len(sorted_values) - 1, int(round(q / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def _histogram_samples(histogram, **labels):
+    """Snapshot a prometheus Histogram, summed across other labels
+
+    Returns:
+        snapshot (dict): with `count`, `sum`,
+        and `buckets`, a dict of {upper bound: cumulative count}
+    """
+    snapshot = {"count": 0, "sum": 0, "buckets": defaultdict(float)}
+    for metric in histogram.collect():
+        for sample in metric.samples:
+            if any(sample.labels.get(key) != value for key, value in labels.items()):
+                continue
+            if sample.name.endswith("_bucket"):
+                snapshot["buckets"][float(sample.labels["le"])] += sample.value
+            elif sample.name.endswith("_count"):
+                snapshot["count"] += sample.value
+            elif sample.name.endswith("_sum"):
+                snapshot["sum"] += sample.value
+    return snapshot
+
+
+def _histogram_summary(before, after):
+    """Summarize the observations of a histogram between two snapshots
+
+    Quantiles are the upper bound of the bucket they fall in.
+    """
+    count = after["count"] - before["count"]
+    if not count:
+        return {"count": 0}
+    total = after["sum"] - before["sum"]
+    buckets = sorted(
+        (le, after["buckets"][le] - before["buckets"].get(le, 0))
+        for le in after["buckets"]
+    )
+    summary = {"count": int(count), "mean": total / count}
+    for name, q in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99)):
+        for le, cumulative in buckets:
+            if cumulative >= q * count:
+                summary[name] = le
+                break
+    return summary
+
+
+class LoadTest(Application):
+    """Generate synthetic load on an in-process Hub"""
+
+    name = 'jupyterhub-loadtest'
+    version = __version__
+    description = """Simulate a population of users on an in-process JupyterHub.
+
+    The Hub uses an in-memory proxy and, by default, a spawner
+    that doesn't launch any processes, so it runs entirely offline.
+    Reports throughput and latency of each operation,
+    along with the Hub's own metrics, including event-loop lag.
+
+    Requires the test dependencies (`pip install jupyterhub[test]`).
+    """
+
+    examples = """
+        jupyterhub-loadtest --users=10000 --duration=300 --ramp-up=120
+    """
+
+    aliases = aliases
+
+    users = Integer(
+        100, help="Number of simulated users, who each log in and start a server."
+    ).tag(config=True)
+
+    duration = Float(60, help="Duration of the test, in seconds.").tag(config=True)
+
+    ramp_up = Float(
+        10,
+        help="""Time (in seconds) over which user sessions start.
+
+        Users log in at an even rate from the start of the test until ramp_up.
+        """,
+    ).tag(config=True)
+
+    activity_interval = Float(
+        10,
+        help="""Interval (in seconds) on which each running server reports activity.
+
+        Single-user servers report activity every 5 minutes by default.
+        Scale this down with the number of users
+        to simulate a larger population in a shorter test.
+        """,
+    ).tag(config=True)
+
+    cullers = Integer(
+        1, help="Number of idle cullers polling the list of running servers."
+    ).tag(config=True)
+
+    culler_interval = Float(
+        30, help="Interval (in seconds) on which each culler polls the Hub."
+    ).tag(config=True)
+
+    share_fraction = Float(
+        0.1, help="Fraction of users who share their server with another user."
+    ).tag(config=True)
+
+    max_clients = Integer(
+        100, help="Maximum number of concurrent requests to the Hub."
+    ).tag(config=True)
+
+    spawner_class = Type(
+        klass='jupyterhub.spawner.Spawner',
+        help="""The Spawner class to use.
+
+        Defaults to InProcessSpawner, which doesn't launch any processes.
+        Use `jupyterhub.tests.mocking.MockSpawner` to launch a small process per server.
+        """,
+    ).tag(config=True)
+
+    @default('spawner_class')
+    def _default_spawner_class(self):
+        from .tests.mocking import InProcessSpawner
+
+        return InProcessSpawner
+
+    output = Unicode(
+        help="Write the report as JSON to this file, in addition to printing it."
+    ).tag(config=True)
+
+    seed = Integer(0, help="Seed for random timing jitter.").tag(config=True)
+
+    user_prefix = Unicode("loadtest-", help="Prefix for user names.").tag(config=True)
+
+    def start(self):
+        try:
+            from .tests.mocking import MockHub, MockProxy  # noqa: F401
+        except ImportError as e:
+            self.log.critical(
+                "jupyterhub-loadtest requires the test dependencies"
+                " (pip install jupyterhub[test]): %s",
+                e,
+            )
+            self.exit(1)
+        report = asyncio.run(self.run())
+        self.print_report(report)
+        if self.output:
+            with open(self.output, "w") as f:
+                json.dump(report, f, indent=1)
+            self.log.info("Wrote report to %s", self.output)
+
+    async def run(self):
+        """Run the load test, and return the report"""
+        from .auth import DummyAuthenticator
+        from .tests.mocking import MockHub, MockProxy
+
+        self._random = random.Random(self.seed)
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self._stopping = False
+
+        self.hub = hub = MockHub.instance(
+            log_level=logging.WARNING,
+            authenticator_class=DummyAuthenticator,
+            proxy_class=MockProxy,
+            spawner_class=self.spawner_class,
+        )
+        try:
+            await hub.initialize([])
+            await hub.start()
+            self.client = AsyncHTTPClient(
+                force_instance=True, max_clients=self.max_clients
+            )
+            self.admin_token = self._make_admin_token()
+
+            before = self._snapshot_metrics()
+            tic = time.perf_counter()
+            tasks = [
+                asyncio.ensure_future(
+                    self.simulate_user(i, delay=self.ramp_up * i / self.users)
+                )
+                for i in range(self.users)
+            ]
+            tasks.extend(
+                asyncio.ensure_future(self.simulate_culler(i))
+                for i in range(self.cullers)
+            )
+            await asyncio.sleep(self.duration)
+            self._stopping = True
+            self.log.info("Waiting for in-flight requests to finish")
+            await asyncio.gather(*tasks)
+            elapsed = time.perf_counter() - tic
+            after = self._snapshot_metrics()
+            return self.make_report(elapsed, before, after)
+        finally:
+            await hub.stop_async()
+            MockHub.clear_instance()
+            stop_stand_in = getattr(self.spawner_class, "stop_stand_in", None)
+            if stop_stand_in:
+                stop_stand_in()
+
+    def _make_admin_token(self):
+        """Create an admin user with an API token, like a culler would have"""
+        db = self.hub.db
+        admin = orm.User(name=f"{self.user_prefix}admin", admin=True)
+        db.add(admin)
+        db.commit()
+        roles.assign_default_roles(db, admin)
+        token = new_token()
+        orm_token = orm.APIToken(client_id="jupyterhub", scopes=["inherit"])
+        orm_token.token = token
+        orm_token.user = admin
+        db.add(orm_token)
+        db.commit()
+        return token
+
+    async def _timed(self, name, request):
+        """Await a request, recording its latency or failure"""
+        tic = time.perf_counter()
+        try:
+            result = await request
+        except Exception as e:
+            self.errors[name] += 1
+            self.log.debug("%s failed: %s", name, e)
+            return None
+        self.latencies[name].append(time.perf_counter() - tic)
+        return result
+
+    def _fetch(
+        self, path, *, token=None, method="GET", body=None, raise_error=True, **kwargs
+    ):
+        """Make a request to the Hub, with a path relative to /hub/"""
+        headers = kwargs.pop("headers", {})
+        if token:
+            headers["Authorization"] = f"token {token}"
+        if method == "POST" and body is None:
+            body = ""
+        req = HTTPRequest(
+            url_path_join(self.hub.hub.url, path),
+            method=method,
+            headers=headers,
+            body=body,
+            **kwargs,
+        )
+        return self.client.fetch(req, raise_error=raise_error)
+
+    async def login(self, name):
+        """Log in through the login form"""
+        r = await self._fetch("login")
+        cookies = SimpleCookie()
+        for header in r.headers.get_list("Set-Cookie"):
+            cookies.load(header)
+        xsrf = cookies["_xsrf"].value
+        r = await self._fetch(
+            f"login?_xsrf={quote(xsrf)}",
+            method="POST",
+            body=urlencode({"username": name, "password": name}),
+            headers={"Cookie": f"_xsrf={xsrf}"},
+            follow_redirects=False,
+            raise_error=False,
+        )
+        if r.code >= 400:
+            raise ValueError(f"Login failed with {r.code}")
+
+    async def _sleep(self, seconds):
+        """Sleep until `seconds` have passed or the test is over
+
+        Returns True if the test is still running.
+        """
+        deadline = time.perf_counter() + seconds
+        while not self._stopping:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return True
+            await asyncio.sleep(min(remaining, 1))
+        return False
+
+    async def simulate_user(self, i, delay):
+        """One user: log in, start a server, maybe share it, and report activity"""
+        if not await self._sleep(delay):
+            return
+        name = f"{self.user_prefix}{i}"
+        await self._timed("login", self.login(name))
+        server_path = f"api/users/{quote(name)}/server"
+        r = await self._timed(
+            "spawn",
+            self._fetch(server_path, token=self.admin_token, method="POST"),
+        )
+        if r is None:
+            return
+        # pending spawns take 202, wait for them to finish
+        user = self.hub.users[name]
+        while user.spawner.pending and not self._stopping:
+            await asyncio.sleep(0.1)
+        if not user.spawner.ready:
+            return
+
+        if i > 0 and self._random.random() < self.share_fraction:
+            share_with = f"{self.user_prefix}{i - 1}"
+            await self._timed(
+                "share",
+                self._fetch(
+                    f"api/shares/{quote(name)}/",
+                    token=self.admin_token,
+                    method="POST",
+                    body=json.dumps({"user": share_with}),
+                ),
+            )
+
+        # the token a single-user server uses to report activity
+        server_token = user.spawner.api_token
+        while await self._sleep(
+            self.activity_interval * self._random.uniform(0.5, 1.5)
+        ):
+            now = datetime.now(timezone.utc).isoformat()
+            await self._timed(
+                "activity",
+                self._fetch(
+                    f"api/users/{quote(name)}/activity",
+                    token=server_token,
+                    method="POST",
+                    body=json.dumps(
+                        {"last_activity": now, "servers": {"": {"last_activity": now}}}
+                    ),
+                ),
+            )
+
+    async def simulate_culler(self, i):
+        """An idle culler, listing users with running servers a page at a time"""
+        limit = 200
+        # cullers don't all start at once
+        interval = self.culler_interval
+        while await self._sleep(interval * self._random.uniform(0.5, 1.5)):
+            offset = 0
+            while not self._stopping:
+                r = await self._timed(
+                    "culler_poll",
+                    self._fetch(
+                        f"api/users?state=ready&limit={limit}&offset={offset}",
+                        token=self.admin_token,
+                    ),
+                )
+                if r is None or len(json.loads(r.body)) < limit:
+                    break
+                offset += limit
+
+    def _snapshot_metrics(self):
+        """Snapshot the Hub's own metrics"""
+        return {
+            "event_loop_interval": _histogram_samples(
+                metrics.EVENT_LOOP_INTERVAL_SECONDS
+            ),
+            "request_duration": _histogram_samples(metrics.REQUEST_DURATION_SECONDS),
+            "server_spawn_duration": _histogram_samples(
+                metrics.SERVER_SPAWN_DURATION_SECONDS, status="success"
+            ),
+        }
+
+    def make_report(self, elapsed, before, after):
+        """Build the report from recorded latencies and the Hub's metrics"""
+        operations = {}
+        for name in sorted(set(self.latencies).union(self.errors)):
+            latencies = sorted(self.latencies[name])
+            operations[name] = {
+                "count": len(latencies),
+                "errors": self.errors[name],
+                "rate": len(latencies) / elapsed,
+                # latencies in milliseconds
+                "mean": 1e3 * statistics.mean(latencies) if latencies else 0,
+                "p50": 1e3 * percentile(latencies, 50),
+                "p90": 1e3 * percentile(latencies, 90),
+                "p99": 1e3 * percentile(latencies, 99),
+                "max": 1e3 * latencies[-1] if latencies else 0,
+            }
+        return {
+            "jupyterhub_version": __version__,
+            "config": {
+                "users": self.users,
+                "duration": self.duration,
+                "ramp_up": self.ramp_up,
+                "activity_interval": self.activity_interval,
+                "cullers": self.cullers,
+                "culler_interval": self.culler_interval,
+                "share_fraction": self.share_fraction,
+                "spawner_class": (
+                    f"{self.spawner_class.__module__}.{self.spawner_class.__name__}"
+                ),
+            },
+            "elapsed": elapsed,
+            "operations": operations,
+            # from the Hub's prometheus metrics, in seconds
+            "hub_metrics": {
+                name: _histogram_summary(before[name], after[name]) for name in after
+            },
+        }
+
+    def print_report(self, report):
+        """Print a human-readable report"""
+        print(f"{report['config']['users']} users over {report['elapsed']:.0f}s")
+        print()
+        header = (
+            f"{'operation':>12} {'count':>8} {'errors':>7} {'per sec':>9}"
+            f" {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}"
+        )
+        print(header)
+        print("-" * len(header))
+        for name, op in report["operations"].items():
+            print(
+                f"{name:>12} {op['count']:>8} {op['errors']:>7} {op['rate']:>9.1f}"
+                f" {op['p50']:>9.1f} {op['p90']:>9.1f} {op['p99']:>9.1f} {op['max']:>9.1f}"
+            )
+        print()
+        for name, summary in report["hub_metrics"].items():
+            if not summary["count"]:
+                continue
+            print(
+                f"{name}: count={summary['count']}"
+                f" mean={1e3 * summary['mean']:.1f}ms"
+                f" p50<={1e3 * summary.get('p50', 0):.0f}ms"
+                f" p99<={1e3 * summary.get('p99', 0):.0f}ms"
+            )
+
+
+def main(argv=None):
+    # not launch_instance: the Hub must be the only singleton Application
+    loadtest = LoadTest()
+    loadtest.initialize(argv)
+    loadtest.start()
+
+
+if __name__ == "__main__":
+    main()
@@ -12,7 +12,6 @@ from urllib.parse import urlparse, urlunparse
 from tornado.log import LogFormatter, access_log
 from tornado.web import HTTPError, StaticFileHandler
 
-from .handlers.pages import HealthCheckHandler
 from .metrics import prometheus_log_method
 
 
@@ -119,6 +118,11 @@ def _scrub_headers(headers):
     return headers
 
 
+# handlers whose successful requests are logged at debug-level,
+# loaded on first use to avoid loading all handlers with jupyterhub.log
+_debug_handlers = None
+
+
 # log_request adapted from IPython (BSD)
 
 
@@ -131,11 +135,15 @@ def log_request(handler):
     - log user-agent for failed requests
     - record per-request metrics in prometheus
     """
+    global _debug_handlers
+    if _debug_handlers is None:
+        from .handlers.pages import HealthCheckHandler
+
+        _debug_handlers = (StaticFileHandler, HealthCheckHandler)
+
     status = handler.get_status()
     request = handler.request
-    if status == 304 or (
-        status < 300 and isinstance(handler, (StaticFileHandler, HealthCheckHandler))
-    ):
+    if status == 304 or (status < 300 and isinstance(handler, _debug_handlers)):
         # static-file success and 304 Found are debug-level
         log_level = logging.DEBUG
     elif status < 400:
@@ -24,17 +24,22 @@ them manually here.
 
 import asyncio
 import os
+import sys
+import threading
 import time
+from collections import Counter as _Counter
 from datetime import timedelta
 from enum import Enum
+from functools import partial, wraps
 
-from prometheus_client import Gauge, Histogram
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import event
 from tornado.ioloop import PeriodicCallback
 from traitlets import Any, Bool, Dict, Float, Integer
 from traitlets.config import LoggingConfigurable
 
 from . import orm
-from .utils import utcnow
+from .utils import extract_stack, utcnow
 
 metrics_prefix = os.getenv('JUPYTERHUB_METRICS_PREFIX', 'jupyterhub')
 
@@ -118,6 +123,32 @@ TOTAL_USERS = Gauge(
     namespace=metrics_prefix,
 )
 
+USER_CACHE_SIZE = Gauge(
+    'user_cache_size',
+    'Number of users and their spawners kept in memory by the Hub',
+    ['kind'],
+    namespace=metrics_prefix,
+)
+
+USER_CACHE_EVICTIONS = Counter(
+    'user_cache_evictions',
+    'Number of idle users removed from the in-memory cache',
+    namespace=metrics_prefix,
+)
+
+
+class UserCacheKind(Enum):
+    """
+    Possible values for 'kind' label of USER_CACHE_SIZE
+    """
+
+    user = 'user'
+    spawner = 'spawner'
+
+    def __str__(self):
+        return self.value
+
+
 ACTIVE_USERS = Gauge(
     'active_users',
     'Number of users who were active in the given time period',
@@ -315,6 +346,227 @@ EVENT_LOOP_INTERVAL_SECONDS = Histogram(
     ],
 )
 
+EXPIRED_PURGED = Counter(
+    'expired_purged',
+    'Number of expired entries purged from the database',
+    ['kind'],
+    namespace=metrics_prefix,
+)
+
+PURGE_EXPIRED_DURATION_SECONDS = Histogram(
+    'purge_expired_duration_seconds',
+    'Time taken to purge expired entries from the database',
+    ['kind'],
+    namespace=metrics_prefix,
+)
+
+
+class ExpiredKind(Enum):
+    """
+    Possible values for 'kind' label of EXPIRED_PURGED
+    and PURGE_EXPIRED_DURATION_SECONDS
+    """
+
+    api_token = 'api_token'
+    oauth_code = 'oauth_code'
+    share = 'share'
+    share_code = 'share_code'
+
+    def __str__(self):
+        return self.value
+
+
+for s in ExpiredKind:
+    EXPIRED_PURGED.labels(kind=s)
+    PURGE_EXPIRED_DURATION_SECONDS.labels(kind=s)
+
+
+# most database operations take well under the default buckets' 5ms minimum
+db_duration_buckets = [
+    0.5e-3,
+    1e-3,
+    2.5e-3,
+    5e-3,
+    10e-3,
+    25e-3,
+    50e-3,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    float("inf"),
+]
+
+DB_QUERY_DURATION_SECONDS = Histogram(
+    'db_query_duration_seconds',
+    'Time taken for database queries, by database engine',
+    ['engine'],
+    namespace=metrics_prefix,
+    buckets=db_duration_buckets,
+)
+
+DB_PING_DURATION_SECONDS = Histogram(
+    'db_ping_duration_seconds',
+    'Time taken to check database connections before using them',
+    ['engine'],
+    namespace=metrics_prefix,
+    buckets=db_duration_buckets,
+)
+
+DB_POOL_CHECKOUT_DURATION_SECONDS = Histogram(
+    'db_pool_checkout_duration_seconds',
+    'Time taken to get a connection from the database connection pool',
+    ['engine'],
+    namespace=metrics_prefix,
+    buckets=db_duration_buckets,
+)
+
+DB_POOL_CHECKED_OUT = Gauge(
+    'db_pool_checked_out',
+    'Number of database connections in use',
+    ['engine'],
+    namespace=metrics_prefix,
+)
+
+DB_POOL_OVERFLOW = Gauge(
+    'db_pool_overflow',
+    'Number of database connections open beyond the pool size',
+    ['engine'],
+    namespace=metrics_prefix,
+)
+
+DB_POOL_SIZE = Gauge(
+    'db_pool_size',
+    'Number of database connections kept open by the connection pool',
+    ['engine'],
+    namespace=metrics_prefix,
+)
+
+
+class DBEngine(Enum):
+    """
+    Possible values for 'engine' label of DB_QUERY_DURATION_SECONDS
+
+    'read' is the read replica, if JupyterHub.db_read_url is set.
+    """
+
+    primary = 'primary'
+    read = 'read'
+
+    def __str__(self):
+        return self.value
+
+
+for s in DBEngine:
+    DB_QUERY_DURATION_SECONDS.labels(engine=s)
+    DB_PING_DURATION_SECONDS.labels(engine=s)
+    DB_POOL_CHECKOUT_DURATION_SECONDS.labels(engine=s)
+
+
+def _pool_stat(engine, method):
+    """Call a method of engine.pool, e.g. checkedout()"""
+    return getattr(engine.pool, method)()
+
+
+def _time_pool_checkouts(engine, histogram):
+    """Record the time taken by engine.pool.connect in histogram"""
+    pool = engine.pool
+    connect = pool.connect
+
+    @wraps(connect)
+    def timed_connect():
+        tic = time.perf_counter()
+        try:
+            return connect()
+        finally:
+            histogram.observe(time.perf_counter() - tic)
+
+    pool.connect = timed_connect
+
+
+def register_engine_metrics(engine, name):
+    """Record metrics for a database engine, labeled with `name`
+
+    - the duration of queries, in DB_QUERY_DURATION_SECONDS
+    - the duration of connection checks, in DB_PING_DURATION_SECONDS
+    - the time taken to get a connection from the pool,
+      in DB_POOL_CHECKOUT_DURATION_SECONDS
+    - the state of the connection pool, in DB_POOL_CHECKED_OUT,
+      DB_POOL_OVERFLOW and DB_POOL_SIZE, if the pool has a fixed size
+
+    .. versionadded:: 5.3
+    """
+    query_histogram = DB_QUERY_DURATION_SECONDS.labels(engine=name)
+    ping_histogram = DB_PING_DURATION_SECONDS.labels(engine=name)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info["query_start_time"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _observe_query_duration(
+        conn, cursor, statement, parameters, context, executemany
+    ):
+        start = conn.info.pop("query_start_time", None)
+        if start is None:
+            return
+        duration = time.perf_counter() - start
+        if context is not None and context.execution_options.get(
+            orm.PING_EXECUTION_OPTION
+        ):
+            ping_histogram.observe(duration)
+        else:
+            query_histogram.observe(duration)
+
+    checkout_histogram = DB_POOL_CHECKOUT_DURATION_SECONDS.labels(engine=name)
+    _time_pool_checkouts(engine, checkout_histogram)
+
+    # dispose() replaces the pool
+    @event.listens_for(engine, "engine_disposed")
+    def _time_new_pool_checkouts(engine):
+        _time_pool_checkouts(engine, checkout_histogram)
+
+    # pool state is read when metrics are collected,
+    # from engine.pool, in case it's replaced
+    for gauge, method in (
+        (DB_POOL_CHECKED_OUT, "checkedout"),
+        (DB_POOL_OVERFLOW, "overflow"),
+        (DB_POOL_SIZE, "size"),
+    ):
+        if hasattr(engine.pool, method):
+            gauge.labels(engine=name).set_function(partial(_pool_stat, engine, method))
+
+
+HUB_AUTH_API_REQUESTS = Counter(
+    'hub_auth_api_requests',
+    'Requests to the Hub API made by HubAuth in services and single-user servers',
+    ['connection'],
+    namespace=metrics_prefix,
+)
+
+
+class HubAuthConnection(Enum):
+    """
+    Possible values for 'connection' label of HUB_AUTH_API_REQUESTS
+
+    'reused' requests avoided a new connection (and TLS handshake).
+    Only tornado's curl client (with pycurl) reuses connections,
+    so with any other client all requests are 'new'.
+    """
+
+    new = 'new'
+    reused = 'reused'
+
+    def __str__(self):
+        return self.value
+
+
+for s in HubAuthConnection:
+    HUB_AUTH_API_REQUESTS.labels(connection=s)
+
 
 def prometheus_log_method(handler):
     """
@@ -399,9 +651,53 @@ class PeriodicMetricsCollector(LoggingConfigurable):
         help="""Log when the event loop blocks for at least this many seconds.""",
     )
 
+    event_loop_stall_profile_enabled = Bool(
+        False,
+        config=True,
+        help="""
+        Sample the stack of the Hub's main thread while the event loop is blocked.
+
+        A watchdog thread checks that the event loop keeps ticking
+        (requires `event_loop_interval_enabled`).
+        When a tick is overdue by at least `event_loop_stall_profile_threshold`,
+        the thread records the main thread's stack
+        every `event_loop_stall_profile_interval` until the event loop resumes.
+
+        The aggregated stacks show which handlers or database calls block the Hub.
+        They are available at `GET /api/stalls` (requires the `read:hub` scope),
+        and are logged when the Hub receives SIGUSR1.
+
+        .. versionadded:: 5.3
+        """,
+    )
+    event_loop_stall_profile_threshold = Float(
+        0.5,
+        config=True,
+        help="""Start sampling stacks when the event loop has been blocked for this many seconds.""",
+    )
+    event_loop_stall_profile_interval = Float(
+        0.01,
+        config=True,
+        help="""Interval (in seconds) between stack samples while the event loop is blocked.""",
+    )
+    event_loop_stall_profile_max_stacks = Integer(
+        1000,
+        config=True,
+        help="""
+        Maximum number of distinct stacks to keep.
+
+        Once this many stacks have been recorded,
+        samples of new stacks are only counted in the total,
+        so memory use is bounded no matter how long the Hub runs.
+        """,
+    )
+
     # internal state
     _tasks = Dict()
     _periodic_callbacks = Dict()
+    stall_profiler = Any(
+        help="The EventLoopStallProfiler, if event_loop_stall_profile_enabled"
+    )
 
     db = Any(help="SQLAlchemy db session to use for performing queries")
 
@@ -436,11 +732,15 @@ class PeriodicMetricsCollector(LoggingConfigurable):
         last_tick = tick()
         resolution = self.event_loop_interval_resolution
         lower_bound = 2 * resolution
+        profiler = self.stall_profiler
         # This loop runs _very_ often, so try to keep it efficient.
         # Even excess comparisons and assignments have a measurable effect on overall cpu usage.
         while True:
             await asyncio.sleep(resolution)
             now = tick()
+            if profiler is not None:
+                # let the watchdog thread know the event loop is running
+                profiler.last_tick = now
             # measure the _difference_ between the sleep time and the measured time
             # the event loop blocked for somewhere in the range [delay, delay + resolution]
             tick_duration = now - last_tick
@@ -474,6 +774,20 @@ class PeriodicMetricsCollector(LoggingConfigurable):
             # Update the metrics once on startup too
             self.update_active_users()
 
+        if self.event_loop_stall_profile_enabled:
+            if self.event_loop_interval_enabled:
+                self.stall_profiler = EventLoopStallProfiler(
+                    threshold=self.event_loop_interval_resolution
+                    + self.event_loop_stall_profile_threshold,
+                    interval=self.event_loop_stall_profile_interval,
+                    max_stacks=self.event_loop_stall_profile_max_stacks,
+                )
+                self.stall_profiler.start()
+            else:
+                self.log.warning(
+                    "event_loop_stall_profile_enabled requires event_loop_interval_enabled"
+                )
+
         if self.event_loop_interval_enabled:
             self._tasks["event_loop_tick"] = asyncio.create_task(
                 self._measure_event_loop_interval()
@@ -491,3 +805,141 @@ class PeriodicMetricsCollector(LoggingConfigurable):
             pc.stop()
         for task in self._tasks.values():
             task.cancel()
+        if self.stall_profiler is not None:
+            self.stall_profiler.stop()
+
+
+class EventLoopStallProfiler:
+    """Sample the main thread's stack while the event loop is blocked
+
+    A daemon thread wakes up every `interval` seconds,
+    and checks when the event loop last ticked (`last_tick`,
+    updated by PeriodicMetricsCollector).
+    If the tick is overdue by more than `threshold`,
+    the current stack of the event loop's thread is recorded.
+
+    Stacks are aggregated by counting identical stacks,
+    like the input to a flame graph.
+    At most `max_stacks` distinct stacks are kept.
+    """
+
+    # frames kept per stack, innermost first
+    max_depth = 64
+
+    def __init__(self, threshold, interval, max_stacks):
+        self.threshold = threshold
+        self.interval = interval
+        self.max_stacks = max_stacks
+        # for shortening file names, longest first
+        self._path_prefixes = sorted(
+            (p.rstrip(os.sep) + os.sep for p in sys.path if p), key=len, reverse=True
+        )
+        self.last_tick = time.perf_counter()
+        self.stacks = _Counter()
+        # number of times the event loop was found blocked
+        self.stalls = 0
+        self.samples = 0
+        # samples not in `stacks` because max_stacks was reached
+        self.dropped_samples = 0
+        self._thread = None
+        self._thread_id = threading.get_ident()
+        self._in_stall = False
+        self._stop_event = threading.Event()
+        # samples are recorded in the watchdog thread, and read in the event loop
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start sampling the current thread, which should be running the event loop"""
+        self._thread_id = threading.get_ident()
+        self.last_tick = time.perf_counter()
+        self._in_stall = False
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._watch, name="EventLoopStallProfiler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Stop sampling"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _watch(self):
+        while not self._stop_event.wait(self.interval):
+            if not self.sample(time.perf_counter()):
+                return
+
+    def sample(self, now):
+        """Check the event loop once, at time `now` (from time.perf_counter)
+
+        Records the event loop thread's stack if the last tick is overdue.
+        Returns False if the event loop thread has exited.
+        """
+        if now - self.last_tick < self.threshold:
+            self._in_stall = False
+            return True
+        if not self._in_stall:
+            self._in_stall = True
+            with self._lock:
+                self.stalls += 1
+        frame = sys._current_frames().get(self._thread_id)
+        if frame is None:
+            return False
+        self.record(extract_stack(frame, limit=self.max_depth))
+        return True
+
+    def record(self, stack):
+        """Record one sample of a stack (a list of FrameSummary, outermost first)"""
+        key = tuple(
+            f"{frame.name} ({self._short_path(frame.filename)}:{frame.lineno})"
+            for frame in stack
+        )
+        with self._lock:
+            self.samples += 1
+            if key in self.stacks or len(self.stacks) < self.max_stacks:
+                self.stacks[key] += 1
+            else:
+                self.dropped_samples += 1
+
+    def _short_path(self, path):
+        """Shorten a file path, relative to the sys.path entry containing it"""
+        for prefix in self._path_prefixes:
+            if path.startswith(prefix):
+                return path[len(prefix) :]
+        return path
+
+    def reset(self):
+        """Discard all recorded samples"""
+        with self._lock:
+            self.stacks = _Counter()
+            self.stalls = self.samples = self.dropped_samples = 0
+
+    def folded(self):
+        """The recorded stacks in "folded" format
+
+        One line per stack, with frames separated by semicolons, followed by the sample count.
+        This is the input format of flamegraph.pl, speedscope, and similar tools.
+        """
+        with self._lock:
+            stacks = self.stacks.most_common()
+        return "".join(
+            ";".join(frame.replace(";", ":") for frame in stack) + f" {count}\n"
+            for stack, count in stacks
+        )
+
+    def report(self, limit=None):
+        """A JSONable summary of the recorded stacks, most common first"""
+        with self._lock:
+            return {
+                "threshold": self.threshold,
+                "interval": self.interval,
+                "stalls": self.stalls,
+                "samples": self.samples,
+                "dropped_samples": self.dropped_samples,
+                "stacks": [
+                    {"samples": count, "frames": list(stack)}
+                    for stack, count in self.stacks.most_common(limit)
+                ],
+            }
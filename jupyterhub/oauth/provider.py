@@ -3,9 +3,13 @@
 implements https://oauthlib.readthedocs.io/en/latest/oauth2/server.html
 """
 
+import hashlib
+from hmac import compare_digest
+
 from oauthlib import uri_validate
 from oauthlib.oauth2 import RequestValidator, WebApplicationServer
 from oauthlib.oauth2.rfc6749.grant_types import authorization_code, base
+from sqlalchemy import inspect
 from tornado.log import app_log
 
 from .. import orm
@@ -33,11 +37,85 @@ authorization_code.is_absolute_uri = is_absolute_uri
 base.is_absolute_uri = is_absolute_uri
 
 
+def _is_live(obj):
+    """Whether an orm object held in memory is still in the database"""
+    return inspect(obj).persistent
+
+
 class JupyterHubRequestValidator(RequestValidator):
     def __init__(self, db):
         self.db = db
+        # in-memory registry of oauth clients, by client_id
+        self._clients = {}
+        # client_id: (hashed secret, sha256 of the secret last verified against it)
+        self._verified_secrets = {}
+        # pending authorization codes, by code
+        self._codes = {}
         super().__init__()
 
+    def _find_client(self, client_id):
+        """Find an oauth client by id
+
+        Clients are kept in memory after the first lookup,
+        so the OAuth handshake doesn't need to query for them on every request.
+        """
+        orm_client = self._clients.get(client_id)
+        if orm_client is not None:
+            if _is_live(orm_client):
+                return orm_client
+            # deleted outside remove_client, e.g. when a server stops
+            self._forget_client(client_id)
+        orm_client = (
+            self.db.query(orm.OAuthClient).filter_by(identifier=client_id).first()
+        )
+        if orm_client is not None:
+            self._clients[client_id] = orm_client
+        return orm_client
+
+    def _forget_client(self, client_id):
+        """Remove a client from the in-memory registry"""
+        self._clients.pop(client_id, None)
+        self._verified_secrets.pop(client_id, None)
+
+    def _check_client_secret(self, orm_client, client_secret):
+        """Check a client secret against the client's hashed secret
+
+        The salted hash is expensive to compute,
+        so remember a cheap digest of the last secret that matched.
+        """
+        digest = hashlib.sha256(client_secret.encode('utf8', 'replace')).hexdigest()
+        verified = self._verified_secrets.get(orm_client.identifier)
+        if verified is not None and verified[0] == orm_client.secret:
+            if compare_digest(verified[1], digest):
+                return True
+        if not compare_token(orm_client.secret, client_secret):
+            return False
+        self._verified_secrets[orm_client.identifier] = (orm_client.secret, digest)
+        return True
+
+    def _find_code(self, code):
+        """Find a pending authorization code
+
+        Codes saved by this validator are looked up in memory,
+        falling back on the database.
+        """
+        orm_code = self._codes.get(code)
+        if orm_code is not None:
+            if _is_live(orm_code) and (
+                orm_code.expires_at is None
+                or orm_code.expires_at >= orm.OAuthCode.now()
+            ):
+                return orm_code
+            self._codes.pop(code, None)
+        return orm.OAuthCode.find(self.db, code=code)
+
+    def _prune_codes(self):
+        """Drop expired codes from memory"""
+        now = orm.OAuthCode.now()
+        for code, orm_code in list(self._codes.items()):
+            if orm_code.expires_at is not None and orm_code.expires_at < now:
+                self._codes.pop(code, None)
+
     def authenticate_client(self, request, *args, **kwargs):
         """Authenticate client through means outside the OAuth 2 spec.
         Means of authentication is negotiated beforehand and may for example
@@ -58,15 +136,13 @@ class JupyterHubRequestValidator(RequestValidator):
         app_log.debug("authenticate_client %s", request)
         client_id = request.client_id
         client_secret = request.client_secret
-        oauth_client = (
-            self.db.query(orm.OAuthClient).filter_by(identifier=client_id).first()
-        )
+        oauth_client = self._find_client(client_id)
         if oauth_client is None:
             return False
         if not client_secret or not oauth_client.secret:
             # disallow authentication with no secret
             return False
-        if not compare_token(oauth_client.secret, client_secret):
+        if not self._check_client_secret(oauth_client, client_secret):
             app_log.warning("Client secret mismatch for %s", client_id)
             return False
 
@@ -85,9 +161,7 @@ class JupyterHubRequestValidator(RequestValidator):
         Method is used by:
             - Authorization Code Grant
         """
-        orm_client = (
-            self.db.query(orm.OAuthClient).filter_by(identifier=client_id).first()
-        )
+        orm_client = self._find_client(client_id)
         if orm_client is None:
             app_log.warning("No such oauth client %s", client_id)
             return False
@@ -134,9 +208,7 @@ class JupyterHubRequestValidator(RequestValidator):
             - Authorization Code Grant
             - Implicit Grant
         """
-        orm_client = (
-            self.db.query(orm.OAuthClient).filter_by(identifier=client_id).first()
-        )
+        orm_client = self._find_client(client_id)
         if orm_client is None:
             raise KeyError(client_id)
         return orm_client.redirect_uri
@@ -152,9 +224,7 @@ class JupyterHubRequestValidator(RequestValidator):
             - Resource Owner Password Credentials Grant
             - Client Credentials grant
         """
-        orm_client = (
-            self.db.query(orm.OAuthClient).filter_by(identifier=client_id).first()
-        )
+        orm_client = self._find_client(client_id)
         if orm_client is None:
             raise ValueError(f"No such client: {client_id}")
         scopes = set(orm_client.allowed_scopes)
@@ -203,7 +273,9 @@ class JupyterHubRequestValidator(RequestValidator):
             - Authorization Code Grant
         """
         app_log.debug("Deleting oauth code %s... for %s", code[:3], client_id)
-        orm_code = self.db.query(orm.OAuthCode).filter_by(code=code).first()
+        orm_code = self._codes.pop(code, None)
+        if orm_code is None or not _is_live(orm_code):
+            orm_code = self.db.query(orm.OAuthCode).filter_by(code=code).first()
         if orm_code is not None:
             self.db.delete(orm_code)
             self.db.commit()
@@ -251,9 +323,7 @@ class JupyterHubRequestValidator(RequestValidator):
             args,
             kwargs,
         )
-        orm_client = (
-            self.db.query(orm.OAuthClient).filter_by(identifier=client_id).first()
-        )
+        orm_client = self._find_client(client_id)
         if orm_client is None:
             raise ValueError(f"No such client: {client_id}")
 
@@ -269,6 +339,8 @@ class JupyterHubRequestValidator(RequestValidator):
         orm_code.client = orm_client
         orm_code.user = request.user.orm_user
         self.db.commit()
+        self._prune_codes()
+        self._codes[orm_code.code] = orm_code
 
     def get_authorization_code_scopes(self, client_id, code, redirect_uri, request):
         """Extracts scopes from saved authorization code.
@@ -346,11 +418,7 @@ class JupyterHubRequestValidator(RequestValidator):
 
         if request.user is None:
             raise ValueError(f"No user for access token: {request.user}")
-        client = (
-            self.db.query(orm.OAuthClient)
-            .filter_by(identifier=request.client.client_id)
-            .first()
-        )
+        client = self._find_client(request.client.client_id)
         # FIXME: support refresh tokens
         # These should be in a new table
         token.pop("refresh_token", None)
@@ -419,9 +487,7 @@ class JupyterHubRequestValidator(RequestValidator):
             - Implicit Grant
         """
         app_log.debug("Validating client id %s", client_id)
-        orm_client = (
-            self.db.query(orm.OAuthClient).filter_by(identifier=client_id).first()
-        )
+        orm_client = self._find_client(client_id)
         if orm_client is None:
             return False
         if not orm_client.secret:
@@ -451,7 +517,7 @@ class JupyterHubRequestValidator(RequestValidator):
         Method is used by:
             - Authorization Code Grant
         """
-        orm_code = orm.OAuthCode.find(self.db, code=code)
+        orm_code = self._find_code(code)
         if orm_code is None:
             app_log.debug("No such code: %s", code)
             return False
@@ -499,9 +565,7 @@ class JupyterHubRequestValidator(RequestValidator):
             client_id,
             redirect_uri,
         )
-        orm_client = (
-            self.db.query(orm.OAuthClient).filter_by(identifier=client_id).first()
-        )
+        orm_client = self._find_client(client_id)
         if orm_client is None:
             app_log.warning("No such oauth client %s", client_id)
             return False
@@ -558,9 +622,7 @@ class JupyterHubRequestValidator(RequestValidator):
             - Resource Owner Password Credentials Grant
             - Client Credentials Grant
         """
-        orm_client = (
-            self.db.query(orm.OAuthClient).filter_by(identifier=client_id).one_or_none()
-        )
+        orm_client = self._find_client(client_id)
         if orm_client is None:
             app_log.warning("No such oauth client %s", client_id)
             return False
@@ -650,9 +712,7 @@ class JupyterHubOAuthServer(WebApplicationServer):
         # so we do this manually. It's protected inside a
         # transaction, so should fail if there are multiple
         # rows with the same identifier.
-        orm_client = (
-            self.db.query(orm.OAuthClient).filter_by(identifier=client_id).one_or_none()
-        )
+        orm_client = self.request_validator._find_client(client_id)
         if orm_client is None:
             orm_client = orm.OAuthClient(
                 identifier=client_id,
@@ -668,13 +728,14 @@ class JupyterHubOAuthServer(WebApplicationServer):
         orm_client.description = description or client_id
         orm_client.allowed_scopes = list(allowed_scopes)
         self.db.commit()
+        self.request_validator._forget_client(client_id)
+        self.request_validator._clients[client_id] = orm_client
         return orm_client
 
     def remove_client(self, client_id):
         """Remove a client by its id if it is existed."""
-        orm_client = (
-            self.db.query(orm.OAuthClient).filter_by(identifier=client_id).one_or_none()
-        )
+        orm_client = self.request_validator._find_client(client_id)
+        self.request_validator._forget_client(client_id)
         if orm_client is not None:
             self.db.delete(orm_client)
             self.db.commit()
@@ -684,7 +745,7 @@ class JupyterHubOAuthServer(WebApplicationServer):
 
     def fetch_by_client_id(self, client_id):
         """Find a client by its id"""
-        client = self.db.query(orm.OAuthClient).filter_by(identifier=client_id).first()
+        client = self.request_validator._find_client(client_id)
         if client and client.secret:
             return client
 
@@ -5,26 +5,28 @@
 import enum
 import json
 import numbers
+import os
+import re
 import secrets
+import time
 from base64 import decodebytes, encodebytes
 from datetime import timedelta
 from functools import lru_cache, partial
 from itertools import chain
 
-import alembic.command
-import alembic.config
 import sqlalchemy
-from alembic.script import ScriptDirectory
 from sqlalchemy import (
     Boolean,
     Column,
     DateTime,
     ForeignKey,
+    Index,
     Integer,
     MetaData,
     Table,
     Unicode,
     create_engine,
+    delete,
     event,
     exc,
     inspect,
@@ -52,6 +54,86 @@ from .utils import compare_token, fmt_ip_url, hash_token, new_token, random_port
 utcnow = partial(utcnow, with_tz=False)
 
 
+# the library used to encode and decode JSON columns: 'json' or 'orjson'
+_json_library = os.environ.get("JUPYTERHUB_DB_JSON_LIBRARY", "json")
+orjson = None
+if _json_library == "orjson":
+    try:
+        import orjson
+    except ImportError:
+        app_log.warning(
+            "JUPYTERHUB_DB_JSON_LIBRARY=orjson, but orjson is not installed."
+            " Using json."
+        )
+elif _json_library != "json":
+    app_log.warning(
+        "Unrecognized JUPYTERHUB_DB_JSON_LIBRARY=%r, using json.", _json_library
+    )
+
+
+def _json_dumps(value, default=None):
+    """Encode a value for a JSON column
+
+    Compact, with sorted keys,
+    so equal values are always stored the same way.
+    Uses orjson if enabled with JUPYTERHUB_DB_JSON_LIBRARY=orjson,
+    falling back on json for values orjson can't encode.
+    orjson stores NaN and infinity as null.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(
+                value,
+                default=default,
+                # pass datetimes and dataclasses to default, like json
+                option=orjson.OPT_SORT_KEYS
+                | orjson.OPT_NON_STR_KEYS
+                | orjson.OPT_PASSTHROUGH_DATETIME
+                | orjson.OPT_PASSTHROUGH_DATACLASS,
+            ).decode("utf8")
+        except TypeError:
+            pass
+    try:
+        return json.dumps(value, default=default, sort_keys=True, separators=(",", ":"))
+    except TypeError:
+        # keys of different types can't be sorted
+        return json.dumps(value, default=default, separators=(",", ":"))
+
+
+def _json_loads(value, object_hook=None):
+    """Decode a value from a JSON column"""
+    # orjson doesn't support object_hook, only needed for encoded bytes
+    if orjson is not None and (
+        object_hook is None or "__jupyterhub_bytes__" not in value
+    ):
+        try:
+            return orjson.loads(value)
+        except orjson.JSONDecodeError:
+            # e.g. NaN, written by json
+            pass
+    return json.loads(value, object_hook=object_hook)
+
+
+def set_if_changed(obj, **values):
+    """Set attributes of an orm object, skipping values equal to the current ones
+
+    Assigning any value marks an object as modified,
+    and flushing it has a cost (e.g. loading relationships)
+    even when no UPDATE is needed.
+    Use this for values that rarely change, like Spawner.state.
+
+    Returns True if any attribute was changed.
+
+    .. versionadded:: 5.3
+    """
+    changed = False
+    for key, value in values.items():
+        if getattr(obj, key) != value:
+            setattr(obj, key, value)
+            changed = True
+    return changed
+
+
 class JSONDict(TypeDecorator):
     """Represents an immutable structure as a json-encoded string.
 
@@ -62,6 +144,7 @@ class JSONDict(TypeDecorator):
     """
 
     impl = Text
+    cache_ok = True
 
     def _json_default(self, obj):
         """encode non-jsonable objects as JSON
@@ -85,12 +168,12 @@ class JSONDict(TypeDecorator):
 
     def process_bind_param(self, value, dialect):
         if value is not None:
-            value = json.dumps(value, default=self._json_default)
+            value = _json_dumps(value, default=self._json_default)
         return value
 
     def process_result_value(self, value, dialect):
         if value is not None:
-            value = json.loads(value, object_hook=self._object_hook)
+            value = _json_loads(value, object_hook=self._object_hook)
         return value
 
 
@@ -109,10 +192,10 @@ class JSONList(JSONDict):
 
     def process_bind_param(self, value, dialect):
         if isinstance(value, (list, tuple)):
-            value = json.dumps(value)
+            value = _json_dumps(value)
         if isinstance(value, set):
             # serialize sets as ordered lists
-            value = json.dumps(sorted(value))
+            value = _json_dumps(sorted(value))
 
         return value
 
@@ -120,7 +203,7 @@ class JSONList(JSONDict):
         if value is None:
             return []
         else:
-            value = json.loads(value)
+            value = _json_loads(value)
         return value
 
 
@@ -301,11 +384,24 @@ class User(Base):
 
     @property
     def orm_spawners(self):
-        return {s.name: s for s in self._orm_spawners}
+        """Dict of this user's Spawners, by server name
+
+        Cached until the collection of spawners changes,
+        so repeated lookups don't rebuild the dict.
+        Do not modify the returned dict.
+        """
+        spawners = self._orm_spawners
+        cached = self.__dict__.get("_orm_spawners_by_name")
+        # the cache is invalid if the collection has been reloaded
+        if cached is None or cached[0] is not spawners:
+            cached = (spawners, {s.name: s for s in spawners})
+            self.__dict__["_orm_spawners_by_name"] = cached
+        return cached[1]
 
     admin = Column(Boolean(create_constraint=False), default=False)
     created = Column(DateTime, default=utcnow)
-    last_activity = Column(DateTime, nullable=True)
+    # indexed for counting active users
+    last_activity = Column(DateTime, nullable=True, index=True)
 
     api_tokens = relationship(
         "APIToken", back_populates="user", cascade="all, delete-orphan"
@@ -391,10 +487,13 @@ class Spawner(Base):
     __tablename__ = 'spawners'
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'))
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), index=True)
     user = relationship("User", back_populates="_orm_spawners")
 
-    server_id = Column(Integer, ForeignKey('servers.id', ondelete='SET NULL'))
+    # indexed for finding running servers
+    server_id = Column(
+        Integer, ForeignKey('servers.id', ondelete='SET NULL'), index=True
+    )
     server = relationship(
         Server,
         back_populates="spawner",
@@ -573,18 +672,73 @@ class Expiring:
             return self.expires_in <= 0
 
     @classmethod
-    def purge_expired(cls, db):
-        """Purge expired API Tokens from the database"""
+    def _expired_clause(cls, now):
+        return (cls.expires_at != None) & (cls.expires_at < now)
+
+    @classmethod
+    def purge_expired_chunk(cls, db, now=None, limit=1000):
+        """Delete up to `limit` expired entries from the database
+
+        Entries are deleted with a single DELETE statement,
+        without loading them into the session.
+        Any that were already loaded are removed from the session,
+        and relationships to them are expired.
+
+        Commits, and returns the number of entries deleted.
+
+        .. versionadded:: 5.3
+        """
+        if now is None:
+            now = cls.now()
+        ids = (
+            db.execute(select(cls.id).where(cls._expired_clause(now)).limit(limit))
+            .scalars()
+            .all()
+        )
+        if not ids:
+            return 0
+        result = db.execute(
+            delete(cls)
+            .where(cls.id.in_(ids), cls._expired_clause(now))
+            .execution_options(synchronize_session=False)
+        )
+        for id in ids:
+            obj = db.identity_map.get(inspect(cls).identity_key_from_primary_key([id]))
+            if obj is not None:
+                _expunge_deleted(db, obj)
+        db.commit()
+        app_log.debug("Purged %i expired %ss", result.rowcount, cls.__name__)
+        return result.rowcount
+
+    @classmethod
+    def purge_expired_chunks(cls, db, chunk_size=1000):
+        """Purge expired entries from the database, one chunk at a time
+
+        Generator deleting up to `chunk_size` entries per iteration
+        and yielding the number deleted,
+        so callers can do something between chunks (e.g. let other tasks run).
+        Entries that expire while iterating are not included.
+
+        .. versionadded:: 5.3
+        """
         now = cls.now()
-        deleted = False
-        for obj in (
-            db.query(cls).filter(cls.expires_at != None).filter(cls.expires_at < now)
-        ):
-            app_log.debug("Purging expired %s", obj)
-            deleted = True
-            db.delete(obj)
-        if deleted:
-            db.commit()
+        while True:
+            deleted = cls.purge_expired_chunk(db, now=now, limit=chunk_size)
+            yield deleted
+            if deleted < chunk_size:
+                return
+
+    @classmethod
+    def purge_expired(cls, db, chunk_size=1000):
+        """Purge expired entries from the database
+
+        Deletes in chunks of `chunk_size`, committing after each chunk.
+        Returns the number of entries deleted.
+
+        .. versionchanged:: 5.3
+            Deletes in chunks without loading entries into the session.
+        """
+        return sum(cls.purge_expired_chunks(db, chunk_size=chunk_size))
 
 
 class Hashed(Expiring):
@@ -717,7 +871,7 @@ class _Share:
 
     # the permissions granted (!server filter will always be applied)
     scopes = Column(JSONList)
-    expires_at = Column(DateTime, nullable=True)
+    expires_at = Column(DateTime, nullable=True, index=True)
 
     @classmethod
     def apply_filter(cls, scopes, spawner):
@@ -930,9 +1084,13 @@ class ShareCode(_Share, Hashed, Base):
     """
 
     __tablename__ = "share_codes"
+    __table_args__ = (
+        # for find_prefix
+        Index("ix_share_codes_prefix_expires_at", "prefix", "expires_at"),
+    )
 
     hashed = Column(Unicode(255), unique=True)
-    prefix = Column(Unicode(16), index=True)
+    prefix = Column(Unicode(16))
     exchange_count = Column(Integer, default=0)
     last_exchanged_at = Column(DateTime, nullable=True, default=None)
 
@@ -1028,6 +1186,10 @@ class APIToken(Hashed, Base):
     """An API token"""
 
     __tablename__ = 'api_tokens'
+    __table_args__ = (
+        # for find_prefix
+        Index("ix_api_tokens_prefix_expires_at", "prefix", "expires_at"),
+    )
 
     user_id = Column(
         Integer,
@@ -1046,7 +1208,7 @@ class APIToken(Hashed, Base):
 
     id = Column(Integer, primary_key=True)
     hashed = Column(Unicode(255), unique=True)
-    prefix = Column(Unicode(16), index=True)
+    prefix = Column(Unicode(16))
 
     @property
     def api_id(self):
@@ -1080,7 +1242,8 @@ class APIToken(Hashed, Base):
     # token metadata for bookkeeping
     now = utcnow  # for expiry
     created = Column(DateTime, default=utcnow)
-    expires_at = Column(DateTime, default=None, nullable=True)
+    # indexed for purge_expired
+    expires_at = Column(DateTime, default=None, nullable=True, index=True)
     last_activity = Column(DateTime)
     note = Column(Unicode(1023))
     scopes = Column(JSONList, default=[])
@@ -1257,8 +1420,8 @@ class OAuthCode(Expiring, Base):
         "OAuthClient",
         back_populates="codes",
     )
-    code = Column(Unicode(36))
-    expires_at = Column(Integer)
+    code = Column(Unicode(36), index=True)
+    expires_at = Column(Integer, index=True)
     redirect_uri = Column(Unicode(1023))
     session_id = Column(Unicode(255))
     # state = Column(Unicode(1023))
@@ -1333,6 +1496,29 @@ class OAuthClient(Base):
 # General database utilities
 
 
+class ConfigFingerprint(Base):
+    """Fingerprints of config loaded into the database at startup
+
+    Used to skip loading config that has not changed
+    since the last startup (see JupyterHub.skip_unchanged_init).
+    """
+
+    __tablename__ = 'config_fingerprints'
+    name = Column(Unicode(255), primary_key=True)
+    fingerprint = Column(Unicode(255), nullable=False)
+    updated = Column(DateTime, default=utcnow, onupdate=utcnow)
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__}({self.name}: {self.fingerprint})>"
+
+    @classmethod
+    def find(cls, db, name):
+        """Find a fingerprint by name.
+        Returns None if not found.
+        """
+        return db.query(cls).filter(cls.name == name).first()
+
+
 class DatabaseSchemaMismatch(Exception):
     """Exception raised when the database schema version does not match
 
@@ -1350,6 +1536,54 @@ def register_foreign_keys(engine):
         cursor.close()
 
 
+# PRAGMAs set on each connection to sqlite databases,
+# tuned for concurrent reads and frequent small writes.
+# Override with the `sqlite_pragmas` key of `JupyterHub.db_kwargs`.
+SQLITE_PRAGMAS = {
+    # readers don't block the writer, and commits are appends to the log.
+    # Persists in the database file, and doesn't work on network filesystems.
+    "journal_mode": "WAL",
+    # in WAL mode, only checkpoints wait for fsync
+    "synchronous": "NORMAL",
+    # wait for locks (in milliseconds) instead of failing with 'database is locked'
+    "busy_timeout": 5000,
+    # page cache size, in KiB (16MB)
+    "cache_size": -16000,
+    # read the database via mmap, up to 64MB
+    "mmap_size": 64 * 1024 * 1024,
+    # truncate the write-ahead log to 64MB after checkpoints
+    "journal_size_limit": 64 * 1024 * 1024,
+}
+
+# PRAGMAs that only apply to database files, not in-memory databases
+_SQLITE_FILE_PRAGMAS = {"journal_mode", "mmap_size", "journal_size_limit"}
+
+
+def register_sqlite_pragmas(engine, pragmas):
+    """register PRAGMAs to set on each connection
+
+    Args:
+        pragmas (dict): values of PRAGMAs, by name.
+            PRAGMAs with value None are not set.
+
+    .. versionadded:: 5.3
+    """
+    statements = []
+    for name, value in pragmas.items():
+        if value is None:
+            continue
+        if not re.fullmatch(r"\w+", name) or not re.fullmatch(r"-?\w+", str(value)):
+            raise ValueError(f"Invalid sqlite pragma: {name}={value!r}")
+        statements.append(f"PRAGMA {name}={value}")
+
+    @event.listens_for(engine, "connect")
+    def connect(dbapi_con, con_record):
+        cursor = dbapi_con.cursor()
+        for statement in statements:
+            cursor.execute(statement)
+        cursor.close()
+
+
 def _expire_relationship(target, relationship_prop):
     """Expire relationship backrefs
 
@@ -1374,6 +1608,66 @@ def _expire_relationship(target, relationship_prop):
             session.expire(obj, [relationship_prop.back_populates])
 
 
+def _expunge_deleted(session, obj):
+    """Remove an object deleted by a bulk DELETE from the session
+
+    Expires relationships to it,
+    as `_notify_deleted_relationships` does
+    for objects deleted through the session,
+    without loading anything from the database.
+    """
+    state = inspect(obj)
+    for prop in state.mapper.relationships:
+        if not prop.back_populates:
+            continue
+        if prop.key in state.dict:
+            peers = state.dict[prop.key]
+            if peers is None:
+                continue
+            if prop.direction is interfaces.MANYTOONE or not prop.uselist:
+                peers = [peers]
+        elif prop.direction is interfaces.MANYTOONE:
+            # not loaded, look for the peer in the session by primary key
+            pairs = prop.local_remote_pairs
+            primary_key = prop.mapper.primary_key
+            if len(pairs) != len(primary_key) or not all(
+                remote is column for (_, remote), column in zip(pairs, primary_key)
+            ):
+                continue
+            ident = [
+                state.dict.get(prop.parent.get_property_by_column(local).key)
+                for local, _ in pairs
+            ]
+            if None in ident:
+                continue
+            peer = session.identity_map.get(
+                prop.mapper.identity_key_from_primary_key(ident)
+            )
+            peers = [] if peer is None else [peer]
+        else:
+            continue
+        for peer in peers:
+            if inspect(peer).persistent:
+                session.expire(peer, [prop.back_populates])
+    session.expunge(obj)
+
+
+@event.listens_for(User._orm_spawners, "append")
+@event.listens_for(User._orm_spawners, "remove")
+def _invalidate_orm_spawners(user, spawner, initiator):
+    """Invalidate the cached User.orm_spawners when spawners are added or removed"""
+    user.__dict__.pop("_orm_spawners_by_name", None)
+
+
+@event.listens_for(Spawner.name, "set")
+def _rename_orm_spawner(spawner, name, old_name, initiator):
+    """Invalidate the cached User.orm_spawners when a spawner is renamed"""
+    # don't load the user just to invalidate its cache
+    user = spawner.__dict__.get("user")
+    if user is not None:
+        user.__dict__.pop("_orm_spawners_by_name", None)
+
+
 @event.listens_for(Session, "persistent_to_deleted")
 def _notify_deleted_relationships(session, obj):
     """Expire relationships when an object becomes deleted
@@ -1386,7 +1680,31 @@ def _notify_deleted_relationships(session, obj):
             _expire_relationship(obj, prop)
 
 
-def register_ping_connection(engine):
+def register_count_invalidation(session, cache):
+    """Clear a cache of list totals when listed objects are added or deleted
+
+    e.g. when a user is created or deleted, or a server starts or stops.
+    Changes that don't add or delete rows (renames, group membership)
+    only show up in cached totals when they expire.
+
+    .. versionadded:: 5.3
+    """
+    listed_classes = (User, Group, Server, Share, ShareCode)
+
+    @event.listens_for(session, "after_flush")
+    def _clear_counts(session, flush_context):
+        # new and deleted still have their pre-flush contents here
+        for obj in chain(session.new, session.deleted):
+            if isinstance(obj, listed_classes):
+                cache.clear()
+                return
+
+
+# execution option marking the queries of `register_ping_connection`
+PING_EXECUTION_OPTION = "jupyterhub_ping"
+
+
+def register_ping_connection(engine, interval=0):
     """Check connections before using them.
 
     Avoids database errors when using stale connections.
@@ -1394,7 +1712,22 @@ def register_ping_connection(engine):
     From SQLAlchemy docs on pessimistic disconnect handling:
 
     https://docs.sqlalchemy.org/en/rel_1_1/core/pooling.html#disconnect-handling-pessimistic
+
+    Args:
+        interval (float): only check connections that have been idle in the pool
+            for longer than this many seconds.
+            If 0, connections are checked every time they are used.
+
+    .. versionchanged:: 5.3
+        Added `interval`.
     """
+    ping_stmt = select(1).execution_options(**{PING_EXECUTION_OPTION: True})
+
+    if interval:
+        # record when each connection was last returned to the pool
+        @event.listens_for(engine, "checkin")
+        def record_checkin(dbapi_connection, connection_record):
+            connection_record.info["checkin_time"] = time.monotonic()
 
     # listeners are normally registered as a decorator,
     # but we need two different signatures to avoid SAWarning:
@@ -1402,6 +1735,12 @@ def register_ping_connection(engine):
     # while we support sqla 1.4 and 2.0.
     # @event.listens_for(engine, "engine_connect")
     def ping_connection(connection):
+        if interval:
+            checkin_time = connection.connection.info.get("checkin_time")
+            # new connections (never checked in) don't need checking
+            if checkin_time is None or time.monotonic() - checkin_time < interval:
+                return
+
         # turn off "close with result".  This flag is only used with
         # "connectionless" execution, otherwise will be False in any case
         save_should_close_with_result = connection.should_close_with_result
@@ -1412,7 +1751,7 @@ def register_ping_connection(engine):
             # the SELECT of a scalar value without a table is
             # appropriately formatted for the backend
             with connection.begin() as transaction:
-                connection.scalar(select(1))
+                connection.scalar(ping_stmt)
         except exc.DBAPIError as err:
             # catch SQLAlchemy's DBAPIError, which is a wrapper
             # for the DBAPI's exception.  It includes a .connection_invalidated
@@ -1428,7 +1767,7 @@ def register_ping_connection(engine):
                 # here also causes the whole connection pool to be invalidated
                 # so that all stale connections are discarded.
                 with connection.begin() as transaction:
-                    connection.scalar(select(1))
+                    connection.scalar(ping_stmt)
             else:
                 raise
         finally:
@@ -1461,6 +1800,11 @@ def check_db_revision(engine):
     current_table_names = set(inspect(engine).get_table_names())
     my_table_names = set(Base.metadata.tables.keys())
 
+    # alembic is only needed here, don't load it on import
+    import alembic.command
+    import alembic.config
+    from alembic.script import ScriptDirectory
+
     from .dbutil import _temp_alembic_ini
 
     # alembic needs the password if it's in the URL
@@ -1543,10 +1887,15 @@ def add_row_format(base):
         t.dialect_kwargs['mysql_ROW_FORMAT'] = 'DYNAMIC'
 
 
-def new_session_factory(
-    url="sqlite:///:memory:", reset=False, expire_on_commit=False, **kwargs
-):
-    """Create a new session at url"""
+def _new_engine(url, ping_interval=0, **kwargs):
+    """Create an engine for url, with the Hub's defaults for each database
+
+    `ping_interval` is passed to `register_ping_connection`.
+    The `sqlite_pragmas` keyword argument updates `SQLITE_PRAGMAS`
+    for sqlite databases.
+    All other arguments are passed to `sqlalchemy.create_engine`.
+    """
+    sqlite_pragmas = kwargs.pop('sqlite_pragmas', None) or {}
     if url.startswith('sqlite'):
         kwargs.setdefault('connect_args', {'check_same_thread': False})
 
@@ -1563,9 +1912,25 @@ def new_session_factory(
     engine = create_engine(url, **kwargs)
     if url.startswith('sqlite'):
         register_foreign_keys(engine)
+        pragmas = dict(SQLITE_PRAGMAS)
+        if engine.url.database in {None, "", ":memory:"}:
+            for name in _SQLITE_FILE_PRAGMAS:
+                pragmas.pop(name)
+        pragmas.update(sqlite_pragmas)
+        register_sqlite_pragmas(engine, pragmas)
+    elif sqlite_pragmas:
+        app_log.warning("Ignoring sqlite_pragmas for non-sqlite database")
 
     # enable pessimistic disconnect handling
-    register_ping_connection(engine)
+    register_ping_connection(engine, ping_interval)
+    return engine
+
+
+def new_session_factory(
+    url="sqlite:///:memory:", reset=False, expire_on_commit=False, **kwargs
+):
+    """Create a new session at url"""
+    engine = _new_engine(url, **kwargs)
 
     if reset:
         Base.metadata.drop_all(engine)
@@ -1573,7 +1938,12 @@ def new_session_factory(
     if mysql_large_prefix_check(engine):  # if mysql is allows large indexes
         add_row_format(Base)  # set format on the tables
     # check the db revision (will raise, pointing to `upgrade-db` if version doesn't match)
-    check_db_revision(engine)
+    try:
+        check_db_revision(engine)
+    except DatabaseSchemaMismatch:
+        # close connections, e.g. so sqlite can clean up its write-ahead log
+        engine.dispose()
+        raise
 
     Base.metadata.create_all(engine)
 
@@ -1585,6 +1955,56 @@ def new_session_factory(
     return session_factory
 
 
+def new_read_session_factory(url, **kwargs):
+    """Create a new session factory for read-only queries at url
+
+    For a read replica of the Hub database.
+    Unlike `new_session_factory`, the schema is not created or checked,
+    since that is the primary database's job.
+    Sessions should be short-lived (e.g. one per request),
+    so that they don't serve objects loaded before the replica caught up.
+
+    .. versionadded:: 5.3
+    """
+    engine = _new_engine(url, **kwargs)
+    return sessionmaker(bind=engine, autoflush=False)
+
+
+# maximum number of values to pass to a single `IN (...)` clause
+# sqlite limits the number of bound parameters in a single statement
+IN_CLAUSE_CHUNK_SIZE = 1000
+
+
+def chunked(items, chunk_size=IN_CLAUSE_CHUNK_SIZE):
+    """Yield successive lists of at most `chunk_size` items"""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def find_by_names(db, Class, names):
+    """Find many User/Group/Service/Role objects by name
+
+    Like calling `Class.find(db, name)` for each name,
+    but with one query per chunk of names instead of one query per name.
+
+    Names that are not found in the database are omitted.
+
+    Returns:
+      found (dict): {name: orm_object} for objects found in the database
+    """
+    found = {}
+    for chunk in chunked(set(names)):
+        for orm_obj in db.query(Class).filter(Class.name.in_(chunk)):
+            found[orm_obj.name] = orm_obj
+    return found
+
+
 def get_class(resource_name):
     """Translates resource string names to ORM classes"""
     class_dict = {
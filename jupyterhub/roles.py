@@ -5,7 +5,7 @@
 import re
 from functools import wraps
 
-from sqlalchemy import func
+from sqlalchemy import func, insert, inspect
 from tornado.log import app_log
 
 from . import orm, scopes
@@ -307,6 +307,192 @@ def strip_role(db, entity, role, managed=False, commit=True):
         )
 
 
+def _expire_role_collections(db, role, entity_name, entity_ids=None, entities=None):
+    """Expire in-memory role collections after modifying an association table directly
+
+    Bulk inserts and deletes bypass the ORM,
+    so `role.users` and `user.roles` already loaded in the session would be stale.
+
+    Entities are either given, or looked up by id in the session's identity map,
+    so the cost is proportional to the number of entities, not the session size.
+    """
+    db.expire(role, [f'{entity_name}s'])
+    if entities is None:
+        mapper = inspect(orm.get_class(f'{entity_name}s'))
+        entities = []
+        for entity_id in entity_ids:
+            obj = db.identity_map.get(mapper.identity_key_from_primary_key([entity_id]))
+            if obj is not None:
+                entities.append(obj)
+    for entity in entities:
+        db.expire(entity, ['roles'])
+
+
+def grant_role_bulk(db, entities, role, *, managed=False, commit=True):
+    """Adds a role for many users, services or groups at once
+
+    Equivalent to calling `grant_role` for each entity,
+    but checks and inserts the role assignments with a few queries
+    instead of several queries per entity.
+
+    All entities must be of the same kind and already have an id
+    (i.e. they must have been flushed to the database).
+
+    Returns:
+      n_added (int): the number of new role assignments
+    """
+    entities = list(entities)
+    if not entities:
+        return 0
+    if isinstance(role, str):
+        rolename = role
+        role = orm.Role.find(db, rolename)
+        if role is None:
+            raise ValueError(f"Role {rolename} does not exist")
+
+    entity_name = type(entities[0]).__name__.lower()
+    association_class = orm._role_associations[entity_name]
+    kind_id = getattr(association_class, f'{entity_name}_id')
+
+    entity_ids = {entity.id for entity in entities}
+    existing_ids = set()
+    for chunk in orm.chunked(entity_ids):
+        existing_ids.update(
+            entity_id
+            for (entity_id,) in db.query(kind_id).filter(
+                kind_id.in_(chunk) & (association_class.role_id == role.id)
+            )
+        )
+    to_add = [entity for entity in entities if entity.id not in existing_ids]
+    if not to_add:
+        return 0
+
+    db.execute(
+        insert(association_class.__table__),
+        [
+            {
+                f'{entity_name}_id': entity.id,
+                'role_id': role.id,
+                'managed_by_auth': managed,
+            }
+            for entity in to_add
+        ],
+    )
+    _expire_role_collections(db, role, entity_name, entities=to_add)
+
+    app_log.info(
+        'Adding role %s for %i %ss',
+        role.name,
+        len(to_add),
+        type(to_add[0]).__name__,
+    )
+    if commit:
+        db.commit()
+    return len(to_add)
+
+
+def set_role_members(db, role, kind, member_ids, *, managed=False, commit=True):
+    """Set the exact list of users, services or groups with a role
+
+    Set-based equivalent of `setattr(role, kind, members)`:
+    the desired members are compared with the current role assignments
+    and the difference is applied with bulk inserts and deletes,
+    rather than granting or stripping the role one entity at a time.
+
+    Arguments:
+      role (orm.Role): the role to assign
+      kind (str): 'users', 'services', or 'groups'
+      member_ids (iterable): ids of all the entities of this kind that should have the role
+      managed (bool): whether the assignments are managed by the Authenticator.
+          If True, existing assignments for members are marked as managed as well.
+
+    Returns:
+      (added, removed) (tuple): the number of assignments added and removed
+    """
+    entity_name = kind[:-1]
+    association_class = orm._role_associations[entity_name]
+    kind_id = getattr(association_class, f'{entity_name}_id')
+    member_ids = set(member_ids)
+    current_ids = {
+        entity_id
+        for (entity_id,) in db.query(kind_id).filter(
+            association_class.role_id == role.id
+        )
+    }
+    to_add = member_ids.difference(current_ids)
+    to_remove = current_ids.difference(member_ids)
+
+    for chunk in orm.chunked(to_remove):
+        db.query(association_class).filter(
+            (association_class.role_id == role.id) & kind_id.in_(chunk)
+        ).delete(synchronize_session=False)
+    if to_add:
+        db.execute(
+            insert(association_class.__table__),
+            [
+                {
+                    f'{entity_name}_id': entity_id,
+                    'role_id': role.id,
+                    'managed_by_auth': managed,
+                }
+                for entity_id in to_add
+            ],
+        )
+    if managed:
+        for chunk in orm.chunked(member_ids.intersection(current_ids)):
+            db.query(association_class).filter(
+                (association_class.role_id == role.id)
+                & kind_id.in_(chunk)
+                & (association_class.managed_by_auth == False)
+            ).update({"managed_by_auth": True}, synchronize_session=False)
+
+    if to_add or to_remove:
+        _expire_role_collections(db, role, entity_name, to_add | to_remove)
+        app_log.info(
+            'Role %s: added %i and removed %i %s',
+            role.name,
+            len(to_add),
+            len(to_remove),
+            kind,
+        )
+    if commit:
+        db.commit()
+    return len(to_add), len(to_remove)
+
+
+def strip_role_assignments(db, kind, assignments, *, commit=True):
+    """Remove many role assignments at once
+
+    Arguments:
+      kind (str): 'users', 'services', or 'groups'
+      assignments (iterable): (entity_id, role_id) tuples to remove
+
+    Returns:
+      n_removed (int): the number of assignments removed
+    """
+    entity_name = kind[:-1]
+    association_class = orm._role_associations[entity_name]
+    kind_id = getattr(association_class, f'{entity_name}_id')
+    by_role = {}
+    for entity_id, role_id in assignments:
+        by_role.setdefault(role_id, set()).add(entity_id)
+
+    n_removed = 0
+    for role_id, entity_ids in by_role.items():
+        for chunk in orm.chunked(entity_ids):
+            n_removed += (
+                db.query(association_class)
+                .filter((association_class.role_id == role_id) & kind_id.in_(chunk))
+                .delete(synchronize_session=False)
+            )
+        role = db.get(orm.Role, role_id)
+        if role is not None:
+            _expire_role_collections(db, role, entity_name, entity_ids)
+    if commit:
+        db.commit()
+    return n_removed
+
+
 def assign_default_roles(db, entity):
     """Assigns default role(s) to an entity:
 
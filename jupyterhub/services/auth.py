@@ -32,9 +32,13 @@ import random
 import re
 import secrets
 import socket
+import ssl
 import string
+import sys
+import threading
 import time
 import warnings
+from collections.abc import MutableMapping
 from functools import partial
 from http import HTTPStatus
 from unittest import mock
@@ -43,6 +47,7 @@ from urllib.parse import urlencode, urlparse
 from tornado.httpclient import AsyncHTTPClient, HTTPRequest
 from tornado.httputil import url_concat
 from tornado.log import app_log
+from tornado.simple_httpclient import SimpleAsyncHTTPClient
 from tornado.web import HTTPError, RequestHandler
 from tornado.websocket import WebSocketHandler
 from traitlets import (
@@ -52,6 +57,7 @@ from traitlets import (
     Instance,
     Integer,
     Set,
+    Type,
     Unicode,
     default,
     observe,
@@ -59,6 +65,7 @@ from traitlets import (
 )
 from traitlets.config import SingletonConfigurable
 
+from .. import crypto
 from .._xsrf_utils import (
     _anonymous_xsrf_id,
     _needs_check_xsrf,
@@ -66,8 +73,9 @@ from .._xsrf_utils import (
     check_xsrf_cookie,
     get_xsrf_token,
 )
+from ..metrics import HUB_AUTH_API_REQUESTS, HubAuthConnection
 from ..scopes import _intersect_expanded_scopes
-from ..utils import _bool_env, get_browser_protocol, url_path_join
+from ..utils import _bool_env, get_browser_protocol, make_ssl_context, url_path_join
 
 
 def check_scopes(required_scopes, scopes):
@@ -105,6 +113,17 @@ def check_scopes(required_scopes, scopes):
     return set(required_scopes) & intersection
 
 
+def _reuses_connections(client_class):
+    """Whether an AsyncHTTPClient class keeps connections alive between requests
+
+    Only tornado's curl client does.
+    """
+    curl_httpclient = sys.modules.get("tornado.curl_httpclient")
+    return curl_httpclient is not None and issubclass(
+        client_class, curl_httpclient.CurlAsyncHTTPClient
+    )
+
+
 class _ExpiringDict(dict):
     """Dict-like cache for Hub API requests
 
@@ -175,6 +194,17 @@ class _ExpiringDict(dict):
         del self.values[key]
         del self.timestamps[key]
 
+    def __iter__(self):
+        return iter(list(self.values))
+
+    def age(self, key):
+        """Return the age (in seconds) of a cached value
+
+        Raises KeyError if there is no such value, or it has expired.
+        """
+        self._check_age(key)
+        return time.monotonic() - self.timestamps[key]
+
     def get(self, key, default=None):
         """dict-like get"""
         try:
@@ -224,6 +254,152 @@ class _ExpiringDict(dict):
                 del self[key]
 
 
+class SharedFileCache(MutableMapping):
+    """Cache for Hub API requests, shared by processes on one host
+
+    Values are stored as JSON in an sqlite database at `path`,
+    so services running with several worker processes
+    only need to ask the Hub about a given token once.
+
+    Values will expire after max_age seconds,
+    and the least recently stored values are discarded
+    once there are more than max_size entries.
+    A max_age or max_size of 0 means no limit.
+
+    Use with::
+
+        c.HubAuth.cache_class = "jupyterhub.services.auth.SharedFileCache"
+        c.HubAuth.cache_kwargs = {"path": "/path/to/cache.sqlite"}
+
+    The cache file contains user models,
+    so it is created readable only by the current user.
+
+    .. versionadded:: 5.3
+    """
+
+    def __init__(self, max_age=0, path="", max_size=10000, purge_interval="max_age"):
+        if not path:
+            raise ValueError("SharedFileCache requires a path")
+        self.path = os.path.abspath(path)
+        self.max_age = max_age
+        self.max_size = max_size
+        if purge_interval == "max_age":
+            # default behavior: use max_age
+            purge_interval = max_age
+        self.purge_interval = purge_interval
+        self._last_purge = time.monotonic()
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_pid = None
+
+    @property
+    def db(self):
+        """The sqlite connection for this process"""
+        if self._db is None or self._db_pid != os.getpid():
+            # connections can't be shared across fork
+            import sqlite3
+
+            if not os.path.exists(self.path):
+                # create the file with private permissions
+                os.close(os.open(self.path, os.O_CREAT | os.O_WRONLY, 0o600))
+            db = sqlite3.connect(
+                self.path, timeout=10, isolation_level=None, check_same_thread=False
+            )
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS hub_auth_cache"
+                " (key TEXT PRIMARY KEY, value TEXT, timestamp REAL)"
+            )
+            db.execute(
+                "CREATE INDEX IF NOT EXISTS hub_auth_cache_timestamp"
+                " ON hub_auth_cache (timestamp)"
+            )
+            self._db = db
+            self._db_pid = os.getpid()
+        return self._db
+
+    def _execute(self, query, *args):
+        with self._lock:
+            return self.db.execute(query, args).fetchall()
+
+    def __len__(self):
+        return self._execute("SELECT COUNT(*) FROM hub_auth_cache")[0][0]
+
+    def __iter__(self):
+        return iter([row[0] for row in self._execute("SELECT key FROM hub_auth_cache")])
+
+    def __setitem__(self, key, value):
+        """Store key and record timestamp"""
+        self._maybe_purge()
+        self._execute(
+            "INSERT OR REPLACE INTO hub_auth_cache (key, value, timestamp) VALUES (?, ?, ?)",
+            key,
+            json.dumps(value),
+            time.time(),
+        )
+        if self.max_size > 0:
+            # discard the oldest entries beyond max_size
+            self._execute(
+                "DELETE FROM hub_auth_cache WHERE key IN"
+                " (SELECT key FROM hub_auth_cache ORDER BY timestamp DESC, rowid DESC LIMIT -1 OFFSET ?)",
+                self.max_size,
+            )
+
+    def __getitem__(self, key):
+        """Check age before returning value"""
+        self._maybe_purge()
+        rows = self._execute(
+            "SELECT value, timestamp FROM hub_auth_cache WHERE key = ?", key
+        )
+        if not rows:
+            raise KeyError(key)
+        value, timestamp = rows[0]
+        if self.max_age > 0 and timestamp + self.max_age < time.time():
+            self._execute("DELETE FROM hub_auth_cache WHERE key = ?", key)
+            raise KeyError(key)
+        return json.loads(value)
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self._execute("DELETE FROM hub_auth_cache WHERE key = ?", key)
+
+    def age(self, key):
+        """Return the age (in seconds) of a cached value
+
+        Raises KeyError if there is no such value, or it has expired.
+        """
+        rows = self._execute("SELECT timestamp FROM hub_auth_cache WHERE key = ?", key)
+        if not rows:
+            raise KeyError(key)
+        age = time.time() - rows[0][0]
+        if self.max_age > 0 and age > self.max_age:
+            raise KeyError(key)
+        return age
+
+    def clear(self):
+        """Clear the cache"""
+        self._execute("DELETE FROM hub_auth_cache")
+        self._last_purge = time.monotonic()
+
+    def _maybe_purge(self):
+        """purge expired values _if_ it's been purge_interval since the last purge"""
+        if not self.purge_interval > 0:
+            return
+        now = time.monotonic()
+        if self._last_purge < (now - self.purge_interval):
+            self.purge_expired()
+
+    def purge_expired(self):
+        """Purge all expired values"""
+        self._last_purge = time.monotonic()
+        if not self.max_age > 0:
+            return
+        self._execute(
+            "DELETE FROM hub_auth_cache WHERE timestamp < ?", time.time() - self.max_age
+        )
+
+
 class HubAuth(SingletonConfigurable):
     """A class for authenticating with JupyterHub
 
@@ -477,11 +653,105 @@ class HubAuth(SingletonConfigurable):
         Default: 300 (five minutes)
         """,
     ).tag(config=True)
-    cache = Instance(_ExpiringDict, allow_none=False)
+
+    cache_stale_max_age = Integer(
+        30,
+        help="""How long (in seconds) a cached response may still be used after `cache_max_age`.
+
+        During this time, the stale response is used
+        while it is refreshed from the Hub in the background,
+        so requests don't wait on the Hub when a cached response expires.
+        After `cache_max_age + cache_stale_max_age`,
+        responses are never used.
+
+        This makes the window in which a revoked token is still accepted longer.
+        The Hub doesn't notify services when tokens are revoked,
+        so a service may accept a revoked token
+        for up to `cache_max_age + cache_stale_max_age` seconds
+        (330 by default) instead of `cache_max_age` (300).
+        Set to 0 to keep the revocation window at `cache_max_age`.
+
+        Only used if `cache_class` implements `age(key)`,
+        as the default cache and :class:`SharedFileCache` do.
+
+        .. versionadded:: 5.3
+        """,
+    ).tag(config=True)
+    cache_class = Type(
+        _ExpiringDict,
+        klass=MutableMapping,
+        help="""The class to use for caching the Hub's responses.
+
+        The default is an in-memory cache for each process.
+        Use :class:`SharedFileCache` to share the cache
+        across processes on the same host,
+        e.g. for a service run with several worker processes.
+
+        The class is instantiated with `max_age=cache_max_age`,
+        plus any arguments in `cache_kwargs`.
+        Expired keys must raise KeyError on access.
+
+        .. versionadded:: 5.3
+        """,
+    ).tag(config=True)
+
+    cache_kwargs = Dict(
+        help="""Extra keyword arguments to pass to `cache_class`
+
+        e.g. `{"path": "/path/to/cache.sqlite"}` for :class:`SharedFileCache`.
+
+        .. versionadded:: 5.3
+        """,
+    ).tag(config=True)
+
+    cache = Instance(MutableMapping, allow_none=False)
 
     @default('cache')
     def _default_cache(self):
-        return _ExpiringDict(self.cache_max_age)
+        max_age = self.cache_max_age
+        if max_age and hasattr(self.cache_class, "age"):
+            # keep values for the stale period, checking their age on use
+            max_age += self.cache_stale_max_age
+        return self.cache_class(max_age=max_age, **self.cache_kwargs)
+
+    def _cache_is_stale(self, cache_key):
+        """Whether a cached value is past cache_max_age, and should be refreshed"""
+        if not (self.cache_max_age and self.cache_stale_max_age):
+            return False
+        age = getattr(self.cache, "age", None)
+        if age is None:
+            return False
+        try:
+            return age(cache_key) > self.cache_max_age
+        except KeyError:
+            return False
+
+    cache_error_max_age = Integer(
+        5,
+        help="""The time (in seconds) to cache failed requests to the Hub.
+
+        Requests for the same token will fail immediately during this time,
+        instead of retrying, which protects the Hub from retry storms
+        when it is having trouble.
+
+        Set to 0 to disable caching failures.
+
+        .. versionadded:: 5.3
+        """,
+    ).tag(config=True)
+
+    _error_cache = Instance(_ExpiringDict, allow_none=False)
+
+    @default('_error_cache')
+    def _default_error_cache(self):
+        return _ExpiringDict(self.cache_error_max_age)
+
+    _pending_requests = Dict(
+        help="""In-flight requests to the Hub, by (event loop, cache_key)
+
+        Concurrent cache misses for the same key await the same request.
+        """
+    )
 
     @property
     def oauth_scopes(self):
@@ -514,30 +784,98 @@ class HubAuth(SingletonConfigurable):
             return {f'access:services!service={service_name}'}
         return set()
 
-    _pool = Any(help="Thread pool for running async methods in the background")
+    api_max_connections = Integer(
+        10,
+        help="""The maximum number of concurrent connections to the Hub API.
 
-    @default("_pool")
-    def _new_pool(self):
-        # start a single ThreadPool in the background
-        from concurrent.futures import ThreadPoolExecutor
+        Additional requests are queued.
 
-        pool = ThreadPoolExecutor(1)
-        # create an event loop in the thread
-        pool.submit(self._setup_asyncio_thread).result()
-        return pool
+        Connections are only kept alive between requests
+        with tornado's curl client, which requires pycurl.
+        It is used if pycurl is installed,
+        unless AsyncHTTPClient is configured to use another implementation.
+        tornado's simple client makes a new connection for every request.
 
-    def _setup_asyncio_thread(self):
-        """Create asyncio loop
+        .. versionadded:: 5.3
+        """,
+    ).tag(config=True)
 
-        To be called from the background thread,
-        so that any thread-local state is setup correctly
+    _http_clients = Dict(help="HTTP clients for the Hub API, by event loop")
+
+    def _get_http_client(self):
+        """Get the HTTP client for requests to the Hub API on the current loop"""
+        loop = asyncio.get_running_loop()
+        client = self._http_clients.get(loop)
+        if client is None:
+            # close clients of loops that have since been closed
+            for closed_loop in [key for key in self._http_clients if key.is_closed()]:
+                self._http_clients.pop(closed_loop).close()
+            client = self._http_clients[loop] = self._new_http_client()
+        return client
+
+    def _new_http_client(self):
+        """Create an HTTP client for requests to the Hub API
+
+        Uses the implementation AsyncHTTPClient is configured with.
+        If that is tornado's default simple client and pycurl is available,
+        the curl client is used instead (as in the Hub),
+        which keeps connections alive and reuses TLS sessions.
+        The simple client shares one SSL context for all requests.
         """
-        self._thread_loop = asyncio.new_event_loop()
+        kwargs = {}
+        client_class = AsyncHTTPClient.configured_class()
+        if client_class is SimpleAsyncHTTPClient:
+            try:
+                from tornado.curl_httpclient import CurlAsyncHTTPClient
+            except ImportError:
+                pass
+            else:
+                client_class = CurlAsyncHTTPClient
+
+        defaults = {}
+        if _reuses_connections(client_class):
+            if self.certfile:
+                defaults["client_cert"] = self.certfile
+            if self.keyfile:
+                defaults["client_key"] = self.keyfile
+            if self.client_ca:
+                defaults["ca_certs"] = self.client_ca
+        else:
+            ssl_context = make_ssl_context(
+                self.keyfile, self.certfile, cafile=self.client_ca
+            )
+            if ssl_context is None and self.client_ca:
+                ssl_context = ssl.create_default_context(cafile=self.client_ca)
+            if ssl_context is not None:
+                defaults["ssl_options"] = ssl_context
+        if defaults:
+            kwargs["defaults"] = defaults
+        if client_class is AsyncHTTPClient.configured_class():
+            # instantiate via AsyncHTTPClient to apply its configured arguments
+            client_class = AsyncHTTPClient
+        return client_class(
+            force_instance=True,
+            max_clients=self.api_max_connections,
+            **kwargs,
+        )
+
+    _thread_loop = Any(help="Event loop running async methods in the background")
+
+    @default("_thread_loop")
+    def _start_thread_loop(self):
+        # run the loop continuously in a background thread,
+        # so background tasks (e.g. cache refresh) make progress between calls
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(
+            target=loop.run_forever, name="HubAuth-asyncio", daemon=True
+        )
+        thread.start()
+        return loop
 
     def _synchronize(self, async_f, *args, **kwargs):
         """Call an async method in our background thread"""
-        future = self._pool.submit(
-            lambda: self._thread_loop.run_until_complete(async_f(*args, **kwargs))
+        future = asyncio.run_coroutine_threadsafe(
+            async_f(*args, **kwargs), self._thread_loop
         )
         return future.result()
 
@@ -568,26 +906,79 @@ class HubAuth(SingletonConfigurable):
 
         Raises an HTTPError if the request failed for a reason other than no such user.
         """
-        if use_cache:
-            if cache_key is None:
-                raise ValueError("cache_key is required when using cache")
-            # check for a cached reply, so we don't check with the Hub if we don't have to
-            try:
-                return self.cache[cache_key]
-            except KeyError:
-                app_log.debug("HubAuth cache miss: %s", cache_key)
+        if not use_cache:
+            return await self._fetch_hub_authorization(url, api_token)
 
-        data = await self._api_request(
-            'GET',
-            url,
-            headers={"Authorization": "token " + api_token},
-            allow_403=True,
+        if cache_key is None:
+            raise ValueError("cache_key is required when using cache")
+        # check for a cached reply, so we don't check with the Hub if we don't have to
+        try:
+            data = self.cache[cache_key]
+        except KeyError:
+            app_log.debug("HubAuth cache miss: %s", cache_key)
+        else:
+            if self._cache_is_stale(cache_key):
+                # use the stale value while we refresh it in the background
+                app_log.debug("HubAuth cache refresh: %s", cache_key)
+                self._pending_hub_authorization(url, api_token, cache_key)
+            return data
+
+        error = self._error_cache.get(cache_key)
+        if error is not None:
+            app_log.debug("HubAuth cached failure: %s", cache_key)
+            raise HTTPError(error.status_code, error.log_message, reason=error.reason)
+
+        pending = self._pending_hub_authorization(url, api_token, cache_key)
+        # shield, so one cancelled request doesn't cancel the others waiting
+        return await asyncio.shield(pending)
+
+    def _pending_hub_authorization(self, url, api_token, cache_key):
+        """Get the pending request to the Hub for cache_key, starting one if needed
+
+        Ensures there is only one request to the Hub at a time for a given key.
+        """
+        pending_key = (asyncio.get_running_loop(), cache_key)
+        pending = self._pending_requests.get(pending_key)
+        if pending is not None:
+            app_log.debug("Waiting for pending Hub request: %s", cache_key)
+            return pending
+
+        pending = asyncio.ensure_future(
+            self._fetch_hub_authorization(url, api_token, cache_key)
         )
+        self._pending_requests[pending_key] = pending
+
+        def _done(f):
+            self._pending_requests.pop(pending_key, None)
+            if not f.cancelled():
+                # consume the error (raised to waiters, if any)
+                # to avoid unretrieved exception warnings for background refresh
+                f.exception()
+
+        pending.add_done_callback(_done)
+        return pending
+
+    async def _fetch_hub_authorization(self, url, api_token, cache_key=None):
+        """Make the request to the Hub for _check_hub_authorization
+
+        Results (and failures) are cached if cache_key is given.
+        """
+        try:
+            data = await self._api_request(
+                'GET',
+                url,
+                headers={"Authorization": "token " + api_token},
+                allow_403=True,
+            )
+        except HTTPError as e:
+            if cache_key is not None and self.cache_error_max_age:
+                self._error_cache[cache_key] = e
+            raise
         if data is None:
             app_log.warning("No Hub user identified for request")
         else:
             app_log.debug("Received request from Hub user %s", data)
-        if use_cache:
+        if cache_key is not None:
             # cache result
             self.cache[cache_key] = data
         return data
@@ -597,20 +988,14 @@ class HubAuth(SingletonConfigurable):
         allow_403 = kwargs.pop('allow_403', False)
         headers = kwargs.setdefault('headers', {})
         headers.setdefault('Authorization', f'token {self.api_token}')
-        # translate requests args to tornado's
-        if self.certfile:
-            kwargs["client_cert"] = self.certfile
-        if self.keyfile:
-            kwargs["client_key"] = self.keyfile
-        if self.client_ca:
-            kwargs["ca_certs"] = self.client_ca
         req = HTTPRequest(
             url,
             method=method,
             **kwargs,
         )
+        client = self._get_http_client()
         try:
-            r = await AsyncHTTPClient().fetch(req, raise_error=False)
+            r = await client.fetch(req, raise_error=False)
         except Exception as e:
             app_log.error("Error connecting to %s: %s", self.api_url, e)
             msg = f"Failed to connect to Hub API at {self.api_url!r}."
@@ -622,6 +1007,12 @@ class HubAuth(SingletonConfigurable):
                 )
             raise HTTPError(500, msg)
 
+        # curl reports no connect time when a connection is reused
+        if _reuses_connections(type(client)) and r.time_info.get("connect", None) == 0:
+            HUB_AUTH_API_REQUESTS.labels(connection=HubAuthConnection.reused).inc()
+        else:
+            HUB_AUTH_API_REQUESTS.labels(connection=HubAuthConnection.new).inc()
+
         data = None
         try:
             status = HTTPStatus(r.code)
@@ -913,6 +1304,67 @@ class HubOAuth(HubAuth):
         """
         return self.cookie_name + '-oauth-state'
 
+    @property
+    def identity_cookie_name(self):
+        """The cookie name for storing the Hub's identity assertion
+
+        .. versionadded:: 5.3
+        """
+        return self.cookie_name + '-identity'
+
+    identity_public_key = Unicode(
+        help="""Public key for verifying identity assertions from the Hub.
+
+        If the Hub issues identity assertions (`JupyterHub.identity_assertion_max_age`),
+        the assertion for a browser session is stored in a cookie,
+        and verified locally with this key until it expires,
+        instead of asking the Hub to identify the user on each request.
+        This allows processes that don't share a cache to skip the Hub as well.
+
+        Get from $JUPYTERHUB_IDENTITY_PUBLIC_KEY by default.
+        Requires the `cryptography` package.
+
+        .. versionadded:: 5.3
+        """,
+    ).tag(config=True)
+
+    @default('identity_public_key')
+    def _default_identity_public_key(self):
+        return os.getenv('JUPYTERHUB_IDENTITY_PUBLIC_KEY', '')
+
+    def user_for_identity_assertion(self, assertion, token):
+        """Get the user model from an identity assertion signed by the Hub
+
+        Args:
+            assertion (str): the `identity_assertion` field of a user model from the Hub
+            token (str): the token the assertion must have been issued for
+        Returns:
+            user_model (dict): The identity fields of the user model
+            if the assertion is valid for this client and token, None otherwise.
+
+        .. versionadded:: 5.3
+        """
+        if not self.identity_public_key:
+            return None
+        try:
+            claims = crypto.verify_identity(self.identity_public_key, assertion)
+        except (ValueError, crypto.CryptographyUnavailable) as e:
+            app_log.warning("Not using identity assertion: %s", e)
+            return None
+        token_hash = hashlib.sha256(token.encode("utf8", "replace")).hexdigest()
+        if claims.get("aud") != self.oauth_client_id:
+            app_log.warning("Identity assertion is for %s", claims.get("aud"))
+            return None
+        if claims.get("token_hash") != token_hash:
+            return None
+        if claims.get("exp", 0) < time.time():
+            return None
+        return {
+            key: value
+            for key, value in claims.items()
+            if key not in {"aud", "exp", "token_hash"}
+        }
+
     def _get_token_cookie(self, handler):
         """Base class doesn't store tokens in cookies"""
         if hasattr(handler, "_hub_auth_token_cookie"):
@@ -1018,14 +1470,37 @@ class HubOAuth(HubAuth):
                 return None
 
         if token:
+            if self.identity_public_key:
+                # use the Hub's identity assertion, if we have a valid one
+                assertion = handler.get_cookie(self.identity_cookie_name)
+                if assertion:
+                    user_model = self.user_for_identity_assertion(assertion, token)
+                    if user_model:
+                        return user_model
             user_model = await self.user_for_token(
                 token, session_id=session_id, sync=False
             )
             if user_model is None:
                 app_log.warning("Token stored in cookie may have expired")
-                self._clear_cookie(handler, self.cookie_name, path=self.cookie_path)
+                self.clear_cookie(handler)
+            elif self.identity_public_key and user_model.get("identity_assertion"):
+                self._set_identity_cookie(
+                    handler, user_model["identity_assertion"], token
+                )
             return user_model
 
+    def _set_identity_cookie(self, handler, assertion, token):
+        """Store the Hub's identity assertion for this session in a cookie"""
+        if len(assertion) > 4000:
+            app_log.debug("Identity assertion too large for a cookie")
+            return
+        if not self.user_for_identity_assertion(assertion, token):
+            # e.g. expired while cached
+            return
+        handler.set_cookie(
+            self.identity_cookie_name, assertion, **self._cookie_kwargs(handler)
+        )
+
     # HubOAuth API
 
     oauth_client_id = Unicode(
@@ -1245,8 +1720,8 @@ class HubOAuth(HubAuth):
         state = self._decode_state(state_id)
         return state.get('cookie_name') or self.state_cookie_name
 
-    def set_cookie(self, handler, access_token):
-        """Set a cookie recording OAuth result"""
+    def _cookie_kwargs(self, handler):
+        """The options for setting cookies"""
         kwargs = {'path': self.cookie_path, 'httponly': True}
         if (
             get_browser_protocol(handler.request) == 'https'
@@ -1255,6 +1730,11 @@ class HubOAuth(HubAuth):
             kwargs['secure'] = True
         # load user cookie overrides
         kwargs.update(self.cookie_options)
+        return kwargs
+
+    def set_cookie(self, handler, access_token):
+        """Set a cookie recording OAuth result"""
+        kwargs = self._cookie_kwargs(handler)
         app_log.debug(
             "Setting oauth cookie for %s: %s, %s",
             handler.request.remote_ip,
@@ -1279,6 +1759,10 @@ class HubOAuth(HubAuth):
             handler (tornado.web.RequestHandler): the current request handler
         """
         self._clear_cookie(handler, self.cookie_name, path=self.cookie_path)
+        if self.identity_public_key:
+            self._clear_cookie(
+                handler, self.identity_cookie_name, path=self.cookie_path
+            )
 
 
 class UserNotAllowed(Exception):
@@ -425,6 +425,9 @@ class Service(LoggingConfigurable):
         env.update(self.environment)
 
         env['JUPYTERHUB_SERVICE_NAME'] = self.name
+        identity_public_key = self.app.tornado_settings.get("identity_public_key")
+        if identity_public_key:
+            env['JUPYTERHUB_IDENTITY_PUBLIC_KEY'] = identity_public_key
         if self.url:
             env['JUPYTERHUB_SERVICE_URL'] = self.url
             env['JUPYTERHUB_SERVICE_PREFIX'] = self.server.base_url
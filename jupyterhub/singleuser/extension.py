@@ -38,7 +38,7 @@ from jupyter_server.extension.application import ExtensionApp
 from tornado.httpclient import AsyncHTTPClient, HTTPRequest
 from tornado.httputil import url_concat
 from tornado.web import HTTPError
-from traitlets import Any, Bool, Instance, Integer, Unicode, default
+from traitlets import Any, Bool, Float, Instance, Integer, Unicode, default
 
 from jupyterhub._version import __version__, _check_version
 from jupyterhub.log import log_request
@@ -360,6 +360,44 @@ class JupyterHubSingleUser(ExtensionApp):
         hub_version = resp.headers.get('X-JupyterHub-Version')
         _check_version(hub_version, __version__, self.log)
 
+    hub_version = Unicode(
+        help="""The version of the Hub that launched this server.
+
+        Set from $JUPYTERHUB_VERSION by Hubs >= 5.3.
+        If known, the version is checked without a request to the Hub,
+        so the server can start without waiting for the Hub to respond.
+        """
+    )
+
+    @default("hub_version")
+    def _default_hub_version(self):
+        return os.environ.get("JUPYTERHUB_VERSION", "")
+
+    startup_jitter = Float(
+        config=True,
+        help="""
+        Maximum random delay (in seconds) before the first activity update
+        is sent to the Hub after startup.
+
+        Spreads out requests to the Hub when many servers start at the same time.
+        Activity is not reported to the Hub during this delay,
+        so it is disabled by default.
+        A few seconds is enough for Hubs where hundreds of servers start at once.
+
+        Default: $JUPYTERHUB_SINGLEUSER_STARTUP_JITTER or 0
+
+        .. versionadded:: 5.3
+        """,
+    )
+
+    @default("startup_jitter")
+    def _default_startup_jitter(self):
+        env_value = os.environ.get("JUPYTERHUB_SINGLEUSER_STARTUP_JITTER")
+        if env_value:
+            return float(env_value)
+        else:
+            return 0
+
     server_name = Unicode()
 
     @default('server_name')
@@ -464,6 +502,10 @@ class JupyterHubSingleUser(ExtensionApp):
         self.log.info(
             "Updating Hub with activity every %s seconds", self.hub_activity_interval
         )
+        if self.startup_jitter:
+            # don't notify the Hub right away,
+            # in case lots of servers are starting at once
+            await asyncio.sleep(self.startup_jitter * random.random())
         while True:
             try:
                 await self.notify_activity()
@@ -653,7 +695,11 @@ class JupyterHubSingleUser(ExtensionApp):
         headers["X-JupyterHub-Version"] = __version__
 
         # check jupyterhub version
-        app.io_loop.run_sync(self.check_hub_version)
+        if self.hub_version:
+            # the Hub told us its version, no need to wait for it to respond
+            _check_version(self.hub_version, __version__, self.log)
+        else:
+            app.io_loop.run_sync(self.check_hub_version)
 
         # set default CSP to prevent iframe embedding across jupyterhub components
         headers.setdefault("Content-Security-Policy", "frame-ancestors 'none'")
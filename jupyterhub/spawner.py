@@ -43,6 +43,7 @@ from traitlets import (
 from traitlets.config import LoggingConfigurable
 
 from . import orm
+from ._version import __version__
 from .objects import Server
 from .roles import roles_to_scopes
 from .traitlets import ByteSpecification, Callable, Command
@@ -171,6 +172,9 @@ class Spawner(LoggingConfigurable):
     orm_spawner = Any()
     cookie_options = Dict()
     cookie_host_prefix_enabled = Bool()
+    identity_public_key = Unicode(
+        help="Public key for verifying the Hub's identity assertions, if enabled."
+    )
     public_url = Unicode(help="Public URL of this spawner's server")
     public_hub_url = Unicode(help="Public URL of the Hub itself")
 
@@ -1308,6 +1312,10 @@ class Spawner(LoggingConfigurable):
             'activity',
         )
         env['JUPYTERHUB_BASE_URL'] = self.hub.base_url[:-4]
+        # added in 5.3, so single-user servers don't need to ask the Hub
+        env['JUPYTERHUB_VERSION'] = __version__
+        if self.identity_public_key:
+            env['JUPYTERHUB_IDENTITY_PUBLIC_KEY'] = self.identity_public_key
 
         if self.server:
             base_url = self.server.base_url
@@ -14,11 +14,13 @@ Spawners
 - BadSpawner:
 - SlowBadSpawner
 - FormSpawner
+- InProcessSpawner
 
 Other components
 ----------------
 - MockPAMAuthenticator
 - MockHub
+- MockProxy
 - MockSingleUserServer
 - InstrumentedSpawner
 
@@ -37,13 +39,16 @@ from urllib.parse import urlparse
 
 from pamela import PAMError
 from sqlalchemy import event
+from tornado import httpserver, web
 from tornado.httputil import url_concat
 from traitlets import Bool, Dict, default
 
 from .. import metrics, orm, roles
+from .._version import __version__
 from ..app import JupyterHub
 from ..auth import PAMAuthenticator
-from ..spawner import SimpleLocalProcessSpawner
+from ..proxy import Proxy
+from ..spawner import SimpleLocalProcessSpawner, Spawner
 from ..utils import random_port, url_path_join, utcnow
 from .utils import AsyncSession, public_url, ssl_setup
 
@@ -176,6 +181,74 @@ class FalsyCallableFormSpawner(FormSpawner):
     options_form = lambda a, b: ""
 
 
+class _StandInHandler(web.RequestHandler):
+    """Respond to any request, like a running single-user server"""
+
+    def get(self):
+        self.set_header("X-JupyterHub-Version", __version__)
+        self.write(self.request.path)
+
+
+class InProcessSpawner(Spawner):
+    """Spawner that doesn't launch anything
+
+    All servers are the same stand-in HTTP server,
+    running in the Hub's own event loop,
+    so starting and stopping servers measures only the Hub's overhead.
+    Used for benchmarks and load tests with many users.
+    """
+
+    _stand_in_server = None
+    _stand_in_port = None
+
+    _running = False
+
+    @classmethod
+    def _ensure_stand_in(cls):
+        if cls._stand_in_server is None:
+            port = random_port()
+            server = httpserver.HTTPServer(web.Application([(r'.*', _StandInHandler)]))
+            server.listen(port, "127.0.0.1")
+            cls._stand_in_server = server
+            cls._stand_in_port = port
+        return cls._stand_in_port
+
+    @classmethod
+    def stop_stand_in(cls):
+        """Stop the shared stand-in server"""
+        if cls._stand_in_server is not None:
+            cls._stand_in_server.stop()
+            cls._stand_in_server = None
+            cls._stand_in_port = None
+
+    async def start(self):
+        port = self._ensure_stand_in()
+        self._running = True
+        return ("127.0.0.1", port)
+
+    async def stop(self, now=False):
+        self._running = False
+
+    async def poll(self):
+        if self._running:
+            return None
+        return 0
+
+    def load_state(self, state):
+        super().load_state(state)
+        self._running = state.get("running", False)
+
+    def get_state(self):
+        state = super().get_state()
+        if self._running:
+            state["running"] = True
+        return state
+
+    def clear_state(self):
+        super().clear_state()
+        self._running = False
+
+
 class MockStructGroup:
     """Mock grp.struct_group"""
 
@@ -382,6 +455,26 @@ class MockHub(JupyterHub):
         super().stop()
         self.db_file.close()
 
+    async def stop_async(self):
+        """Stop the Hub without stopping the event loop
+
+        Unlike stop, doesn't cancel other tasks,
+        so the Hub can be stopped from a script that keeps running.
+        """
+        if self._stop_called:
+            return
+        self._stop_called = True
+        await self.cleanup()
+        if self.http_server:
+            self.http_server.stop()
+        if self.metrics_collector:
+            self.metrics_collector.stop()
+        for pc in self._periodic_callbacks.values():
+            pc.stop()
+        self._atexit_ran = True
+        self.db.close()
+        self.db_file.close()
+
     async def login_user(self, name):
         """Login a user by name, returning her cookies."""
         base_url = public_url(self)
@@ -413,6 +506,34 @@ class MockHub(JupyterHub):
         return s.cookies
 
 
+class MockProxy(Proxy):
+    """Proxy that only records routes in memory
+
+    Doesn't forward any requests,
+    so requests must be made to the Hub directly (i.e. `app.hub.url`).
+    """
+
+    routes = Dict()
+
+    @default('should_start')
+    def _should_start_default(self):
+        return False
+
+    async def add_route(self, routespec, target, data):
+        routespec = self.validate_routespec(routespec)
+        self.routes[routespec] = {
+            'routespec': routespec,
+            'target': target,
+            'data': data,
+        }
+
+    async def delete_route(self, routespec):
+        self.routes.pop(routespec, None)
+
+    async def get_all_routes(self):
+        return dict(self.routes)
+
+
 class InstrumentedSpawner(MockSpawner):
     """
     Spawner that starts a full singleuser server
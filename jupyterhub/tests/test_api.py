@@ -4,6 +4,7 @@ import asyncio
 import json
 import re
 import sys
+import time
 import uuid
 from copy import deepcopy
 from dataclasses import dataclass
@@ -18,7 +19,7 @@ from tornado.httputil import url_concat
 
 import jupyterhub
 
-from .. import orm
+from .. import crypto, orm
 from ..apihandlers.base import PAGINATION_MEDIA_TYPE
 from ..objects import Server
 from ..utils import url_path_join as ujoin
@@ -259,6 +260,97 @@ async def test_get_users(app):
     assert r.status_code == 403
 
 
+@mark.user
+@mark.group
+async def test_list_read_replica(app, tmp_path):
+    db = app.db
+    if not app.db_url.startswith("sqlite"):
+        pytest.skip("copies the database with sqlite's backup API")
+    add_user(db, app, name="replica-old")
+    deleted = add_user(db, app, name="replica-deleted")
+    # a copy of the database, as a read replica that hasn't caught up
+    replica_url = f"sqlite:///{tmp_path / 'replica.sqlite'}"
+    replica = orm.new_read_session_factory(replica_url)
+    source = db.get_bind().raw_connection()
+    dest = replica.kw["bind"].raw_connection()
+    try:
+        source.driver_connection.backup(dest.driver_connection)
+    finally:
+        source.close()
+        dest.close()
+    add_user(db, app, name="replica-new")
+    app.users.delete(deleted)
+    group = orm.Group(name="replica-group")
+    db.add(group)
+    db.commit()
+
+    with mock.patch.dict(app.tornado_settings, {"read_session_factory": replica}):
+        r = await api_request(app, "users?name_filter=replica-", bypass_proxy=True)
+        r.raise_for_status()
+        assert [u["name"] for u in r.json()] == ["replica-old", "replica-deleted"]
+
+        # users deleted on the primary are listed as the replica has them
+        r = await api_request(
+            app,
+            "users?name_filter=replica-&include_stopped_servers=1",
+            bypass_proxy=True,
+        )
+        r.raise_for_status()
+        models = {u["name"]: u for u in r.json()}
+        assert sorted(models) == ["replica-deleted", "replica-old"]
+        assert list(models["replica-deleted"]["servers"]) == [""]
+        assert list(models["replica-old"]["servers"]) == [""]
+
+        r = await api_request(app, "groups", bypass_proxy=True)
+        r.raise_for_status()
+        assert "replica-group" not in [g["name"] for g in r.json()]
+
+        # state filters query the primary database
+        r = await api_request(
+            app, "users?state=inactive&name_filter=replica-", bypass_proxy=True
+        )
+        r.raise_for_status()
+        assert [u["name"] for u in r.json()] == ["replica-old", "replica-new"]
+
+    replica.kw["bind"].dispose()
+    r = await api_request(app, "users?name_filter=replica-", bypass_proxy=True)
+    assert [u["name"] for u in r.json()] == ["replica-old", "replica-new"]
+
+
+async def test_list_stopped_servers_no_wrappers(app):
+    db = app.db
+    names = [f"stopped-list-{i}" for i in range(3)]
+    for name in names:
+        orm_user = add_user(db, name=name)
+        db.add(orm.Spawner(name="", user=orm_user))
+        db.add(orm.Spawner(name="named", user=orm_user))
+    # never had a User wrapper, so no default server in the db
+    add_user(db, name="stopped-list-new")
+    db.commit()
+    before = set(app.users.keys())
+
+    r = await api_request(
+        app,
+        "users?name_filter=stopped-list-&include_stopped_servers=1",
+        bypass_proxy=True,
+    )
+    r.raise_for_status()
+    models = {u["name"]: u for u in r.json()}
+    assert sorted(models) == names + ["stopped-list-new"]
+    # no User wrappers were created for inactive users
+    assert set(app.users.keys()) == before
+    assert models["stopped-list-new"]["servers"] == {}
+
+    servers = models[names[0]]["servers"]
+    assert sorted(servers) == ["", "named"]
+    assert servers["named"]["stopped"]
+    # same URLs as the User wrapper
+    user = app.users[names[0]]
+    assert servers[""]["url"] == user.server_url("")
+    assert servers["named"]["url"] == user.server_url("named")
+    assert servers["named"]["progress_url"] == user.progress_url("named")
+
+
 @fixture
 def default_page_limit(app):
     """Set and return low default page size for testing"""
@@ -397,6 +489,53 @@ async def test_get_users_pagination(
     assert got_usernames == expected_usernames
 
 
+@mark.user
+async def test_get_users_count(app):
+    db = app.db
+    users = [add_user(db, app, name=f"countcache-{i}") for i in range(3)]
+    headers = auth_header(db, 'admin')
+    headers['Accept'] = PAGINATION_MEDIA_TYPE
+
+    async def get_page(count, **params):
+        params.update(name_filter="countcache", count=count)
+        r = await api_request(
+            app, url_concat("users", params), headers=headers, bypass_proxy=True
+        )
+        r.raise_for_status()
+        return r.json()
+
+    # no total, but still a next page
+    page = await get_page("none", limit=2)
+    assert [u["name"] for u in page["items"]] == [u.name for u in users[:2]]
+    assert page["_pagination"]["total"] is None
+    assert page["_pagination"]["next"]["offset"] == 2
+    page = await get_page("none", offset=2, limit=2)
+    assert len(page["items"]) == 1
+    assert page["_pagination"]["next"] is None
+
+    page = await get_page("estimate")
+    assert page["_pagination"]["total"] == 3
+    # renaming doesn't clear cached totals
+    users[0].name = "renamed-count"
+    db.commit()
+    page = await get_page("estimate")
+    assert page["_pagination"]["total"] == 3
+    # but the next page is from the query, not the stale total
+    page = await get_page("estimate", limit=2)
+    assert page["_pagination"]["total"] == 3
+    assert len(page["items"]) == 2
+    assert page["_pagination"]["next"] is None
+    page = await get_page("exact")
+    assert page["_pagination"]["total"] == 2
+    # creating a user does
+    add_user(db, app, name="countcache-new")
+    page = await get_page("estimate")
+    assert page["_pagination"]["total"] == 3
+
+    r = await api_request(app, "users?count=maybe", bypass_proxy=True)
+    assert r.status_code == 400
+
+
 @mark.user
 @mark.parametrize(
     "state",
@@ -637,6 +776,53 @@ async def test_get_self(app):
     assert r.status_code == 403
 
 
+async def test_get_self_identity_assertion(app):
+    db = app.db
+    u = add_user(db, app=app, name='persephone')
+    token = uuid.uuid4().hex
+    oauth_client = orm.OAuthClient(identifier='hades')
+    db.add(oauth_client)
+    db.commit()
+    oauth_token = orm.APIToken(token=token)
+    db.add(oauth_token)
+    oauth_token.user = u.orm_user
+    oauth_token.oauth_client = oauth_client
+    db.commit()
+
+    key = crypto.identity_signing_key(app.cookie_secret)
+    settings = {
+        "identity_key": key,
+        "identity_assertion_max_age": 60,
+    }
+    with mock.patch.dict(app.tornado_application.settings, settings):
+        r = await api_request(
+            app,
+            'user',
+            headers={'Authorization': 'token ' + token},
+            bypass_proxy=True,
+        )
+    r.raise_for_status()
+    model = r.json()
+    claims = crypto.verify_identity(
+        crypto.identity_public_key(key), model["identity_assertion"]
+    )
+    assert claims["name"] == u.name
+    assert claims["aud"] == "hades"
+    assert claims["token_id"] == oauth_token.api_id
+    assert claims["scopes"] == model["scopes"]
+    assert 0 < claims["exp"] - time.time() <= 60
+
+    # not issued unless enabled
+    r = await api_request(
+        app,
+        'user',
+        headers={'Authorization': 'token ' + token},
+        bypass_proxy=True,
+    )
+    r.raise_for_status()
+    assert "identity_assertion" not in r.json()
+
+
 async def test_get_self_service(app, mockservice):
     r = await api_request(
         app, "user", headers={"Authorization": f"token {mockservice.api_token}"}
@@ -31,6 +31,30 @@ def test_help_all():
     )
     assert '--ip' in out
     assert '--JupyterHub.ip' in out
+    # entry point classes are loaded for help output
+    assert '--LocalProcessSpawner.' in out
+
+
+def test_lazy_imports():
+    # modules only needed by a running Hub should not be loaded on import
+    lazy_modules = [
+        "alembic",
+        "jinja2",
+        "jupyter_events",
+        "jupyterhub.apihandlers",
+        "jupyterhub.handlers",
+        "oauthlib",
+    ]
+    out = check_output(
+        [
+            sys.executable,
+            '-c',
+            'import json, sys; import jupyterhub.app; print(json.dumps(sorted(sys.modules)))',
+        ]
+    ).decode('utf8')
+    modules = json.loads(out.splitlines()[-1])
+    loaded = [name for name in lazy_modules if name in modules]
+    assert loaded == []
 
 
 @pytest.mark.skipif(traitlets.version_info < (5,), reason="requires traitlets 5")
@@ -491,6 +515,132 @@ async def test_user_creation(tmpdir, request):
     }
 
 
+async def test_user_creation_bulk(tmpdir, request):
+    # more users than fit in one `IN` query
+    n = orm.IN_CLAUSE_CHUNK_SIZE + 10
+    allowed_users = {f"user-{i}" for i in range(n)}
+    admin_users = {"user-1", "new-admin"}
+
+    cfg = Config()
+    cfg.Authenticator.allow_all = False
+    cfg.Authenticator.allowed_users = allowed_users
+    cfg.Authenticator.admin_users = admin_users
+    ssl_enabled = getattr(request.module, "ssl_enabled", False)
+    kwargs = dict(config=cfg)
+    if ssl_enabled:
+        kwargs['internal_certs_location'] = str(tmpdir)
+    hub = MockHub(**kwargs)
+    hub.init_db()
+    db = hub.db
+    # one user already in the db
+    db.add(orm.User(name="user-2"))
+    db.commit()
+
+    await hub.init_role_creation()
+    await hub.init_users()
+
+    assert db.query(orm.User).count() == n + 1
+    assert hub.authenticator.allowed_users == allowed_users | admin_users
+    user_role = orm.Role.find(db, "user")
+    admin_role = orm.Role.find(db, "admin")
+    assert len(user_role.users) == n
+    assert sorted(u.name for u in admin_role.users) == ["new-admin", "user-1"]
+    new_admin = orm.User.find(db, "new-admin")
+    assert new_admin.admin
+    assert sorted(r.name for r in new_admin.roles) == ["admin", "user"]
+    # existing user was not given roles by init_users
+    assert orm.User.find(db, "user-2").roles == []
+
+    # second pass is a no-op
+    await hub.init_users()
+    assert db.query(orm.User).count() == n + 1
+    assert len(user_role.users) == n
+
+
+async def test_skip_unchanged_init(new_hub, groupname):
+    config = Config()
+    config.JupyterHub.skip_unchanged_init = True
+    config.Authenticator.allowed_users = {"kaylee", "zoe"}
+    config.JupyterHub.load_groups = {groupname: {"users": ["kaylee"]}}
+    config.JupyterHub.api_tokens = {"unchanged-token-secret": "zoe"}
+
+    app = await new_hub(config=config)
+    db = app.db
+    fingerprints = {fp.name: fp.fingerprint for fp in db.query(orm.ConfigFingerprint)}
+    assert sorted(fingerprints) == [
+        "api_tokens",
+        "groups",
+        "role_assignment",
+        "roles",
+        "users",
+    ]
+    # make changes in the db that a full init would revert
+    group = orm.Group.find(db, groupname)
+    group.users = []
+    db.commit()
+    app.stop()
+
+    # unchanged config, changes are preserved
+    app = await new_hub(config=config)
+    db = app.db
+    assert orm.Group.find(db, groupname).users == []
+    assert {
+        fp.name: fp.fingerprint for fp in db.query(orm.ConfigFingerprint)
+    } == fingerprints
+    assert "zoe" in app.authenticator.allowed_users
+    assert [r.name for r in app.users["zoe"].roles] == ["user"]
+    app.stop()
+
+    # changed config is loaded
+    config.JupyterHub.load_groups = {groupname: {"users": ["kaylee", "zoe"]}}
+    app = await new_hub(config=config)
+    db = app.db
+    assert sorted(u.name for u in orm.Group.find(db, groupname).users) == [
+        "kaylee",
+        "zoe",
+    ]
+    group = orm.Group.find(db, groupname)
+    group.users = []
+    db.commit()
+    app.stop()
+
+    # full init ignores fingerprints
+    config.JupyterHub.skip_unchanged_init = False
+    app = await new_hub(config=config)
+    db = app.db
+    assert sorted(u.name for u in orm.Group.find(db, groupname).users) == [
+        "kaylee",
+        "zoe",
+    ]
+
+
+async def test_skip_unchanged_init_runtime_user(new_hub):
+    config = Config()
+    config.JupyterHub.skip_unchanged_init = True
+    config.Authenticator.allowed_users = {"kaylee"}
+    config.Authenticator.allow_all = False
+
+    app = await new_hub(config=config)
+    db = app.db
+    fingerprint = orm.ConfigFingerprint.find(db, "role_assignment").fingerprint
+    # a user created at runtime, e.g. by logging in
+    add_user(db, app, name="runtime-user")
+    # make a change that role assignment would revert
+    kaylee = orm.User.find(db, "kaylee")
+    kaylee.roles = []
+    db.commit()
+    app.stop()
+
+    # allow_existing_users adds runtime-user to allowed_users on startup,
+    # which doesn't count as a config change
+    app = await new_hub(config=config)
+    db = app.db
+    assert "runtime-user" in app.authenticator.allowed_users
+    assert orm.ConfigFingerprint.find(db, "role_assignment").fingerprint == fingerprint
+    # role assignment was skipped
+    assert orm.User.find(db, "kaylee").roles == []
+
+
 async def test_recreate_service_from_database(
     request, new_hub, service_name, service_data
 ):
@@ -599,3 +749,19 @@ async def test_revoke_blocked_users(username, groupname, new_hub):
     kept_user = app2.users[kept_username]
     assert 'user' in [r.name for r in kept_user.roles]
     app2.stop()
+
+
+async def test_checkpoint_sqlite(app):
+    if not app._sqlite_wal_enabled():
+        pytest.skip("requires sqlite in WAL mode")
+    assert "checkpoint_sqlite" in app._periodic_callbacks
+    add_user(app.db, app, name="checkpoint")
+    wal_file = app.db.get_bind().url.database + "-wal"
+    assert os.path.getsize(wal_file) > 0
+    await app.checkpoint_sqlite()
+    with app.db.get_bind().connect() as connection:
+        busy, log_pages, checkpointed = connection.exec_driver_sql(
+            "PRAGMA wal_checkpoint(PASSIVE)"
+        ).one()
+    # nothing left to checkpoint
+    assert checkpointed == log_pages
@@ -1237,3 +1237,14 @@ async def test_authenticator_without_allow_all(
 
     assert are_allowed == expected_allowed
     assert are_not_allowed == expected_not_allowed
+
+
+async def test_add_users(app):
+    authenticator = auth.Authenticator(allowed_users={"kaylee"})
+    users = [orm.User(name=name) for name in ("wash", "Inara", "zoe")]
+    authenticator.username_pattern = "^[a-z]+$"
+
+    failed = await authenticator.add_users(users)
+    assert list(failed) == ["Inara"]
+    assert isinstance(failed["Inara"], ValueError)
+    assert authenticator.allowed_users == {"kaylee", "wash", "zoe"}
@@ -82,3 +82,33 @@ async def test_missing_keys(crypt_keeper):
 
     with pytest.raises(crypto.NoEncryptionKeys):
         await decrypt(b'whatever')
+
+
+def test_identity_assertion():
+    key = crypto.identity_signing_key(os.urandom(32))
+    public_key = crypto.identity_public_key(key)
+    claims = {"name": "user", "scopes": ["read:users:name"]}
+    assertion = crypto.sign_identity(key, claims)
+    assert crypto.verify_identity(public_key, assertion) == claims
+
+    # the same secret gives the same key
+    secret = os.urandom(32)
+    assert crypto.identity_public_key(
+        crypto.identity_signing_key(secret)
+    ) == crypto.identity_public_key(crypto.identity_signing_key(secret))
+
+    # tampered payload
+    payload, signature = assertion.split(".")
+    forged_payload = crypto._b64encode(b'{"name":"admin"}')
+    with pytest.raises(ValueError):
+        crypto.verify_identity(public_key, f"{forged_payload}.{signature}")
+    # wrong key
+    other_key = crypto.identity_public_key(crypto.identity_signing_key(b"other"))
+    with pytest.raises(ValueError):
+        crypto.verify_identity(other_key, assertion)
+    with pytest.raises(ValueError):
+        crypto.verify_identity(public_key, "garbage")
+
+    with patch.object(crypto, 'cryptography', None):
+        with pytest.raises(crypto.CryptographyUnavailable):
+            crypto.verify_identity(public_key, assertion)
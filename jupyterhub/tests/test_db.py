@@ -7,9 +7,10 @@ from subprocess import check_call
 import pytest
 from packaging.version import parse as V
 from pytest import raises
+from sqlalchemy import inspect
 from traitlets.config import Config
 
-from .. import orm
+from .. import dbutil, orm
 from ..app import NewToken, UpgradeDB
 from ..scopes import _check_scopes_exist
 
@@ -93,9 +94,32 @@ async def test_upgrade(tmpdir, hub_version):
         assert token.scopes, f"Upgraded token {token} has no scopes"
         _check_scopes_exist(token.scopes)
 
+    # make sure indexes match the current schema
+    inspector = inspect(db.get_bind())
+    for table in orm.Base.metadata.sorted_tables:
+        db_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            assert index.name in db_indexes
+
     # make sure migrated roles are not managed or null
     for role in db.query(orm.Role):
         assert role.managed_by_auth is False
     for assignment_table in orm._role_associations.values():
         for assignment in db.query(assignment_table):
             assert assignment.managed_by_auth is False
+
+
+def test_backup_db_file_wal(tmpdir):
+    db_file = str(tmpdir.join("jupyterhub.sqlite"))
+    for path in (db_file, db_file + "-wal"):
+        with open(path, "w") as f:
+            f.write(path)
+    dbutil.backup_db_file(db_file)
+    backups = sorted(
+        os.path.basename(path) for path in glob(db_file + ".*") if path != db_file
+    )
+    assert len(backups) == 2
+    backup, backup_wal = backups
+    assert backup_wal == backup + "-wal"
+    with open(os.path.join(str(tmpdir), backup_wal)) as f:
+        assert f.read() == db_file + "-wal"
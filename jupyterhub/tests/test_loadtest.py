@@ -0,0 +1,57 @@
+"""Tests for jupyterhub-loadtest"""
+
+from prometheus_client import CollectorRegistry, Histogram
+
+from ..loadtest import _histogram_samples, _histogram_summary, main, percentile
+
+
+def test_histogram_summary():
+    histogram = Histogram(
+        "test_seconds",
+        "test",
+        ["code"],
+        buckets=[0.1, 1, float("inf")],
+        registry=CollectorRegistry(),
+    )
+    histogram.labels(code="200").observe(5)
+    before = _histogram_samples(histogram, code="200")
+    for value in [0.05] * 8 + [0.5, 5]:
+        histogram.labels(code="200").observe(value)
+    histogram.labels(code="500").observe(0.5)
+    after = _histogram_samples(histogram, code="200")
+    summary = _histogram_summary(_histogram_samples(histogram, code="200"), after)
+    assert summary == {"count": 0}
+    summary = _histogram_summary(before, after)
+    assert summary["count"] == 10
+    assert summary["p50"] == 0.1
+    assert summary["p90"] == 1
+    assert summary["p99"] == float("inf")
+
+
+def test_percentile():
+    assert percentile([], 50) == 0
+    values = list(range(101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile(values, 100) == 100
+
+
+def test_loadtest(capsys):
+    main(
+        [
+            "--users=2",
+            "--duration=1",
+            "--ramp-up=0.2",
+            "--activity-interval=0.2",
+            "--culler-interval=0.2",
+        ]
+    )
+    rows = {}
+    for line in capsys.readouterr().out.splitlines():
+        fields = line.split()
+        if fields and fields[0] in {"login", "spawn"}:
+            rows[fields[0]] = fields
+    assert sorted(rows) == ["login", "spawn"]
+    for name, fields in rows.items():
+        # count, errors
+        assert fields[1:3] == ["2", "0"], name
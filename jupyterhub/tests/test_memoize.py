@@ -1,6 +1,14 @@
+from unittest import mock
+
 import pytest
 
-from jupyterhub._memoize import DoNotCache, FrozenDict, LRUCache, lru_cache_key
+from jupyterhub._memoize import (
+    DoNotCache,
+    FrozenDict,
+    LRUCache,
+    TTLCache,
+    lru_cache_key,
+)
 
 
 def test_lru_cache():
@@ -24,6 +32,27 @@ def test_lru_cache():
     assert "b" not in cache
 
 
+def test_ttl_cache():
+    cache = TTLCache(maxsize=2, ttl=10)
+    with mock.patch("time.monotonic", lambda: 100):
+        cache["a"] = 1
+        cache["b"] = 0
+        assert "a" in cache
+        assert cache["b"] == 0
+    with mock.patch("time.monotonic", lambda: 105):
+        cache["c"] = 3
+        # size limit still applies
+        assert "a" not in cache
+        assert cache["b"] == 0
+    with mock.patch("time.monotonic", lambda: 110):
+        # b expired
+        assert "b" not in cache
+        assert cache.get("b", "default") == "default"
+        assert cache["c"] == 3
+    cache.clear()
+    assert "c" not in cache
+
+
 def test_lru_cache_key():
     call_count = 0
 
@@ -1,4 +1,6 @@
 import json
+import threading
+import traceback
 from datetime import timedelta
 from unittest import mock
 
@@ -6,6 +8,7 @@ import pytest
 
 from jupyterhub import metrics, orm, roles
 
+from ..user import UserDict
 from ..utils import utcnow
 from .utils import add_user, api_request, get_page
 
@@ -149,3 +152,223 @@ async def test_active_users(app):
         counts[metrics.ActiveUserPeriods.thirty_days]
         == baseline[metrics.ActiveUserPeriods.thirty_days] + 5
     )
+
+
+async def test_purge_expired_metrics(app, user):
+    db = app.db
+
+    def purged():
+        return metrics.EXPIRED_PURGED.labels(
+            kind=metrics.ExpiredKind.api_token
+        )._value.get()
+
+    def purges():
+        samples = metrics.PURGE_EXPIRED_DURATION_SECONDS.collect()[0].samples
+        for sample in samples:
+            if (
+                sample.name.endswith("_count")
+                and sample.labels["kind"] == metrics.ExpiredKind.api_token.value
+            ):
+                return sample.value
+
+    orm_user = orm.User.find(db, user.name)
+    for i in range(5):
+        orm_user.new_api_token(expires_in=60)
+    before, before_purges = purged(), purges()
+    now = orm.APIToken.now()
+    app.purge_expired_chunk_size = 2
+    try:
+        with mock.patch.object(
+            orm.APIToken, "now", lambda: now + timedelta(seconds=120)
+        ):
+            await app.purge_expired_tokens()
+    finally:
+        app.purge_expired_chunk_size = 1000
+    assert purged() == before + 5
+    assert purges() == before_purges + 1
+
+
+async def test_db_query_metrics(app):
+    def query_count(engine):
+        samples = metrics.DB_QUERY_DURATION_SECONDS.collect()[0].samples
+        for sample in samples:
+            if (
+                sample.name.endswith("_count")
+                and sample.labels["engine"] == engine.value
+            ):
+                return sample.value
+
+    before = query_count(metrics.DBEngine.primary)
+    before_read = query_count(metrics.DBEngine.read)
+    app.db.query(orm.User).count()
+    assert query_count(metrics.DBEngine.primary) == before + 1
+    assert query_count(metrics.DBEngine.read) == before_read
+
+
+def _sample_value(metric, suffix="", **labels):
+    for sample in metric.collect()[0].samples:
+        if sample.name.endswith(suffix) and all(
+            sample.labels.get(key) == str(value) for key, value in labels.items()
+        ):
+            return sample.value
+
+
+async def test_db_pool_metrics(app):
+    engine = app.db.get_bind()
+    primary = metrics.DBEngine.primary
+    checkouts = _sample_value(
+        metrics.DB_POOL_CHECKOUT_DURATION_SECONDS, "_count", engine=primary
+    )
+    pings = _sample_value(metrics.DB_PING_DURATION_SECONDS, "_count", engine=primary)
+    with engine.connect() as connection:
+        connection.exec_driver_sql("SELECT 1")
+        if hasattr(engine.pool, "checkedout"):
+            assert _sample_value(metrics.DB_POOL_CHECKED_OUT, engine=primary) >= 1
+            assert (
+                _sample_value(metrics.DB_POOL_SIZE, engine=primary)
+                == engine.pool.size()
+            )
+    assert (
+        _sample_value(
+            metrics.DB_POOL_CHECKOUT_DURATION_SECONDS, "_count", engine=primary
+        )
+        == checkouts + 1
+    )
+    # app.db_ping_interval is 0, so every checkout is checked
+    assert (
+        _sample_value(metrics.DB_PING_DURATION_SECONDS, "_count", engine=primary)
+        == pings + 1
+    )
+
+
+def _blocking_call(sample):
+    """Block this thread while another thread samples it"""
+    sampler = threading.Thread(target=sample)
+    sampler.start()
+    sampler.join()
+
+
+def test_event_loop_stall_profiler():
+    profiler = metrics.EventLoopStallProfiler(
+        threshold=0.05, interval=0.005, max_stacks=100
+    )
+    # drive the sampler with a fixed clock, instead of a watchdog thread
+    profiler.last_tick = tick = 100.0
+    profiler.sample(tick + 0.01)
+    assert profiler.samples == 0
+
+    def sample_stall():
+        for i in range(3):
+            assert profiler.sample(tick + 0.1 + i * 0.005)
+
+    _blocking_call(sample_stall)
+    # the loop ticks, then stalls again
+    profiler.last_tick = tick = 101.0
+    profiler.sample(tick)
+    _blocking_call(lambda: profiler.sample(tick + 1))
+
+    report = profiler.report()
+    assert report["stalls"] == 2
+    assert report["samples"] == 4
+    assert sum(stack["samples"] for stack in report["stacks"]) == 4
+    # the sampled thread may be starting or joining the sampler thread
+    for stack in report["stacks"]:
+        frames = stack["frames"]
+        assert any(frame.startswith("_blocking_call") for frame in frames)
+        assert any(
+            frame.startswith("test_event_loop_stall_profiler") for frame in frames
+        )
+    folded = profiler.folded()
+    assert "_blocking_call (" in folded
+    line = folded.splitlines()[0]
+    assert line.rsplit(" ", 1)[1] == str(report["stacks"][0]["samples"])
+
+    profiler.reset()
+    assert profiler.report()["stacks"] == []
+
+
+def test_event_loop_stall_profiler_thread():
+    profiler = metrics.EventLoopStallProfiler(threshold=1, interval=0.005, max_stacks=1)
+    profiler.start()
+    thread = profiler._thread
+    assert thread.is_alive()
+    profiler.stop()
+    assert not thread.is_alive()
+    assert profiler._thread is None
+
+
+def test_event_loop_stall_profiler_max_stacks():
+    profiler = metrics.EventLoopStallProfiler(threshold=1, interval=1, max_stacks=2)
+
+    def stack(name):
+        return [
+            traceback.FrameSummary("/path/to/outer.py", 1, "outer", lookup_line=False),
+            traceback.FrameSummary("/path/to/inner.py", 2, name, lookup_line=False),
+        ]
+
+    for name in ["a", "b", "a", "c", "c", "b"]:
+        profiler.record(stack(name))
+    report = profiler.report()
+    assert report["samples"] == 6
+    assert report["dropped_samples"] == 2
+    assert [(s["samples"], s["frames"][-1]) for s in report["stacks"]] == [
+        (2, "a (/path/to/inner.py:2)"),
+        (2, "b (/path/to/inner.py:2)"),
+    ]
+    assert profiler.folded().splitlines() == [
+        "outer (/path/to/outer.py:1);a (/path/to/inner.py:2) 2",
+        "outer (/path/to/outer.py:1);b (/path/to/inner.py:2) 2",
+    ]
+
+
+async def test_stalls_api(app, user):
+    r = await api_request(app, "stalls")
+    assert r.status_code == 404
+
+    profiler = metrics.EventLoopStallProfiler(threshold=1, interval=1, max_stacks=10)
+    profiler.record(
+        [traceback.FrameSummary("/path/to/slow.py", 10, "slow", lookup_line=False)]
+    )
+    app.metrics_collector.stall_profiler = profiler
+    try:
+        r = await api_request(app, "stalls")
+        r.raise_for_status()
+        report = r.json()
+        assert report["samples"] == 1
+        assert report["stacks"] == [
+            {"samples": 1, "frames": ["slow (/path/to/slow.py:10)"]}
+        ]
+
+        # stream to skip api_request's check for a json response
+        r = await api_request(app, "stalls?format=folded", stream=True)
+        r.raise_for_status()
+        assert r.headers["Content-Type"].startswith("text/plain")
+        assert r.text == "slow (/path/to/slow.py:10) 1\n"
+
+        r = await api_request(app, "stalls?format=svg")
+        assert r.status_code == 400
+
+        # not available to regular users
+        r = await api_request(app, "stalls", name=user.name)
+        assert r.status_code == 403
+    finally:
+        app.metrics_collector.stall_profiler = None
+
+
+async def test_user_cache_metrics(app):
+    add_user(app.db, app, name="cache-metrics")
+    app.users["cache-metrics"]
+    assert _sample_value(
+        metrics.USER_CACHE_SIZE, kind=metrics.UserCacheKind.user
+    ) == len(app.users)
+    assert (
+        _sample_value(metrics.USER_CACHE_SIZE, kind=metrics.UserCacheKind.spawner)
+        == app.users.count_spawners()
+    )
+    # a separate UserDict, to leave app.users alone
+    users = UserDict(db_factory=lambda: app.db, settings=app.tornado_settings)
+    users["cache-metrics"]
+    users[add_user(app.db, app, name="cache-metrics-2")]
+    evictions = _sample_value(metrics.USER_CACHE_EVICTIONS, "_total")
+    assert users.evict_idle(max_size=1) == 1
+    assert _sample_value(metrics.USER_CACHE_EVICTIONS, "_total") == evictions + 1
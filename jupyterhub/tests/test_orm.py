@@ -4,10 +4,12 @@
 # Distributed under the terms of the Modified BSD License.
 import os
 import socket
+import time
 from datetime import timedelta
 from unittest import mock
 
 import pytest
+from sqlalchemy import event
 
 from .. import crypto, objects, orm, roles
 from ..emptyclass import EmptyClass
@@ -147,6 +149,93 @@ def test_token_expiry(db):
     assert orm_token not in user.api_tokens
 
 
+def test_purge_expired_chunks(db):
+    user = orm.User(name='purge-chunks')
+    db.add(user)
+    db.commit()
+    now = utcnow(with_tz=False)
+    for i in range(7):
+        user.new_api_token(expires_in=60)
+    keep = orm.APIToken.find(db, user.new_api_token(expires_in=3600))
+    assert len(user.api_tokens) == 8
+    # a token whose user relationship hasn't been loaded
+    unloaded = user.api_tokens[0]
+    db.expire(unloaded, ["user"])
+    purged_ids = [t.id for t in user.api_tokens if t is not keep]
+
+    the_future = mock.patch(
+        'jupyterhub.orm.APIToken.now', lambda: now + timedelta(seconds=120)
+    )
+    with the_future:
+        assert orm.APIToken.purge_expired_chunk(db, limit=3) == 3
+        # the rest, in chunks of 3
+        assert list(orm.APIToken.purge_expired_chunks(db, chunk_size=3)) == [3, 1]
+        assert orm.APIToken.purge_expired(db, chunk_size=3) == 0
+    # deleted tokens are gone from the session and the user's token list
+    assert user.api_tokens == [keep]
+    assert unloaded not in db
+    for token_id in purged_ids:
+        assert_not_found(db, orm.APIToken, token_id)
+
+
+def test_sqlite_pragmas(tmpdir):
+    db_url = f"sqlite:///{tmpdir.join('pragmas.sqlite')}"
+
+    def pragmas(**kwargs):
+        engine = orm.new_session_factory(db_url, **kwargs)().get_bind()
+        with engine.connect() as connection:
+            values = {
+                name: connection.exec_driver_sql(f"PRAGMA {name}").scalar()
+                for name in ("journal_mode", "synchronous", "busy_timeout", "mmap_size")
+            }
+        engine.dispose()
+        return values
+
+    assert pragmas() == {
+        "journal_mode": "wal",
+        # NORMAL
+        "synchronous": 1,
+        "busy_timeout": 5000,
+        "mmap_size": orm.SQLITE_PRAGMAS["mmap_size"],
+    }
+    assert pragmas(
+        sqlite_pragmas={"journal_mode": "DELETE", "busy_timeout": 100, "mmap_size": 0}
+    ) == {
+        "journal_mode": "delete",
+        "synchronous": 1,
+        "busy_timeout": 100,
+        "mmap_size": 0,
+    }
+    with pytest.raises(ValueError):
+        pragmas(sqlite_pragmas={"journal_mode": "WAL; DROP TABLE users"})
+
+
+def test_ping_interval(tmpdir):
+    def count_pings(ping_interval, idle=0):
+        engine = orm._new_engine(
+            f"sqlite:///{tmpdir.join('ping.sqlite')}", ping_interval=ping_interval
+        )
+        pings = []
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def record_ping(conn, cursor, statement, parameters, context, executemany):
+            if context.execution_options.get(orm.PING_EXECUTION_OPTION):
+                pings.append(statement)
+
+        for i in range(3):
+            with engine.connect() as connection:
+                connection.exec_driver_sql("SELECT 2")
+            time.sleep(idle)
+        engine.dispose()
+        return len(pings)
+
+    # every checkout
+    assert count_pings(0) == 3
+    # only after being idle, not the first checkout of a new connection
+    assert count_pings(3600) == 0
+    assert count_pings(0.01, idle=0.05) == 2
+
+
 def test_service_tokens(db):
     service = orm.Service(name='secret')
     db.add(service)
@@ -345,6 +434,106 @@ def test_spawner_delete_cascade(db):
     assert user.orm_spawners == {}
 
 
+def test_orm_spawners_cache(db):
+    user = orm.User(name='orm-spawners-cache')
+    db.add(user)
+    db.commit()
+    assert user.orm_spawners == {}
+
+    spawner = orm.Spawner(name='a')
+    db.add(spawner)
+    spawner.user = user
+    db.commit()
+    spawners = user.orm_spawners
+    assert spawners == {'a': spawner}
+    # cached
+    assert user.orm_spawners is spawners
+
+    spawner_b = orm.Spawner(name='b', user=user)
+    db.add(spawner_b)
+    db.commit()
+    assert user.orm_spawners == {'a': spawner, 'b': spawner_b}
+
+    spawner_b.name = 'c'
+    assert user.orm_spawners == {'a': spawner, 'c': spawner_b}
+
+    user._orm_spawners.remove(spawner)
+    db.commit()
+    assert user.orm_spawners == {'c': spawner_b}
+
+    db.delete(spawner_b)
+    db.commit()
+    assert user.orm_spawners == {}
+
+    # reloaded collection
+    spawner = orm.Spawner(name='d', user=user)
+    db.add(spawner)
+    db.commit()
+    assert user.orm_spawners == {'d': spawner}
+    db.expire(user)
+    assert user.orm_spawners == {'d': spawner}
+
+
+def test_json_unchanged_no_update(db):
+    user = orm.User(name='json-unchanged')
+    db.add(user)
+    spawner = orm.Spawner(name='', user=user)
+    spawner.state = {'pid': 5, 'env': {'a': 'x'}}
+    spawner.user_options = {'image': 'abc', 'cpus': [1, 2]}
+    db.add(spawner)
+    db.commit()
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        # equal values, as assigned from Spawner.get_state()
+        spawner.state = {'env': {'a': 'x'}, 'pid': 5}
+        spawner.user_options = {'cpus': [1, 2], 'image': 'abc'}
+        db.commit()
+        assert not [s for s in statements if s.startswith("UPDATE")]
+
+        # not even marked as modified
+        assert not orm.set_if_changed(spawner, state={'env': {'a': 'x'}, 'pid': 5})
+        assert spawner not in db.dirty
+
+        assert orm.set_if_changed(spawner, state={'pid': 6, 'env': {'a': 'x'}})
+        assert spawner in db.dirty
+        db.commit()
+        assert [s for s in statements if s.startswith("UPDATE")]
+        assert spawner.state == {'pid': 6, 'env': {'a': 'x'}}
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+@pytest.mark.parametrize("library", ["json", "orjson"])
+def test_json_encoding(library):
+    if library == "orjson":
+        orjson = pytest.importorskip("orjson")
+    else:
+        orjson = None
+    column = orm.JSONDict()
+    value = {'b': b'\x00bytes', 'a': [1, {'z': None, 'y': 1.5}]}
+    with mock.patch.object(orm, "orjson", orjson):
+        encoded = column.process_bind_param(value, None)
+        # compact, with sorted keys
+        assert encoded.startswith('{"a":[1,{"y":1.5,"z":null}],"b":{')
+        assert column.process_result_value(encoded, None) == value
+
+        # keys that can't be sorted
+        encoded = column.process_bind_param({'a': 1, 2: 'b'}, None)
+        assert column.process_result_value(encoded, None) == {'a': 1, '2': 'b'}
+
+        list_column = orm.JSONList()
+        encoded = list_column.process_bind_param({'b', 'a'}, None)
+        assert encoded == '["a","b"]'
+        assert list_column.process_result_value(encoded, None) == ['a', 'b']
+
+
 def test_user_delete_cascade(db):
     user = orm.User(name='db-delete')
     oauth_client = orm.OAuthClient(identifier='db-delete-client')
@@ -157,6 +157,62 @@ def test_orm_roles_delete_cascade(db):
     assert user1 not in role1.users
 
 
+@mark.role
+def test_set_role_members(db):
+    role = orm.Role(name='bulkrole')
+    db.add(role)
+    users = [orm.User(name=f'bulk-{i}') for i in range(5)]
+    db.add_all(users)
+    db.commit()
+    user_map = orm._role_associations['user']
+
+    def role_assignments():
+        return db.query(user_map).filter(user_map.role_id == role.id)
+
+    # existing member, loaded in memory
+    role.users.append(users[0])
+    db.commit()
+    assert users[0].roles == [role]
+
+    added, removed = roles.set_role_members(
+        db, role, 'users', [u.id for u in users[1:4]], managed=True
+    )
+    assert (added, removed) == (3, 1)
+    assert sorted(u.name for u in role.users) == ['bulk-1', 'bulk-2', 'bulk-3']
+    assert users[0].roles == []
+    assert users[1].roles == [role]
+    assert all(a.managed_by_auth for a in role_assignments())
+
+    # no-op
+    member_ids = [u.id for u in users[1:4]]
+    assert roles.set_role_members(db, role, 'users', member_ids) == (0, 0)
+
+    # existing assignments are marked as managed
+    role_assignments().update({'managed_by_auth': False})
+    db.commit()
+    assert roles.set_role_members(db, role, 'users', member_ids, managed=True) == (
+        0,
+        0,
+    )
+    assert all(a.managed_by_auth for a in role_assignments())
+
+    # strip specific assignments
+    n = roles.strip_role_assignments(
+        db, 'users', [(users[1].id, role.id), (users[4].id, role.id)]
+    )
+    assert n == 1
+    assert sorted(u.name for u in role.users) == ['bulk-2', 'bulk-3']
+    assert users[1].roles == []
+
+    # grant_role_bulk skips existing assignments
+    assert roles.grant_role_bulk(db, users, role) == 3
+    assert len(role.users) == 5
+    for user in users:
+        db.delete(user)
+    db.delete(role)
+    db.commit()
+
+
 @mark.role
 @mark.parametrize(
     "scopes, expected_scopes",
@@ -1,6 +1,8 @@
 """Tests for service authentication"""
 
+import asyncio
 import copy
+import hashlib
 import os
 import sys
 import time
@@ -11,12 +13,24 @@ from urllib.parse import parse_qs, urlparse
 import pytest
 from bs4 import BeautifulSoup
 from pytest import raises
+from tornado.httpclient import AsyncHTTPClient
+from tornado.httpserver import HTTPServer
 from tornado.httputil import url_concat
 from tornado.log import app_log
+from tornado.simple_httpclient import SimpleAsyncHTTPClient
+from tornado.testing import bind_unused_port
+from tornado.web import Application, HTTPError, RequestHandler
 
-from .. import orm, roles, scopes
+from .. import crypto, orm, roles, scopes
+from ..metrics import HUB_AUTH_API_REQUESTS, HubAuthConnection
 from ..roles import roles_to_scopes
-from ..services.auth import _ExpiringDict
+from ..services.auth import (
+    HubAuth,
+    HubOAuth,
+    SharedFileCache,
+    _ExpiringDict,
+    _reuses_connections,
+)
 from ..utils import url_path_join
 from .mocking import public_url
 from .utils import AsyncSession, async_requests
@@ -62,6 +76,233 @@ def test_expiring_dict():
         assert cache.get('key', 'default') == 'cached value'
 
 
+def test_shared_file_cache(tmp_path):
+    path = tmp_path / "cache.sqlite"
+    cache = SharedFileCache(max_age=30, path=str(path), max_size=3)
+    # another process on the same host
+    other_cache = SharedFileCache(max_age=30, path=str(path))
+
+    model = {"name": "user", "scopes": ["access:services"]}
+    cache['key'] = model
+    assert (path.stat().st_mode & 0o777) == 0o600
+    assert 'key' in cache
+    assert other_cache['key'] == model
+    other_cache['none'] = None
+    assert cache['none'] is None
+
+    with raises(KeyError):
+        cache['nokey']
+
+    with mock.patch('time.time', lambda: sys.maxsize):
+        assert 'key' not in other_cache
+        with raises(KeyError):
+            cache['key']
+    assert 'key' not in cache
+
+    # max_size discards the oldest values
+    for i in range(5):
+        cache[f'key-{i}'] = i
+    assert len(cache) == 3
+    assert sorted(cache) == ['key-2', 'key-3', 'key-4']
+
+    del other_cache['key-2']
+    assert 'key-2' not in cache
+    cache.clear()
+    assert len(other_cache) == 0
+
+
+def test_hubauth_cache_class(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    auth = HubAuth(
+        cache_class=SharedFileCache,
+        cache_kwargs={"path": path},
+        cache_max_age=10,
+        cache_stale_max_age=5,
+    )
+    assert isinstance(auth.cache, SharedFileCache)
+    assert auth.cache.path == path
+    # stale values are kept until the hard limit
+    assert auth.cache.max_age == 15
+
+    assert isinstance(HubAuth().cache, _ExpiringDict)
+
+
+async def test_hubauth_single_flight():
+    auth = HubAuth(api_url="http://127.0.0.1:1/hub/api")
+    requests = []
+    model = {"name": "user"}
+
+    async def api_request(method, url, **kwargs):
+        requests.append(url)
+        await asyncio.sleep(0.1)
+        return model
+
+    with mock.patch.object(auth, "_api_request", api_request):
+        results = await asyncio.gather(
+            *(auth.user_for_token("token", sync=False) for i in range(10))
+        )
+    assert results == [model] * 10
+    assert len(requests) == 1
+    assert auth._pending_requests == {}
+
+
+async def test_hubauth_cache_error():
+    auth = HubAuth(api_url="http://127.0.0.1:1/hub/api")
+    requests = []
+
+    async def api_request(method, url, **kwargs):
+        requests.append(url)
+        raise HTTPError(502, "Failed to check authorization (upstream problem)")
+
+    with mock.patch.object(auth, "_api_request", api_request):
+        for i in range(2):
+            with raises(HTTPError) as exc_info:
+                await auth.user_for_token("token", sync=False)
+            assert exc_info.value.status_code == 502
+        assert len(requests) == 1
+
+        # failures are only cached briefly
+        with monotonic_future:
+            with raises(HTTPError):
+                await auth.user_for_token("token", sync=False)
+        assert len(requests) == 2
+
+
+async def test_hubauth_stale_while_revalidate():
+    auth = HubAuth(
+        api_url="http://127.0.0.1:1/hub/api", cache_max_age=10, cache_stale_max_age=30
+    )
+    requests = []
+
+    async def api_request(method, url, **kwargs):
+        requests.append(url)
+        await asyncio.sleep(0.1)
+        return {"name": "user", "request": len(requests)}
+
+    with mock.patch.object(auth, "_api_request", api_request):
+        model = await auth.user_for_token("token", sync=False)
+        assert model["request"] == 1
+        (cache_key,) = list(auth.cache)
+
+        # stale: use cached value, refresh in the background
+        auth.cache.timestamps[cache_key] -= 15
+        model = await auth.user_for_token("token", sync=False)
+        assert model["request"] == 1
+        assert len(auth._pending_requests) == 1
+        await asyncio.gather(*auth._pending_requests.values())
+        model = await auth.user_for_token("token", sync=False)
+        assert model["request"] == 2
+
+        # past the hard limit, wait for a new response
+        auth.cache.timestamps[cache_key] -= 45
+        model = await auth.user_for_token("token", sync=False)
+        assert model["request"] == 3
+    assert len(requests) == 3
+
+
+async def test_hubauth_http_client():
+    class UserHandler(RequestHandler):
+        def get(self):
+            self.write({"name": "user"})
+
+    sock, port = bind_unused_port()
+    server = HTTPServer(Application([("/hub/api/user", UserHandler)]))
+    server.add_sockets([sock])
+    auth = HubAuth(api_url=f"http://127.0.0.1:{port}/hub/api")
+
+    def count_requests():
+        return sum(
+            HUB_AUTH_API_REQUESTS.labels(connection=c)._value.get()
+            for c in HubAuthConnection
+        )
+
+    before = count_requests()
+    try:
+        for i in range(3):
+            model = await auth.user_for_token("token", use_cache=False, sync=False)
+            assert model == {"name": "user"}
+    finally:
+        server.stop()
+    # one pooled client per event loop
+    assert len(auth._http_clients) == 1
+    assert count_requests() == before + 3
+
+
+def test_hubauth_http_client_closed_loop():
+    auth = HubAuth(api_url="http://127.0.0.1:1/hub/api")
+
+    async def get_client():
+        return auth._get_http_client()
+
+    loop = asyncio.new_event_loop()
+    old_client = loop.run_until_complete(get_client())
+    loop.close()
+    closed = []
+    old_client.close = lambda: closed.append(True)
+    loop = asyncio.new_event_loop()
+    try:
+        client = loop.run_until_complete(get_client())
+        assert client is not old_client
+        # clients of closed loops are closed when the next one is created
+        assert closed == [True]
+        assert list(auth._http_clients) == [loop]
+        client.close()
+    finally:
+        loop.close()
+
+
+async def test_hubauth_http_client_configured():
+    class ConfiguredClient(SimpleAsyncHTTPClient):
+        pass
+
+    saved = AsyncHTTPClient._save_configuration()
+    AsyncHTTPClient.configure(ConfiguredClient, max_body_size=1024)
+    try:
+        auth = HubAuth(api_url="http://127.0.0.1:1/hub/api")
+        client = auth._get_http_client()
+    finally:
+        AsyncHTTPClient._restore_configuration(saved)
+    assert isinstance(client, ConfiguredClient)
+    assert client.max_body_size == 1024
+    assert client.max_clients == auth.api_max_connections
+    assert not _reuses_connections(ConfiguredClient)
+
+
+def test_hub_oauth_identity_assertion():
+    key = crypto.identity_signing_key(os.urandom(32))
+    auth = HubOAuth(
+        oauth_client_id="service-test",
+        identity_public_key=crypto.identity_public_key(key),
+    )
+    token = "abc123"
+    claims = {
+        "kind": "user",
+        "name": "user",
+        "scopes": ["access:services"],
+        "aud": "service-test",
+        "token_hash": hashlib.sha256(token.encode()).hexdigest(),
+        "exp": time.time() + 60,
+    }
+    assertion = crypto.sign_identity(key, claims)
+    assert auth.user_for_identity_assertion(assertion, token) == {
+        "kind": "user",
+        "name": "user",
+        "scopes": ["access:services"],
+    }
+    # issued for a different token
+    assert auth.user_for_identity_assertion(assertion, "other") is None
+    # issued for a different client
+    other_client = crypto.sign_identity(key, dict(claims, aud="service-other"))
+    assert auth.user_for_identity_assertion(other_client, token) is None
+    # expired
+    expired = crypto.sign_identity(key, dict(claims, exp=time.time() - 1))
+    assert auth.user_for_identity_assertion(expired, token) is None
+    # not signed by the Hub
+    other_key = crypto.identity_signing_key(b"other")
+    forged = crypto.sign_identity(other_key, claims)
+    assert auth.user_for_identity_assertion(forged, token) is None
+
+
 async def test_hubauth_token(app, mockservice_url, create_user_with_scopes):
     """Test HubAuthenticated service with user API tokens"""
     u = create_user_with_scopes("access:services")
@@ -432,6 +673,64 @@ async def test_oauth_access_scopes(
     assert r.status_code == 403
 
 
+async def test_oauth_client_registry(app):
+    provider = app.oauth_provider
+    validator = provider.request_validator
+    client_id = "service-registry-test"
+    secret = hexlify(os.urandom(16)).decode("ascii")
+    orm_client = provider.add_client(
+        client_id, secret, "/services/registry-test/oauth_callback"
+    )
+    assert validator._find_client(client_id) is orm_client
+
+    # verified secrets are remembered
+    assert validator._check_client_secret(orm_client, secret)
+    assert client_id in validator._verified_secrets
+    with mock.patch("jupyterhub.oauth.provider.compare_token") as compare_token:
+        assert validator._check_client_secret(orm_client, secret)
+    compare_token.assert_not_called()
+    assert not validator._check_client_secret(orm_client, "wrong")
+
+    # a new secret replaces the old one
+    new_secret = hexlify(os.urandom(16)).decode("ascii")
+    provider.add_client(client_id, new_secret, "/services/registry-test/oauth_callback")
+    assert not validator._check_client_secret(orm_client, secret)
+    assert validator._check_client_secret(orm_client, new_secret)
+
+    # deleted outside remove_client
+    app.db.delete(orm_client)
+    app.db.commit()
+    assert validator._find_client(client_id) is None
+    assert client_id not in validator._clients
+    assert client_id not in validator._verified_secrets
+
+    provider.add_client(client_id, secret, "/services/registry-test/oauth_callback")
+    assert client_id in validator._clients
+    provider.remove_client(client_id)
+    assert client_id not in validator._clients
+    assert validator._find_client(client_id) is None
+
+
+async def test_oauth_code_cache(app, mockservice_url, create_user_with_scopes):
+    validator = app.oauth_provider.request_validator
+    url = url_path_join(public_url(app, mockservice_url), 'owhoami/')
+    s = AsyncSession()
+    user = create_user_with_scopes("access:services")
+    s.cookies = await app.login_user(user.name)
+    r = await s.get(url)
+    r.raise_for_status()
+    assert urlparse(r.url).path.endswith('oauth2/authorize')
+    # codes are exchanged without looking them up in the database
+    with mock.patch.object(
+        orm.OAuthCode, "find", side_effect=AssertionError("should use the cache")
+    ):
+        r = await s.post(r.url, data={"_xsrf": s.cookies["_xsrf"]})
+    r.raise_for_status()
+    assert r.url == url
+    # the code has been consumed
+    assert not validator._codes
+
+
 @pytest.mark.parametrize(
     "token_roles, hits_page",
     [
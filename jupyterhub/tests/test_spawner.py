@@ -17,6 +17,7 @@ import pytest
 
 from .. import orm
 from .. import spawner as spawnermod
+from .._version import __version__
 from ..objects import Hub, Server
 from ..scopes import access_scopes
 from ..spawner import SimpleLocalProcessSpawner, Spawner
@@ -486,6 +487,7 @@ async def test_spawner_env(db):
     for key, value in env_overrides.items():
         assert key in env
         assert env[key] == value
+    assert env["JUPYTERHUB_VERSION"] == __version__
 
 
 async def test_hub_connect_url(db):
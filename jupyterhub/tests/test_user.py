@@ -26,6 +26,73 @@ async def test_userdict_get(db, attr):
     assert key in userdict
 
 
+def test_userdict_evict_idle(db):
+    userdict = UserDict(db_factory=lambda: db, settings={})
+    orm_users = [add_user(db, name=f"evict-{i}", app=False) for i in range(4)]
+    with mock.patch("time.monotonic", lambda: 100):
+        users = [userdict[orm_user] for orm_user in orm_users]
+        spawner = users[1].spawner
+        spawner._spawn_pending = True
+        # running elsewhere, e.g. before a restart
+        users[2].orm_user.orm_spawners[''].server = orm.Server()
+        db.commit()
+    with mock.patch("time.monotonic", lambda: 150):
+        userdict[orm_users[3].id]
+        # nothing idle for 60s yet
+        assert userdict.evict_idle(max_idle=60) == 0
+
+    with mock.patch("time.monotonic", lambda: 180):
+        assert userdict.evict_idle(max_idle=60) == 1
+    assert orm_users[0].id not in userdict
+    # users with active servers are kept
+    assert orm_users[1].id in userdict
+    assert orm_users[2].id in userdict
+    assert orm_users[3].id in userdict
+    # evicted users can still be used, and are looked up again
+    assert users[0].name == "evict-0"
+    assert userdict[orm_users[0].id] is not users[0]
+    assert orm_users[0].id in userdict
+
+    # max size evicts least recently used first
+    spawner._spawn_pending = False
+    assert userdict.evict_idle(max_size=2) == 2
+    assert set(userdict) == {orm_users[2].id, orm_users[0].id}
+    assert userdict.count_spawners() == 0
+    userdict[orm_users[2].id].spawner
+    assert userdict.count_spawners() == 1
+
+
+def test_spawner_view(db):
+    userdict = UserDict(db_factory=lambda: db, settings={"allow_named_servers": True})
+    orm_user = add_user(db, name="view", app=False)
+    db.add(orm.Spawner(name="named", user=orm_user))
+    db.commit()
+    user = userdict[orm_user]
+
+    # reading stopped servers doesn't instantiate Spawners
+    assert not user.running
+    assert user.server is None
+    assert user.spawner_view() is orm_user.orm_spawners['']
+    named = user.spawner_view("named")
+    assert isinstance(named, orm.Spawner)
+    assert not named.active
+    assert named.pending is None
+    assert user.spawner_view("nosuchserver") is None
+    assert user.spawners == {}
+
+    # instantiated Spawners are returned
+    spawner = user.get_spawner("named")
+    assert user.spawner_view("named") is spawner
+    assert list(user.spawners) == ["named"]
+    assert not user.running
+    assert '' not in user.spawners
+
+    # running servers are loaded
+    orm_user.orm_spawners[''].server = orm.Server()
+    db.commit()
+    assert user.spawner_view() is user.spawners['']
+
+
 @pytest.mark.parametrize(
     "group_names",
     [
@@ -2,11 +2,13 @@
 # Distributed under the terms of the Modified BSD License.
 import asyncio
 import json
+import time
 import warnings
 from collections import defaultdict
 from urllib.parse import quote, urlparse, urlunparse
 
 from sqlalchemy import inspect
+from sqlalchemy.orm.exc import ObjectDeletedError
 from tornado import web
 from tornado.httputil import urlencode
 from tornado.log import app_log
@@ -14,7 +16,7 @@ from tornado.log import app_log
 from . import orm, roles, scopes
 from ._version import __version__, _check_version
 from .crypto import CryptKeeper, EncryptionUnavailable, InvalidToken, decrypt, encrypt
-from .metrics import RUNNING_SERVERS, TOTAL_USERS
+from .metrics import RUNNING_SERVERS, TOTAL_USERS, USER_CACHE_EVICTIONS
 from .objects import Server
 from .spawner import LocalProcessSpawner
 from .utils import (
@@ -75,13 +77,20 @@ class UserDict(dict):
     an item is already in the cache,
     *not* whether it is in the database.
 
+    Users without active servers may be evicted from the cache
+    when they haven't been used for a while (see `evict_idle`).
+
     .. versionchanged:: 1.2
         ``'username' in userdict`` pattern is now supported
+    .. versionchanged:: 5.3
+        idle users can be evicted with `evict_idle`
     """
 
     def __init__(self, db_factory, settings):
         self.db_factory = db_factory
         self.settings = settings
+        # monotonic time each user was last retrieved, least recent first
+        self._last_used = {}
         super().__init__()
 
     @property
@@ -112,6 +121,15 @@ class UserDict(dict):
                     break
         return super().__contains__(key)
 
+    def _mark_used(self, user_id):
+        """Move a user to the end of the least-recently-used order"""
+        self._last_used.pop(user_id, None)
+        self._last_used[user_id] = time.monotonic()
+
+    def __setitem__(self, key, user):
+        super().__setitem__(key, user)
+        self._mark_used(key)
+
     def __getitem__(self, key):
         """UserDict allows retrieval of user by any of:
 
@@ -136,6 +154,7 @@ class UserDict(dict):
                 return user
             user = super().__getitem__(orm_user.id)
             user.db = self.db
+            self._mark_used(orm_user.id)
             return user
         elif isinstance(key, int):
             id = key
@@ -146,6 +165,7 @@ class UserDict(dict):
                 user = self.add(orm_user)
             else:
                 user = super().__getitem__(id)
+                self._mark_used(id)
             return user
         else:
             raise KeyError(repr(key))
@@ -172,6 +192,7 @@ class UserDict(dict):
         if user.orm_user in self.db:
             self.db.expunge(user.orm_user)
         super().__delitem__(user.id)
+        self._last_used.pop(user.id, None)
 
     def delete(self, key):
         """Delete a user from the cache and the database"""
@@ -183,6 +204,63 @@ class UserDict(dict):
         TOTAL_USERS.dec()
         del self[user_id]
 
+    def _is_idle(self, user):
+        """Whether a user has no running, pending, or starting servers"""
+        if any(spawner.active for spawner in user.spawners.values()):
+            return False
+        try:
+            orm_spawners = user.orm_user._orm_spawners
+        except ObjectDeletedError:
+            # deleted from the database
+            return True
+        # servers without a Spawner object in this Hub
+        return all(orm_spawner.server is None for orm_spawner in orm_spawners)
+
+    def evict_idle(self, max_idle=0, max_size=0):
+        """Remove idle users from the cache
+
+        Users with no running or pending servers are removed
+        if they haven't been retrieved for `max_idle` seconds,
+        or, least recently used first,
+        while there are more than `max_size` users in the cache.
+        0 means no limit.
+
+        Only the User wrappers (and their Spawners) are removed,
+        database records are unaffected,
+        and the next lookup creates a new wrapper.
+
+        Returns the number of users removed.
+
+        .. versionadded:: 5.3
+        """
+        now = time.monotonic()
+        evicted = 0
+        for user_id, last_used in list(self._last_used.items()):
+            too_many = max_size and len(self) > max_size
+            too_idle = max_idle and now - last_used >= max_idle
+            if not (too_many or too_idle):
+                # the rest were used more recently
+                break
+            user = super().get(user_id)
+            if user is None:
+                self._last_used.pop(user_id)
+                continue
+            if not self._is_idle(user):
+                continue
+            # don't expunge from the db session like __delitem__,
+            # in case a request is still using this User
+            super().__delitem__(user_id)
+            self._last_used.pop(user_id)
+            evicted += 1
+        if evicted:
+            USER_CACHE_EVICTIONS.inc(evicted)
+            app_log.debug("Evicted %i idle users from the cache", evicted)
+        return evicted
+
+    def count_spawners(self):
+        """Count the Spawner objects of users in the cache"""
+        return sum(len(user.spawners) for user in self.values())
+
     def count_active_users(self):
         """Count the number of user servers that are active/pending/ready
 
@@ -213,6 +291,57 @@ class _SpawnerDict(dict):
         return super().__getitem__(key)
 
 
+def _user_base_url(name, settings):
+    """The base URL path of a user's default server"""
+    return (
+        url_path_join(settings.get('base_url', '/'), 'user', url_escape_path(name))
+        + '/'
+    )
+
+
+def _user_domain(name, settings):
+    """The domain of a user's servers, when using subdomains"""
+    hook = settings.get("subdomain_hook", subdomain_hook_legacy)
+    return hook(name, settings['domain'], kind='user')
+
+
+def _user_host(name, settings):
+    """The host (proto://domain[:port]) of a user's servers"""
+    # if subdomains are used, use our domain
+    if settings.get('subdomain_host'):
+        parsed = urlparse(settings['subdomain_host'])
+        h = f"{parsed.scheme}://{_user_domain(name, settings)}"
+        if parsed.port:
+            h = f"{h}:{parsed.port}"
+        return h
+    elif settings.get("public_url"):
+        # no subdomain, use public host url without path
+        return urlunparse(settings["public_url"]._replace(path=""))
+    else:
+        return ""
+
+
+def _user_url(name, settings):
+    """The URL of a user's default server
+
+    Full name.domain/path if using subdomains, otherwise just /base/url
+    """
+    if settings.get("subdomain_host"):
+        return f"{_user_host(name, settings)}{_user_base_url(name, settings)}"
+    else:
+        return _user_base_url(name, settings)
+
+
+def _user_progress_url(name, settings, server_name=''):
+    """API URL for progress endpoint for a user's server"""
+    url_parts = [settings['hub'].base_url, 'api/users', url_escape_path(name)]
+    if server_name:
+        url_parts.extend(['servers', url_escape_path(server_name), 'progress'])
+    else:
+        url_parts.extend(['server/progress'])
+    return url_path_join(*url_parts)
+
+
 class User:
     """High-level wrapper around an orm.User object"""
 
@@ -230,10 +359,7 @@ class User:
 
         self.allow_named_servers = self.settings.get('allow_named_servers', False)
 
-        self.base_url = self.prefix = (
-            url_path_join(self.settings.get('base_url', '/'), 'user', self.escaped_name)
-            + '/'
-        )
+        self.base_url = self.prefix = _user_base_url(self.name, self.settings)
 
         self.spawners = _SpawnerDict(self._new_spawner)
 
@@ -265,6 +391,31 @@ class User:
             spawner = self.spawners[server_name]
         return spawner
 
+    def spawner_view(self, server_name=""):
+        """Get a server for reading, without instantiating its Spawner
+
+        Returns the Spawner if it has already been instantiated
+        or the server is running.
+        A stopped server is returned as its low-level orm.Spawner,
+        which has the read-only attributes of a stopped Spawner
+        (`name`, `active`, `ready`, `pending`, `server`, `user_options`, ...),
+        so checking on stopped servers doesn't construct the Spawner class.
+        Returns None if there is no such server.
+
+        Use `get_spawner` to start, stop, or poll a server.
+
+        .. versionadded:: 5.3
+        """
+        if server_name in self.spawners:
+            return self.spawners[server_name]
+        orm_spawner = self.orm_spawners.get(server_name)
+        if orm_spawner is None:
+            return None
+        if orm_spawner.server is not None:
+            # running, but not loaded yet
+            return self.spawners[server_name]
+        return orm_spawner
+
     def sync_groups(self, group_names):
         """Synchronize groups with database"""
 
@@ -529,6 +680,7 @@ class User:
             cookie_host_prefix_enabled=self.settings.get(
                 "cookie_host_prefix_enabled", False
             ),
+            identity_public_key=self.settings.get("identity_public_key", ""),
             trusted_alt_names=trusted_alt_names,
             user_options=orm_spawner.user_options or {},
         )
@@ -589,9 +741,10 @@ class User:
     @property
     def running(self):
         """property for whether the user's default server is running"""
-        if not self.spawners:
+        spawner = self.spawner_view()
+        if spawner is None:
             return False
-        return self.spawner.ready
+        return spawner.ready
 
     @property
     def active(self):
@@ -618,7 +771,10 @@ class User:
 
     @property
     def server(self):
-        return self.spawner.server
+        spawner = self.spawner_view()
+        if spawner is None:
+            return None
+        return spawner.server
 
     @property
     def escaped_name(self):
@@ -641,8 +797,7 @@ class User:
     @property
     def domain(self):
         """Get the domain for my server."""
-        hook = self.settings.get("subdomain_hook", subdomain_hook_legacy)
-        return hook(self.name, self.settings['domain'], kind='user')
+        return _user_domain(self.name, self.settings)
 
     @property
     def dns_safe_name(self):
@@ -658,19 +813,7 @@ class User:
     @property
     def host(self):
         """Get the *host* for my server (proto://domain[:port])"""
-        # if subdomains are used, use our domain
-
-        if self.settings.get('subdomain_host'):
-            parsed = urlparse(self.settings['subdomain_host'])
-            h = f"{parsed.scheme}://{self.domain}"
-            if parsed.port:
-                h = f"{h}:{parsed.port}"
-            return h
-        elif self.settings.get("public_url"):
-            # no subdomain, use public host url without path
-            return urlunparse(self.settings["public_url"]._replace(path=""))
-        else:
-            return ""
+        return _user_host(self.name, self.settings)
 
     @property
     def url(self):
@@ -678,10 +821,7 @@ class User:
 
         Full name.domain/path if using subdomains, otherwise just my /base/url
         """
-        if self.settings.get("subdomain_host"):
-            return f"{self.host}{self.base_url}"
-        else:
-            return self.base_url
+        return _user_url(self.name, self.settings)
 
     def server_url(self, server_name=''):
         """Get the url for a server with a given name"""
@@ -710,12 +850,7 @@ class User:
 
     def progress_url(self, server_name=''):
         """API URL for progress endpoint for a server with a given name"""
-        url_parts = [self.settings['hub'].base_url, 'api/users', self.escaped_name]
-        if server_name:
-            url_parts.extend(['servers', url_escape_path(server_name), 'progress'])
-        else:
-            url_parts.extend(['server/progress'])
-        return url_path_join(*url_parts)
+        return _user_progress_url(self.name, self.settings, server_name)
 
     async def refresh_auth(self, handler):
         """Refresh authentication if needed
@@ -858,7 +993,7 @@ class User:
             options = spawner.orm_spawner.user_options or {}
         else:
             # options specified, save for use as future defaults
-            spawner.orm_spawner.user_options = options
+            orm.set_if_changed(spawner.orm_spawner, user_options=options)
             db.commit()
 
         spawner.user_options = options
@@ -1024,7 +1159,7 @@ class User:
         # store state
         if self.state is None:
             self.state = {}
-        spawner.orm_spawner.state = spawner.get_state()
+        orm.set_if_changed(spawner.orm_spawner, state=spawner.get_state())
         db.commit()
         spawner._waiting_for_response = True
         await self._wait_up(spawner)
@@ -1131,7 +1266,7 @@ class User:
             except Exception:
                 self.log.exception("Error in Spawner.post_stop_hook for %s", self)
             spawner.clear_state()
-            spawner.orm_spawner.state = spawner.get_state()
+            orm.set_if_changed(spawner.orm_spawner, state=spawner.get_state())
             self.db.commit()
 
             # trigger post-spawner hook on authenticator
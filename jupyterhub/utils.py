@@ -551,6 +551,30 @@ def print_ps_info(file=sys.stderr):
     print('', file=file)
 
 
+def extract_stack(frame, limit=None):
+    """Extract the stack of a frame, without coroutine boilerplate frames
+
+    Source lines are not looked up until they are needed,
+    so this is cheap enough to call while sampling a running thread.
+
+    Parameters:
+
+    frame: the innermost frame, e.g. from `sys._current_frames()`
+    limit: keep at most this many of the innermost frames
+
+    Returns a list of FrameSummary, outermost first.
+    """
+    import traceback
+
+    from .log import coroutine_frames
+
+    stack = traceback.StackSummary.extract(
+        traceback.walk_stack(frame), limit=limit, lookup_lines=False
+    )
+    stack.reverse()
+    return coroutine_frames(stack)
+
+
 def print_stacks(file=sys.stderr):
     """Print current status of the process
 
@@ -569,18 +593,15 @@ def print_stacks(file=sys.stderr):
     # no need to add them to startup
     import traceback
 
-    from .log import coroutine_frames
-
     print(f"Active threads: {threading.active_count()}", file=file)
     for thread in threading.enumerate():
         print(f"Thread {thread.name}:", end='', file=file)
         frame = sys._current_frames()[thread.ident]
-        stack = traceback.extract_stack(frame)
         if thread is threading.current_thread():
-            # truncate last two frames of the current thread
+            # skip the last two frames of the current thread
             # which are this function and its caller
-            stack = stack[:-2]
-        stack = coroutine_frames(stack)
+            frame = frame.f_back.f_back
+        stack = extract_stack(frame)
         if stack:
             last_frame = stack[-1]
             if (